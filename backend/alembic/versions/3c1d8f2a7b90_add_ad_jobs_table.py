@@ -0,0 +1,53 @@
+"""add ad_jobs table
+
+Revision ID: 3c1d8f2a7b90
+Revises: e779a5ca17e0
+Create Date: 2026-01-12 10:24:31.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1d8f2a7b90'
+down_revision: Union[str, Sequence[str], None] = 'e779a5ca17e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'ad_jobs',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('stage', sa.String(length=20), nullable=True),
+        sa.Column('request_payload', sa.JSON(), nullable=False),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('worker_id', sa.String(length=100), nullable=True),
+        sa.Column('ad_request_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['ad_request_id'], ['ad_requests.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_ad_jobs_user_id'), 'ad_jobs', ['user_id'], unique=False)
+    op.create_index(op.f('ix_ad_jobs_status'), 'ad_jobs', ['status'], unique=False)
+    op.create_index(op.f('ix_ad_jobs_created_at'), 'ad_jobs', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_ad_jobs_created_at'), table_name='ad_jobs')
+    op.drop_index(op.f('ix_ad_jobs_status'), table_name='ad_jobs')
+    op.drop_index(op.f('ix_ad_jobs_user_id'), table_name='ad_jobs')
+    op.drop_table('ad_jobs')
@@ -0,0 +1,40 @@
+"""add dialogue_sessions table
+
+Revision ID: 5d2e7a1c9f04
+Revises: 3c1d8f2a7b90
+Create Date: 2026-01-14 16:02:47.530219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2e7a1c9f04'
+down_revision: Union[str, Sequence[str], None] = '3c1d8f2a7b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'dialogue_sessions',
+        sa.Column('namespace', sa.String(length=30), nullable=False),
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('data', sa.JSON(), nullable=False),
+        sa.Column('size_bytes', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('namespace', 'key'),
+    )
+    op.create_index(op.f('ix_dialogue_sessions_expires_at'), 'dialogue_sessions', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_dialogue_sessions_expires_at'), table_name='dialogue_sessions')
+    op.drop_table('dialogue_sessions')
@@ -0,0 +1,99 @@
+"""add idea/caption columns and keyset history index to ad_requests
+
+Revision ID: 7f3b2c9d1e48
+Revises: 5d2e7a1c9f04
+Create Date: 2026-02-09 14:02:11.532907
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f3b2c9d1e48'
+down_revision: Union[str, Sequence[str], None] = '5d2e7a1c9f04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BACKFILL_BATCH = 1000
+
+
+def _parse_gpt_output(text):
+    """gpt_output_text("아이디어: ...\\n캡션: ...\\n해시태그: ...") → (idea, caption, hashtags 문자열)"""
+    idea = caption = hashtags = None
+    for line in (text or "").split('\n'):
+        line = line.strip()
+        if line.startswith('아이디어:'):
+            idea = line.split('아이디어:', 1)[1].strip()
+        elif line.startswith('캡션:'):
+            caption = line.split('캡션:', 1)[1].strip()
+        elif line.startswith('해시태그:'):
+            hashtags = line.split('해시태그:', 1)[1].strip()
+    return idea, caption, hashtags
+
+
+def _backfill_from_gpt_output():
+    """기존 행의 gpt_output_text를 파싱해 idea/caption(+ 비어 있는 hashtags) 채우기"""
+    bind = op.get_bind()
+    ad_requests = sa.table(
+        'ad_requests',
+        sa.column('id', sa.Integer),
+        sa.column('gpt_output_text', sa.Text),
+        sa.column('idea', sa.Text),
+        sa.column('caption', sa.Text),
+        sa.column('hashtags', sa.Text),
+    )
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(ad_requests.c.id, ad_requests.c.gpt_output_text, ad_requests.c.hashtags)
+            .where(
+                ad_requests.c.id > last_id,
+                ad_requests.c.gpt_output_text.isnot(None),
+            )
+            .order_by(ad_requests.c.id)
+            .limit(BACKFILL_BATCH)
+        ).fetchall()
+        if not rows:
+            break
+
+        for row in rows:
+            idea, caption, hashtags_text = _parse_gpt_output(row.gpt_output_text)
+            values = {'idea': idea, 'caption': caption}
+            if not row.hashtags and hashtags_text:
+                tags = [tag.strip() for tag in hashtags_text.split(',') if tag.strip()]
+                values['hashtags'] = json.dumps(tags, ensure_ascii=False)
+            bind.execute(
+                ad_requests.update().where(ad_requests.c.id == row.id).values(**values)
+            )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ad_requests', sa.Column('idea', sa.Text(), nullable=True))
+    op.add_column('ad_requests', sa.Column('caption', sa.Text(), nullable=True))
+
+    _backfill_from_gpt_output()
+
+    # 히스토리 keyset 페이지네이션: WHERE user_id = ? AND is_deleted = false ORDER BY created_at DESC, id DESC
+    op.create_index(
+        'ix_ad_requests_user_created_active',
+        'ad_requests',
+        ['user_id', 'created_at', 'id'],
+        unique=False,
+        postgresql_where=sa.text('is_deleted = false'),
+        sqlite_where=sa.text('is_deleted = 0'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_ad_requests_user_created_active', table_name='ad_requests')
+    op.drop_column('ad_requests', 'caption')
+    op.drop_column('ad_requests', 'idea')
@@ -0,0 +1,45 @@
+"""add HNSW index on user_memories.embedding for cosine similarity search
+
+Revision ID: 9a4c1e7b2d63
+Revises: 7f3b2c9d1e48
+Create Date: 2026-02-11 10:41:27.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4c1e7b2d63'
+down_revision: Union[str, Sequence[str], None] = '7f3b2c9d1e48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEX_NAME = 'ix_user_memories_embedding_hnsw'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # pgvector 전용 (SQLite 개발 환경은 memory_search의 numpy 브루트포스 사용)
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # memory_search: ORDER BY embedding <=> :query LIMIT k → vector_cosine_ops
+    op.create_index(
+        INDEX_NAME,
+        'user_memories',
+        ['embedding'],
+        unique=False,
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'embedding': 'vector_cosine_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index(INDEX_NAME, table_name='user_memories', postgresql_using='hnsw')
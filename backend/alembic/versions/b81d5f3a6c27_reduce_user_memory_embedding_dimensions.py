@@ -0,0 +1,109 @@
+"""reduce user_memories.embedding to 512 dims and add embedding_hash
+
+Revision ID: b81d5f3a6c27
+Revises: 9a4c1e7b2d63
+Create Date: 2026-02-12 16:27:53.604118
+
+"""
+import json
+import math
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81d5f3a6c27'
+down_revision: Union[str, Sequence[str], None] = '9a4c1e7b2d63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+OLD_DIMENSIONS = 1536
+NEW_DIMENSIONS = 512
+BACKFILL_BATCH = 500
+INDEX_NAME = 'ix_user_memories_embedding_hnsw'
+
+
+def _reduce(vector_text):
+    """'[x1,...,x1536]' → 앞 512차원만 남기고 L2 재정규화한 '[...]'
+    (text-embedding-3 계열은 dimensions 파라미터와 같은 방식으로 앞부분 절단 + 정규화 가능)"""
+    values = json.loads(vector_text)[:NEW_DIMENSIONS]
+    norm = math.sqrt(sum(v * v for v in values))
+    if norm:
+        values = [v / norm for v in values]
+    return '[' + ','.join(repr(float(v)) for v in values) + ']'
+
+
+def _backfill_reduced(bind, target_column, is_postgres):
+    """기존 임베딩을 배치 단위로 축소해 target_column에 기록"""
+    select_embedding = 'embedding::text' if is_postgres else 'embedding'
+    assign = f'CAST(:vec AS vector({NEW_DIMENSIONS}))' if is_postgres else ':vec'
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text(
+                f'SELECT id, {select_embedding} AS embedding FROM user_memories '
+                'WHERE id > :last_id AND embedding IS NOT NULL ORDER BY id LIMIT :limit'
+            ),
+            {'last_id': last_id, 'limit': BACKFILL_BATCH},
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            bind.execute(
+                sa.text(f'UPDATE user_memories SET {target_column} = {assign} WHERE id = :id'),
+                {'vec': _reduce(row.embedding), 'id': row.id},
+            )
+        last_id = rows[-1].id
+
+
+def _create_hnsw_index():
+    op.create_index(
+        INDEX_NAME,
+        'user_memories',
+        ['embedding'],
+        unique=False,
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'embedding': 'vector_cosine_ops'},
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    is_postgres = bind.dialect.name == 'postgresql'
+
+    op.add_column('user_memories', sa.Column('embedding_hash', sa.String(length=64), nullable=True))
+
+    if not is_postgres:
+        # SQLite: 벡터는 텍스트로 저장되므로 제자리 변환
+        _backfill_reduced(bind, 'embedding', is_postgres=False)
+        return
+
+    # 벡터 차원이 타입에 포함되므로 새 컬럼에 채운 뒤 교체 → HNSW 인덱스도 512차원으로 재생성
+    op.drop_index(INDEX_NAME, table_name='user_memories', postgresql_using='hnsw')
+    op.add_column('user_memories', sa.Column('embedding_reduced', Vector(NEW_DIMENSIONS), nullable=True))
+    _backfill_reduced(bind, 'embedding_reduced', is_postgres=True)
+    op.drop_column('user_memories', 'embedding')
+    op.alter_column('user_memories', 'embedding_reduced', new_column_name='embedding')
+    _create_hnsw_index()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # 잘라낸 차원은 복구할 수 없으므로 임베딩은 비움 (다음 메모리 갱신 시 재생성)
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.drop_index(INDEX_NAME, table_name='user_memories', postgresql_using='hnsw')
+        op.drop_column('user_memories', 'embedding')
+        op.add_column('user_memories', sa.Column('embedding', Vector(OLD_DIMENSIONS), nullable=True))
+        _create_hnsw_index()
+    else:
+        bind.execute(sa.text('UPDATE user_memories SET embedding = NULL'))
+
+    op.drop_column('user_memories', 'embedding_hash')
@@ -0,0 +1,67 @@
+# deps.py
+# 라우트 공용 의존성
+# - 요청당 한 번만 사용자 확인 (FastAPI가 같은 요청 안의 의존성 결과를 재사용)
+# - 사용자 조회는 auth_service 스냅샷 캐시를 거치므로 hot 엔드포인트는 users 테이블 조회 생략
+# - 여러 라우트가 쓰는 Form 문자열 파서
+
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.core.database import get_async_db
+from backend.app.core.schemas import UserSnapshot
+from backend.app.services import auth_service
+
+security = HTTPBearer(auto_error=False)
+
+
+async def get_optional_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    db: AsyncSession = Depends(get_async_db),
+) -> Optional[UserSnapshot]:
+    """Bearer 토큰이 있으면 사용자 스냅샷, 없거나 유효하지 않으면 None (request.state.current_user에도 저장)"""
+    token = credentials.credentials if credentials else None
+    current_user = await auth_service.get_user_from_token(db, token)
+    request.state.current_user = current_user
+    return current_user
+
+
+async def get_required_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    current_user: Optional[UserSnapshot] = Depends(get_optional_user),
+) -> UserSnapshot:
+    """로그인 필수 엔드포인트용 (토큰 없음 / 유효하지 않은 토큰 → 401)"""
+    if not credentials:
+        raise HTTPException(
+            status_code=401,
+            detail="인증이 필요합니다. Authorization 헤더에 Bearer 토큰을 포함해주세요."
+        )
+    if not current_user:
+        raise HTTPException(
+            status_code=401,
+            detail="유효하지 않은 토큰입니다."
+        )
+    return current_user
+
+
+def parse_optional_coords(value: str | None, count: int) -> list[float] | None:
+    """
+    "x1,y1,x2,y2" 형태의 Form 문자열 → float 리스트
+    - None 또는 "" → None
+    - 개수가 맞지 않거나 숫자가 아니면 400
+    """
+    if value is None or value.strip() == "":
+        return None
+    try:
+        coords = [float(v) for v in value.split(",")]
+    except ValueError:
+        coords = []
+    if len(coords) != count:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid coordinates (expected {count} comma-separated numbers): {value}",
+        )
+    return coords
@@ -1,10 +1,12 @@
 # router.py
 
 from fastapi import APIRouter
-from backend.app.api.routes import whisper, gpt, audio, diffusion, weather, ads, auth, segmentation_test, history, text
+from backend.app.api.routes import whisper, gpt, audio, diffusion, weather, ads, auth, segmentation_test, history, text, health
 
 api_router = APIRouter()
 
+api_router.include_router(health.router)
+
 api_router.include_router(auth.router)
 api_router.include_router(whisper.router)
 api_router.include_router(gpt.router)
@@ -1,17 +1,11 @@
 # ads.py
 
-from pathlib import Path
 from typing import Optional
 from datetime import datetime
+import asyncio
 import base64
 import json
 
-from backend.app.core.schemas import (
-    AdMediaGenerateRequest,
-    AdGenerateResponse,
-    AudioGenerationRequest,
-    CompositionMode,
-)
 from fastapi import (
     APIRouter,
     HTTPException,
@@ -22,42 +16,69 @@ from fastapi import (
     Depends,
 )
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.app.services.weather_service import get_weather
-from backend.app.services.diffusion_service import (
-    generate_poster_image,
-    generate_poster_with_product_b64
-)
-from backend.app.services.audio_service import generate_bgm_and_save, generate_bgm_bytes
-from backend.app.services.media_service import (
-    save_generated_image,
-    compose_image_and_audio_to_mp4,
-    compose_image_and_audio_to_mp4_bytes,
-    overlay_caption_on_image,   # 텍스트 삽입 추가
-)
-from backend.app.core.schemas import (
-    AdMediaGenerateRequest,   # 새로 만든 Request 스키마
-    AdGenerateResponse,       # 기존 Response 그대로 사용
-    AudioGenerationRequest,
-)
 from backend.app.core.schemas import (
     AdMediaGenerateRequest,
     AdGenerateResponse,
-    AudioGenerationRequest,
     CompositionMode,
+    AdJobCreateResponse,
+    AdJobStatusResponse,
+    UserSnapshot,
 )
-from backend.app.core.database import get_db
-from backend.app.core.models import User, AdRequest
+from backend.app.api.deps import get_optional_user
+from backend.app.core.database import get_async_db
 from backend.app.services import auth_service
-
-from backend.app.services import minio_service
-
+from backend.app.services import job_service
+from backend.app.services.ad_generation_service import (
+    run_ad_media_pipeline,
+    save_ad_request_async,
+    validate_ad_request,
+)
 
 
 router = APIRouter(prefix="/ads", tags=["Ad Generation"])
 security = HTTPBearer(auto_error=False)
 
+
+async def _build_request_context(current_user: Optional[UserSnapshot]):
+    """
+    로그인/비로그인 분기 + 로그용 컨텍스트 구성
+    (사용자 확인은 get_optional_user 의존성에서 요청당 한 번, 스냅샷 캐시 사용)
+    Returns: (weather_info, context_str)
+    """
+    # 현재 날짜 및 시간 정보 가져오기
+    current_datetime = datetime.now().strftime("%Y년 %m월 %d일 %H시")
+    weather_info = None  # 기본값 설정
+
+    if current_user:
+        # 로그인한 경우: 사용자 정보 활용
+        weather_info = await get_weather(current_user.location or "Seoul")
+        business_type = current_user.business_type or "정보 없음"
+        location = current_user.location or "정보 없음"
+        business_hours = current_user.business_hours or "정보 없음"
+
+        menu_items_str = "정보 없음"
+        if current_user.menu_items:
+            try:
+                menu_list = json.loads(current_user.menu_items)
+                menu_items_str = ", ".join(menu_list)
+            except:
+                menu_items_str = current_user.menu_items
+
+        # context는 이제 "GPT용"이 아니라 "로그용"으로만 사용
+        context_str = (
+            f"업종: {business_type}, 위치: {location}, 영업시간: {business_hours}, 메뉴: {menu_items_str}"
+        )
+        print(f"[사용자 정보 포함] {current_user.username}")
+    else:
+        context_str = f"현재 날짜 및 시간: {current_datetime}"
+        print("[비로그인 사용자]")
+
+    return weather_info, context_str
+
+
 @router.post("/generate/upload", response_model=AdGenerateResponse)
 async def generate_ad_upload(
     request: Request,
@@ -103,8 +124,8 @@ async def generate_ad_upload(
         False,
         description="이미지 + 오디오 mp4 합성 여부 플래그",
     ),
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db),
+    current_user: Optional[UserSnapshot] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Swagger/테스트용 파일 업로드 버전 광고 생성 엔드포인트 정의.
@@ -147,14 +168,14 @@ async def generate_ad_upload(
         return await generate_ad(
             req=ad_req,
             request=request,
-            credentials=credentials,
+            current_user=current_user,
             db=db,
         )
     except HTTPException:
         # generate_ad 내부에서 일어난 HTTPException 그대로 전달
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"[ADS][UPLOAD][ERROR] {repr(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -166,8 +187,8 @@ async def generate_ad_upload(
 async def generate_ad(
     req: AdMediaGenerateRequest, 
     request: Request,
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db)
+    current_user: Optional[UserSnapshot] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     print("[ADS] /api/ads/generate called")
 
@@ -182,44 +203,10 @@ async def generate_ad(
     - generate_video: 이미지 + 오디오 mp4 합성
     """
     try:
-        # 0-0) base_url 계산
-        base_url = str(request.base_url).rstrip("/")
-
         # ---------------------------------------------------------------
         # 0) 로그인/비로그인 분기 + 컨텍스트 구성
         # ---------------------------------------------------------------
-        # 토큰에서 사용자 정보 추출 (optional)
-        token = credentials.credentials if credentials else None
-        current_user = auth_service.get_user_from_token(db, token)
-        
-        # 현재 날짜 및 시간 정보 가져오기
-        current_datetime = datetime.now().strftime("%Y년 %m월 %d일 %H시")
-        # Context 생성 (로그인 여부에 따라 다름)
-        weather_info = None  # 기본값 설정
-
-        if current_user:
-            # 로그인한 경우: 사용자 정보 활용
-            weather_info = await get_weather(current_user.location or "Seoul")
-            business_type = current_user.business_type or "정보 없음"
-            location = current_user.location or "정보 없음"
-            business_hours = current_user.business_hours or "정보 없음"
-
-            menu_items_str = "정보 없음"
-            if current_user.menu_items:
-                try:
-                    menu_list = json.loads(current_user.menu_items)
-                    menu_items_str = ", ".join(menu_list)
-                except:
-                    menu_items_str = current_user.menu_items
-
-            # context는 이제 "GPT용"이 아니라 "로그용"으로만 사용
-            context_str = (
-                f"업종: {business_type}, 위치: {location}, 영업시간: {business_hours}, 메뉴: {menu_items_str}"
-            )
-            print(f"[사용자 정보 포함] {current_user.username}")
-        else:
-            context_str = f"현재 날짜 및 시간: {current_datetime}"
-            print("[비로그인 사용자]")
+        weather_info, context_str = await _build_request_context(current_user)
 
         # ---------------------------------------------------------------
         # 1) GPT 결과값은 프론트에서 받은 것을 그대로 사용
@@ -247,132 +234,33 @@ async def generate_ad(
         print(f"[이미지 프롬프트(프론트 전달)] {image_prompt}")
         print(f"[BGM 프롬프트(프론트 전달)] {bgm_prompt}")
 
-        # -------------------------
-        # 2) 이미지 생성 (옵션)
-        # -------------------------        
-        print("[ADS] 이미지 생성 시작")
-
-        image_base64: str = ""
-        image_url: Optional[str] = None
-
-        if req.generate_image:
-            if not image_prompt:
-                raise HTTPException(
-                    status_code=400,
-                    detail="generate_image=true 인 경우 image_prompt는 필수입니다.",
-                )
-            if not req.product_image_b64:
-                raise HTTPException(
-                    status_code=400,
-                    detail="generate_image=true 인 경우 product_image_b64는 필수입니다.",
-                )
-
-            print("[ADS] 제품 이미지 기반 합성 포스터 생성 모드 진입")
-
-            # diffusion 파이프라인 전체 호출 (Base64 → 세그멘테이션 → 합성)
-            # diffusion으로 제품+배경 합성 이미지 생성
-            image_bytes = generate_poster_with_product_b64(
-                prompt=image_prompt,
-                product_image_b64=req.product_image_b64,
-                composition_mode=req.composition_mode,
-                control_weight=None,
-                ip_adapter_scale=None,
-            )
-
-            # caption이 있으면 텍스트 합성
-            if req.caption and req.generate_video:
-                print(f"[ADS] 캡션 텍스트 오버레이 적용: {req.caption}")
-                image_bytes = overlay_caption_on_image(
-                    image_bytes=image_bytes,
-                    caption=req.caption,
-                    mode="bottom",      # 디폴트 : 하단
-                    font_mode="bold",   # 디폴트 : 볼드
-                    font_size_ratio=0.06,
-                    color=(255, 255, 255)
-                )
-            else:
-                print("[ADS] 캡션 없음 -> 텍스트 합성 스킵")
-                
-            # MinIO 업로드
-            image_url = minio_service.upload_bytes(image_bytes, content_type="image/png")
-
-            print(f"[이미지 생성/저장 완료] {image_url}")
-        else:
-            print("[옵션] 이미지 생성 비활성화 상태")
-
-
-        # -------------------------
-        # 3) 오디오 생성 (옵션)
-        # -------------------------
-        audio_url: Optional[str] = None
-
-        if req.generate_audio:
-            audio_req = AudioGenerationRequest(
-                prompt=bgm_prompt,
-                duration_sec=12.0,  # PoC에서 고정 길이
+        if req.generate_image and not req.product_image_b64:
+            raise HTTPException(
+                status_code=400,
+                detail="generate_image=true 인 경우 product_image_b64는 필수입니다.",
             )
-            # "/media/audio/xxxx.wav" 형태의 상대 경로
-            audio_bytes = generate_bgm_bytes(audio_req)
-
-            # MinIO 업로드
-            audio_url = minio_service.upload_bytes(audio_bytes, content_type="audio/wav")
-
-            print(f"[BGM 생성/저장 완료] {audio_url}")
-        else:
-            print("[옵션] 오디오 생성 비활성화 상태")
 
         # -------------------------
-        # 4) mp4 합성 (옵션)
+        # 2~4) 이미지 / 오디오 / mp4 생성 (블로킹 → 스레드에서 실행해 이벤트 루프 보호)
         # -------------------------
-        print("[ADS] 미디어 합성 시작")
-        video_url: Optional[str] = None
-
-        if req.generate_video:
-            # mp4는 이미지 + 오디오가 모두 있을 때만 의미 있음
-            if not (image_url and audio_url):
-                print("[mp4 합성 스킵] image_url 또는 audio_url 없음")
-            else:
-                try:
-                    video_bytes = compose_image_and_audio_to_mp4_bytes(
-                        image_bytes=image_bytes,
-                        audio_bytes=audio_bytes,
-                    )
-                    
-                    video_url = minio_service.upload_bytes(
-                        video_bytes,
-                        content_type="video/mp4",
-                    )
-                    print(f"[mp4 합성/업로드 완료] {video_url}")
-
-                except Exception as e:
-                    print(f"[mp4 합성 실패] {e}")
-        else:
-            print("[옵션] mp4 합성 비활성화 상태")
+        print("[ADS] 미디어 생성 시작")
+        image_base64: str = ""
+        media = await asyncio.to_thread(run_ad_media_pipeline, req)
+        image_url = media["image_url"]
+        audio_url = media["audio_url"]
+        video_url = media["video_url"]
 
         # -------------------------
         # 5) DB 저장 (로그인/비로그인 공통)
         # -------------------------
-        # GPT 출력 텍스트 생성
-        gpt_output_text = f"아이디어: {idea}\n캡션: {caption}\n해시태그: {', '.join(hashtags)}"
-
-        # DB에 광고 요청 정보 저장
-        ad_request = AdRequest(
+        await save_ad_request_async(
+            db,
             user_id=current_user.id if current_user else None,
-            voice_text=None,
+            req=req,
+            media=media,
             weather_info=weather_info,
-            gpt_prompt=context_str,          # full 프롬프트 대신 context 요약 정도
-            gpt_output_text=gpt_output_text, # GPT 결과 요약 문자열
-            diffusion_prompt=image_prompt,
-            bgm_prompt=bgm_prompt,
-            image_url=image_url,
-            audio_url=audio_url,
-            video_url=video_url,
-            hashtags=json.dumps(hashtags, ensure_ascii=False),
+            context_str=context_str,
         )
-        db.add(ad_request)
-        db.commit()
-        db.refresh(ad_request)
-        print(f"[DB 저장 완료] AdRequest ID: {ad_request.id}")
 
         # -------------------------
         # 6) 최종 응답
@@ -390,6 +278,81 @@ async def generate_ad(
         )
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"[ADS][ERROR] {repr(e)}")  # ← 에러 내용 콘솔에 찍기
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ---------------------------------------------------------
+# 비동기 작업 API (GPU 워커 프로세스가 처리)
+# ---------------------------------------------------------
+@router.post("/jobs", response_model=AdJobCreateResponse, status_code=202)
+async def create_ad_job(
+    req: AdMediaGenerateRequest,
+    current_user: Optional[UserSnapshot] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    광고 생성 작업 등록 API
+    - 요청을 ad_jobs 테이블에 적재하고 job_id를 즉시 반환
+    - 실제 생성은 별도 워커 프로세스(backend.app.worker)가 수행
+    - 진행 상황/부분 결과는 GET /ads/jobs/{job_id} 로 조회
+    """
+    try:
+        validate_ad_request(req)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        weather_info, context_str = await _build_request_context(current_user)
+
+        payload = {
+            "request": req.model_dump(mode="json"),
+            "weather_info": weather_info,
+            "context_str": context_str,
+        }
+        job = await job_service.enqueue_ad_job(
+            db,
+            user_id=current_user.id if current_user else None,
+            payload=payload,
+        )
+        return AdJobCreateResponse(job_id=job.id, job_status=job.status)
+
+    except Exception as e:
+        await db.rollback()
+        print(f"[ADS][JOB][ERROR] {repr(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/jobs/{job_id}", response_model=AdJobStatusResponse)
+async def get_ad_job_status(
+    job_id: str,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """작업 상태 + 부분 결과 조회 (로그인 사용자의 작업은 본인만 조회 가능)"""
+    job = await job_service.get_ad_job_async(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+
+    if job.user_id is not None:
+        token = credentials.credentials if credentials else None
+        current_user = await auth_service.get_user_from_token(db, token)
+        if not current_user or current_user.id != job.user_id:
+            raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+
+    result = job.result or {}
+    return AdJobStatusResponse(
+        job_id=job.id,
+        job_status=job.status,
+        stage=job.stage,
+        attempts=job.attempts or 0,
+        image_url=result.get("image_url"),
+        audio_url=result.get("audio_url"),
+        video_url=result.get("video_url"),
+        ad_request_id=job.ad_request_id,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
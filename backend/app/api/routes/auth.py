@@ -3,19 +3,18 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from backend.app.core.database import get_db
-from backend.app.core.schemas import UserCreate, UserNameFind, PasswordFind, UserProfile, UserUpdate, PasswordReset, Token
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.app.core.database import get_async_db
+from backend.app.core.schemas import UserCreate, UserNameFind, PasswordFind, UserProfile, UserUpdate, PasswordReset, Token, UserSnapshot
 from backend.app.services import auth_service
-from backend.app.core.models import User
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    """현재 로그인한 사용자 조회"""
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> UserSnapshot:
+    """현재 로그인한 사용자 조회 (스냅샷 캐시 사용)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="인증 정보를 확인할 수 없습니다",
@@ -26,22 +25,22 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     if token_data is None or token_data.username is None:
         raise credentials_exception
     
-    user = auth_service.get_user_by_username(db, username=token_data.username)
+    user = await auth_service.get_user_snapshot(db, token_data.username)
     if user is None:
         raise credentials_exception
     
     return user
 
 @router.post("/register", response_model=UserProfile, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """회원가입"""
     # 중복 확인
-    if auth_service.get_user_by_username(db, user_data.username):
+    if await auth_service.get_user_by_username(db, user_data.username):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="이미 존재하는 사용자명입니다"
         )
-    if auth_service.get_user_by_email(db, user_data.email):
+    if await auth_service.get_user_by_email(db, user_data.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="이미 존재하는 이메일입니다"
@@ -49,7 +48,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 
     # 사용자 생성
     try:
-        user = auth_service.create_user(db, user_data)
+        user = await auth_service.create_user(db, user_data)
         return user
 
     except IntegrityError:
@@ -59,9 +58,9 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="사용자 생성 중 서버 오류가 발생했습니다")
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """로그인"""
-    user = auth_service.authenticate_user(db, form_data.username, form_data.password)
+    user = await auth_service.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -74,9 +73,9 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/find/username")
-async def find_username(user_data: UserNameFind, db: Session = Depends(get_db)):
+async def find_username(user_data: UserNameFind, db: AsyncSession = Depends(get_async_db)):
     """아이디 찾기"""
-    user = auth_service.get_user_by_email(db, user_data.email);
+    user = await auth_service.get_user_by_email(db, user_data.email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -90,9 +89,9 @@ async def find_username(user_data: UserNameFind, db: Session = Depends(get_db)):
     }
 
 @router.post("/find/password")
-async def find_password(user_data: PasswordFind, db: Session = Depends(get_db)):
+async def find_password(user_data: PasswordFind, db: AsyncSession = Depends(get_async_db)):
     """비밀번호 찾기"""
-    user = auth_service.get_user_by_username_email(db, user_data.username, user_data.email)
+    user = await auth_service.get_user_by_username_email(db, user_data.username, user_data.email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -105,10 +104,10 @@ async def find_password(user_data: PasswordFind, db: Session = Depends(get_db)):
     }
 
 @router.post("/reset/password")
-async def reset_password(user_data: PasswordReset, db: Session = Depends(get_db)):
+async def reset_password(user_data: PasswordReset, db: AsyncSession = Depends(get_async_db)):
     """비밀번호 초기화"""
     try:
-        updated_user = auth_service.reset_password(db, user_data)
+        updated_user = await auth_service.reset_password(db, user_data)
         if not updated_user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="사용자를 찾을 수 없습니다."
@@ -120,20 +119,20 @@ async def reset_password(user_data: PasswordReset, db: Session = Depends(get_db)
 
 
 @router.get("/me", response_model=UserProfile)
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: UserSnapshot = Depends(get_current_user)):
     """현재 사용자 정보 조회"""
     return current_user
 
 @router.put("/me", response_model=UserProfile)
 async def update_me(
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """현재 사용자 정보 수정"""
     update_data = user_update.model_dump(exclude_unset=True)
     try:
-        updated_user = auth_service.update_user_profile(db, current_user.id, update_data)
+        updated_user = await auth_service.update_user_profile(db, current_user.id, update_data)
         if not updated_user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="사용자를 찾을 수 없습니다."
@@ -148,12 +147,12 @@ async def update_me(
 
 @router.delete("/me", status_code=status.HTTP_200_OK)
 async def delete_me(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """사용자 탈퇴"""
     try:
-        success = auth_service.delete_user(db, current_user.id)
+        success = await auth_service.delete_user(db, current_user.id)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="사용자를 찾을 수 없습니다"
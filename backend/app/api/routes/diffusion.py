@@ -2,13 +2,16 @@
 import asyncio
 import base64
 import io
+import json
 import os
+import time
 from io import BytesIO
 from typing import Optional
 
 import numpy as np
 from fastapi import APIRouter, HTTPException, Body, UploadFile, File, Form
 from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
 from PIL import Image
 
 from backend.app.services.diffusion_service import (
@@ -16,14 +19,27 @@ from backend.app.services.diffusion_service import (
     generate_poster_image,
     run_auto_synthesis,
     generate_poster_with_product_b64,
-    _mask_array_to_pil
+    generate_variants_with_product_b64,
+    get_batch_stats,
+    get_embedding_cache_stats,
+    get_model_memory_report,
+    _mask_array_to_pil,
+    DIFFUSION_BATCH_ENABLED,
+    DIFFUSION_BATCH_MAX_SIZE,
 )
-from backend.app.services.segmentation import get_segmentation_singleton
+from backend.app.services.segmentation import (
+    get_segmentation_singleton,
+    get_mask_cache_stats,
+    get_segmentation_stats,
+)
+from backend.app.services.depth_service import get_depth_cache_stats
+from backend.app.api.deps import parse_optional_coords
 from backend.app.core.diffusion_presets import resolve_preset
 from backend.app.core.schemas import (
     DiffusionControlRequest,
     DiffusionControlResponse,
     DiffusionAutoRequest,
+    DiffusionVariantsRequest,
     CompositionMode,
 )
 
@@ -31,10 +47,16 @@ router = APIRouter(prefix="/diffusion", tags=["Diffusion"])
 
 # ----------------------------------------------------------------------------
 # 요청 동시성 제한 (GPU/CPU 보호용)
+# - 배칭 활성화 시: 배치 크기만큼 동시에 들여보내야 스케줄러가 묶을 수 있음
+#   (GPU 직렬화는 배치 스케줄러 스레드가 담당)
 # ----------------------------------------------------------------------------
-_max_concurrency = int(os.getenv("DIFFUSION_MAX_CONCURRENCY", "1"))
+_default_concurrency = DIFFUSION_BATCH_MAX_SIZE if DIFFUSION_BATCH_ENABLED else 1
+_max_concurrency = int(os.getenv("DIFFUSION_MAX_CONCURRENCY", str(_default_concurrency)))
 _request_semaphore = asyncio.Semaphore(max(1, _max_concurrency))
 
+# 변형 생성 요청 1건당 최대 변형 수
+DIFFUSION_MAX_VARIANTS = int(os.getenv("DIFFUSION_MAX_VARIANTS", "8"))
+
 # ======================================================================
 # 유틸리티 함수 (Base64 변환은 API 경계에서 처리)
 # ======================================================================
@@ -194,6 +216,9 @@ async def diffusion_synthesize_auto(request_body: DiffusionAutoRequest = Body(..
                 request_body.composition_mode,
                 request_body.control_weight,
                 request_body.ip_adapter_scale,
+                request_body.segmentation_mode,
+                list(request_body.product_box) if request_body.product_box else None,
+                list(request_body.product_point) if request_body.product_point else None,
             )
 
         final_image_b64 = base64.b64encode(image_bytes).decode("utf-8")
@@ -315,6 +340,14 @@ async def diffusion_synthesize_auto_upload(
         None,
         description="프리셋 IP_Adapter 값을 덮어쓰고 싶을 때만 지정 (비우면 프리셋 사용)",
     ),
+    segmentation_mode: str | None = Form(
+        None,
+        description="누끼 모드 fast/auto (비우면 서버 기본값)",
+    ),
+    product_box_raw: str | None = Form(
+        None,
+        description="제품 영역 박스 'x1,y1,x2,y2' (원본 픽셀 좌표, fast 모드 전용)",
+    ),
 ):
     print("[API] Received auto synthesis upload request.")
 
@@ -325,6 +358,9 @@ async def diffusion_synthesize_auto_upload(
 
     control_weight = _parse_optional_float(control_weight_raw)
     ip_adapter_scale = _parse_optional_float(ip_adapter_scale_raw)
+    product_box = parse_optional_coords(product_box_raw, 4)
+    if segmentation_mode and segmentation_mode not in ("fast", "auto"):
+        raise HTTPException(status_code=400, detail=f"Invalid segmentation_mode: {segmentation_mode}")
 
     try:
         async with _request_semaphore:
@@ -335,6 +371,8 @@ async def diffusion_synthesize_auto_upload(
                 composition_mode,
                 control_weight,
                 ip_adapter_scale,
+                segmentation_mode or None,
+                product_box,
             )
 
         print("[API] Auto synthesis (upload) successful. Returning PNG image.")
@@ -355,6 +393,91 @@ async def diffusion_synthesize_auto_upload(
 
 
 
+def _resolve_variants(request_body: DiffusionVariantsRequest) -> list[tuple[str, int]]:
+    """prompts / seeds 조합 → [(prompt, seed), ...]"""
+    prompts = [p for p in (request_body.prompts or []) if p and p.strip()]
+    if not prompts:
+        prompts = [request_body.prompt or ""]
+    seeds = request_body.seeds
+
+    if seeds is None:
+        seeds = list(range(len(prompts)))
+    elif len(prompts) == 1 and len(seeds) > 1:
+        prompts = prompts * len(seeds)
+    elif len(seeds) == 1 and len(prompts) > 1:
+        seeds = seeds * len(prompts)
+
+    if len(prompts) != len(seeds):
+        raise HTTPException(
+            status_code=400,
+            detail=f"prompts({len(prompts)})와 seeds({len(seeds)}) 개수가 맞지 않습니다.",
+        )
+    if len(prompts) > DIFFUSION_MAX_VARIANTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"변형은 최대 {DIFFUSION_MAX_VARIANTS}개까지 요청할 수 있습니다.",
+        )
+    return list(zip(prompts, seeds))
+
+
+@router.post(
+    "/synthesize/variants",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "content": {"application/x-ndjson": {}},
+            "description": "변형이 완료될 때마다 한 줄씩 전송되는 NDJSON 스트림",
+        }
+    },
+)
+async def diffusion_synthesize_variants(request_body: DiffusionVariantsRequest = Body(...)):
+    """
+    한 제품 이미지 + 여러 프롬프트/시드 → 여러 배경 변형 생성
+    - Base64 디코딩 / 세그멘테이션 / depth 추출은 한 번만 수행
+    - 디노이징은 배치 스케줄러로 묶어서 실행
+    - 완료되는 순서대로 NDJSON 한 줄씩 스트리밍:
+        {"index", "prompt", "seed", "image_b64"}
+      마지막 줄: {"done": true, "count", "elapsed_sec"} (실패 시 {"error": ...})
+    """
+    variants = _resolve_variants(request_body)
+    print(f"[API] Received variants synthesis request. variants={len(variants)}")
+
+    async def _stream():
+        started = time.monotonic()
+        count = 0
+        async with _request_semaphore:
+            try:
+                results = generate_variants_with_product_b64(
+                    variants,
+                    request_body.product_image_b64,
+                    request_body.composition_mode,
+                    request_body.control_weight,
+                    request_body.ip_adapter_scale,
+                    request_body.segmentation_mode,
+                    list(request_body.product_box) if request_body.product_box else None,
+                    list(request_body.product_point) if request_body.product_point else None,
+                )
+                async for idx, image_bytes in iterate_in_threadpool(results):
+                    count += 1
+                    prompt, seed = variants[idx]
+                    yield json.dumps({
+                        "index": idx,
+                        "prompt": prompt,
+                        "seed": seed,
+                        "image_b64": base64.b64encode(image_bytes).decode("utf-8"),
+                    }) + "\n"
+            except Exception as e:
+                print(f"[FATAL][VARIANTS] An unexpected error occurred: {e}")
+                yield json.dumps({"error": str(e), "count": count}, ensure_ascii=False) + "\n"
+                return
+
+        elapsed = time.monotonic() - started
+        print(f"[API] Variants synthesis done. count={count}, elapsed={elapsed:.1f}s")
+        yield json.dumps({"done": True, "count": count, "elapsed_sec": round(elapsed, 2)}) + "\n"
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+
 # ----------------------------------------------------------------------------
 # 기존 포스터 생성 엔드포인트 (prompt + optional product image)
 # ----------------------------------------------------------------------------
@@ -388,3 +511,18 @@ async def generate_image(
     except Exception as e:
         print(f"[FATAL][GENERATE] An unexpected error occurred: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# ----------------------------------------------------------------------------
+# 배치 스케줄러 상태 조회 (부하 테스트 시 images per GPU-second 확인용)
+# ----------------------------------------------------------------------------
+@router.get("/stats")
+async def diffusion_stats():
+    return {
+        "batch": get_batch_stats(),
+        "segmentation": get_segmentation_stats(),
+        "segmentation_mask_cache": get_mask_cache_stats(),
+        "depth_cache": get_depth_cache_stats(),
+        "embedding_cache": get_embedding_cache_stats(),
+        "models": get_model_memory_report(),
+    }
@@ -1,19 +1,36 @@
 # gpt.py
 
-from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import json
-import base64
+import asyncio
 # 기존
 from backend.app.services.gpt_service import generate_marketing_idea
 # 추가
-from backend.app.services.gpt_service import generate_conversation_response, CONVERSATION_MEMORIES, USER_CONTEXTS
-from backend.app.core.schemas import GPTRequest, GPTResponse, DialogueGPTResponse_AD, DialogueGPTResponse_Profile, FinalContentSchema
-from backend.app.core.database import get_db
-from backend.app.services import auth_service, memory_service
+from backend.app.services.gpt_service import (
+    generate_conversation_response,
+    stream_conversation_response,
+    conversation_sessions,
+    guest_contexts,
+    attach_session_image,
+    end_conversation_session,
+    get_session_stats,
+    get_dialogue_output_stats,
+)
+from backend.app.core.schemas import GPTRequest, GPTResponse, DialogueGPTResponse_AD, DialogueGPTResponse_Profile, FinalContentSchema, UserSnapshot
+from backend.app.core.database import get_async_db
+from backend.app.services import memory_search, memory_service
+from backend.app.services.auth_service import get_user_cache_stats
+from backend.app.api.deps import get_optional_user
+from backend.app.services.upstream_clients import get_upstream_stats
+from backend.app.services.token_budget import get_usage_stats
+from backend.app.services.intent_router import get_router_stats
+from backend.app.services.response_cache import get_response_cache_stats
+from backend.app.services.embedding_service import get_embedding_stats
+from backend.app.services.depth_service import DEPTH_PRECOMPUTE_ON_UPLOAD, precompute_depth
 
 # new 요청 스키마
 class DialogueRequest(BaseModel):
@@ -21,7 +38,6 @@ class DialogueRequest(BaseModel):
     guest_session_id: Optional[str] = Field(None, description="비로그인 사용자 세션 ID (프론트엔드 생성)")
 
 router = APIRouter(prefix="/gpt", tags=["GPT"])
-security = HTTPBearer(auto_error=False)
 
 
 # endpoint
@@ -44,12 +60,91 @@ async def generate_marketing_content(req: GPTRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _resolve_dialogue_context(
+    request: DialogueRequest, current_user: Optional[UserSnapshot], db: AsyncSession
+):
+    """
+    대화 요청 → (session_key, is_guest, user_context)
+    - 사용자 인증은 get_optional_user 의존성에서 처리 (스냅샷 캐시)
+    - 로그인 사용자 첫 턴에만 장기 메모리 DB 조회
+    """
+    # 1. 세션 키 결정
+    if current_user:
+        session_key = f"user-{current_user.id}"
+        is_guest = False
+    elif request.guest_session_id:
+        session_key = f"guest-{request.guest_session_id}"
+        is_guest = True
+    else:
+        raise HTTPException(status_code=400, detail="로그인하거나 guest_session_id를 제공하세요")
+    
+    session_exists = await conversation_sessions.contains_async(session_key)
+    
+    # 2. 사용자 컨텍스트 구성 (첫 요청에만 DB 쿼리)
+    user_context = None
+    if current_user and not session_exists:
+        # 로그인 사용자 첫 대화: 프로필 + 장기 메모리 조회
+        menu_items_str = None
+        if current_user.menu_items:
+            try:
+                menu_list = json.loads(current_user.menu_items)
+                menu_items_str = ", ".join(menu_list)
+            except:
+                menu_items_str = current_user.menu_items
+        
+        # 장기 메모리 조회 (DB 쿼리 10-30ms)
+        long_term_memory = await memory_service.get_user_memory(db, current_user.id)
+
+        # 유사 업종 전략 검색 (pgvector HNSW / SQLite는 numpy 브루트포스)
+        similar_strategies = await memory_search.find_similar_strategies(
+            db,
+            current_user.id,
+            long_term_memory,
+            fallback_query_text=f"{current_user.business_type or ''} {current_user.location or ''} {request.user_input}".strip(),
+        )
+        
+        user_context = {
+            "business_type": current_user.business_type,
+            "location": current_user.location,
+            "menu_items": menu_items_str,
+            "business_hours": current_user.business_hours,
+            "memory": long_term_memory,  # 장기 메모리 추가
+            "similar_strategies": similar_strategies,
+        }
+        print(f"📊 로그인 사용자 첫 대화: 컨텍스트 조회 완료 (user_id={current_user.id})")
+    elif is_guest:
+        # 비로그인 사용자: guest_contexts에서 user_context 확인 (정보 수집 완료 여부)
+        user_context = await guest_contexts.get_async(session_key)
+        if user_context:
+            print(f"🔄 비로그인 사용자 정보 재사용 (guest_contexts): {session_key}")
+        else:
+            if session_exists:
+                print(f"⚡ 비로그인 세션 재사용 (정보 없음): {session_key}")
+            else:
+                print(f"🆕 비로그인 사용자 첫 대화: {session_key}")
+    elif session_exists and current_user:
+        print(f"⚡ 로그인 세션 재사용: DB 쿼리 스킵 (user_id={current_user.id})")
+
+    return session_key, is_guest, user_context
+
+
+async def _handle_dialogue_completion(response, session_key: str):
+    """
+    대화 완료 시 세션 정리
+    (로그인 사용자 장기 메모리 갱신은 gpt_service에서 백그라운드 태스크로 시작됨)
+    """
+    if response.is_complete:
+        # 세션 삭제
+        if await end_conversation_session(session_key):
+            print(f"🗑️  대화 완료, 세션 삭제: {session_key}")
+
+
 # 추가: multi-turn 대화 API : dialogue 요청 처리
 @router.post("/dialogue")
 async def handle_marketing_dialog(
     request: DialogueRequest,
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db)
+    current_user: Optional[UserSnapshot] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     langchain 활용 multi-turn 대화 처리
@@ -58,106 +153,91 @@ async def handle_marketing_dialog(
     - 비로그인 사용자: 메모리 없이 매번 새 대화
     """
     try:
-        # 1. 사용자 인증 (optional)
-        token = credentials.credentials if credentials else None
-        current_user = auth_service.get_user_from_token(db, token)
-        
-        # 2. 세션 키 결정
-        if current_user:
-            session_key = f"user-{current_user.id}"
-            is_guest = False
-        elif request.guest_session_id:
-            session_key = f"guest-{request.guest_session_id}"
-            is_guest = True
-        else:
-            raise HTTPException(status_code=400, detail="로그인하거나 guest_session_id를 제공하세요")
-        
-        session_exists = session_key in CONVERSATION_MEMORIES
-        
-        # 3. 사용자 컨텍스트 구성 (첫 요청에만 DB 쿼리)
-        user_context = None
-        if current_user and not session_exists:
-            # 로그인 사용자 첫 대화: 프로필 + 장기 메모리 조회
-            menu_items_str = None
-            if current_user.menu_items:
-                try:
-                    menu_list = json.loads(current_user.menu_items)
-                    menu_items_str = ", ".join(menu_list)
-                except:
-                    menu_items_str = current_user.menu_items
-            
-            # 장기 메모리 조회 (DB 쿼리 10-30ms)
-            long_term_memory = memory_service.get_user_memory(db, current_user.id)
-            
-            user_context = {
-                "business_type": current_user.business_type,
-                "location": current_user.location,
-                "menu_items": menu_items_str,
-                "business_hours": current_user.business_hours,
-                "memory": long_term_memory  # 장기 메모리 추가
-            }
-            print(f"📊 로그인 사용자 첫 대화: 컨텍스트 조회 완료 (user_id={current_user.id})")
-        elif is_guest:
-            # 비로그인 사용자: USER_CONTEXTS에서 user_context 확인 (정보 수집 완료 여부)
-            user_context = USER_CONTEXTS.get(session_key)
-            if user_context:
-                print(f"🔄 비로그인 사용자 정보 재사용 (USER_CONTEXTS): {session_key}")
-            else:
-                if session_exists:
-                    print(f"⚡ 비로그인 세션 재사용 (정보 없음): {session_key}")
-                else:
-                    print(f"🆕 비로그인 사용자 첫 대화: {session_key}")
-        elif session_exists and current_user:
-            print(f"⚡ 로그인 세션 재사용: DB 쿼리 스킵 (user_id={current_user.id})")
+        # 1~3. 세션 키 + 사용자 컨텍스트 (사용자 인증은 의존성에서 처리)
+        session_key, is_guest, user_context = await _resolve_dialogue_context(
+            request, current_user, db
+        )
         
         # 4. 대화 진행 (세션 재사용 시 캐싱된 컨텍스트 사용)
         response = await generate_conversation_response(
             user_input=request.user_input,
             session_key=session_key,
             is_guest=is_guest,
-            user_context=user_context  # 첫 요청: 딕셔너리, 이후: None (세션에서 재사용)
+            user_context=user_context,  # 첫 요청: 딕셔너리, 이후: None (세션에서 재사용)
+            user_id=current_user.id if current_user else None
         )
         
         # 5. 대화 완료 시 처리
-        if response.is_complete:
-            # 세션 삭제
-            if session_key in CONVERSATION_MEMORIES:
-                del CONVERSATION_MEMORIES[session_key]
-                print(f"🗑️  대화 완료, 세션 삭제: {session_key}")
-            
-            # 로그인 사용자만 메모리 업데이트
-            if current_user:
-                try:
-                    # final_content가 있으면 포함, 없으면 None 전달
-                    final_content_dict = None
-                    if hasattr(response, 'final_content') and response.final_content:
-                        final_content_dict = response.final_content.dict()
-                    
-                    # 장기 메모리 업데이트 (비동기 - GPT API + 임베딩)
-                    await memory_service.update_user_memory(
-                        db=db,
-                        user_id=current_user.id,
-                        conversation_history=response.conversation_history,
-                        final_content=final_content_dict
-                    )
-                    print(f"✅ 장기 메모리 업데이트 완료 (JSON 형식)")
-                    
-                except Exception as mem_err:
-                    print(f"⚠️ 메모리 업데이트 실패 (비치명적): {mem_err}")
-                    # 메모리 업데이트 실패해도 응답은 반환
+        await _handle_dialogue_completion(response, session_key)
         
         # 6. 응답 반환 - session_key 설정 (model_copy 사용)
         return response.model_copy(update={"session_key": session_key})
     
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=500, detail=f"GPT 응답 서비스 오류: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"서버 오류: {e}")
 
 
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post(
+    "/dialogue/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def handle_marketing_dialog_stream(
+    request: DialogueRequest,
+    current_user: Optional[UserSnapshot] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    /gpt/dialogue 스트리밍 버전 (Server-Sent Events)
+    
+    - event: delta → {"text": next_question 증가분} (토큰 도착 즉시)
+    - event: final → /gpt/dialogue와 동일한 최종 응답 JSON
+    - event: error → {"detail": 오류 메시지}
+    """
+    # 인증/세션 키 오류는 스트림 시작 전에 일반 HTTP 에러로 반환
+    session_key, is_guest, user_context = await _resolve_dialogue_context(
+        request, current_user, db
+    )
+
+    async def _stream():
+        try:
+            async for kind, payload in stream_conversation_response(
+                user_input=request.user_input,
+                session_key=session_key,
+                is_guest=is_guest,
+                user_context=user_context,
+                user_id=current_user.id if current_user else None,
+            ):
+                if kind == "delta":
+                    yield _sse_event("delta", {"text": payload})
+                    continue
+
+                await _handle_dialogue_completion(payload, session_key)
+                final = payload.model_copy(update={"session_key": session_key})
+                yield _sse_event("final", final.model_dump(mode="json"))
+        except Exception as e:
+            print(f"❌ [Dialogue Stream] {session_key}: {e}")
+            yield _sse_event("error", {"detail": f"GPT 응답 서비스 오류: {e}"})
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # nginx 버퍼링 비활성화
+    )
+
+
 
 @router.post("/dialogue/upload-image")
 async def upload_product_image(
+    background_tasks: BackgroundTasks,
     session_key: str = Form(..., description="세션 키 (user-{id} 또는 guest-{uuid})"),
     product_image: UploadFile = File(..., description="제품 사진 파일")
 ):
@@ -173,7 +253,7 @@ async def upload_product_image(
     """
     try:
         # 1. 세션 존재 확인
-        if session_key not in CONVERSATION_MEMORIES:
+        if not await conversation_sessions.contains_async(session_key):
             raise HTTPException(
                 status_code=404, 
                 detail=f"세션을 찾을 수 없습니다: {session_key}"
@@ -182,13 +262,21 @@ async def upload_product_image(
         # 2. 이미지 읽기
         image_bytes = await product_image.read()
         
-        # 3. base64로 인코딩
-        image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-        
-        # 4. 세션에 저장
-        CONVERSATION_MEMORIES[session_key]["product_image"] = image_base64
+        # 3. MinIO에 저장 후 세션에는 참조 경로만 보관 (base64를 메모리에 들고 있지 않음)
+        image_ref = await asyncio.to_thread(
+            attach_session_image, session_key, image_bytes, product_image.content_type
+        )
+        if image_ref is None:
+            raise HTTPException(
+                status_code=404, 
+                detail=f"세션을 찾을 수 없습니다: {session_key}"
+            )
         
         print(f"📸 제품 이미지 업로드 완료: {session_key} ({len(image_bytes)} bytes)")
+
+        # 5. depth 맵 선계산 (응답 후 백그라운드 실행 → 광고 생성 시 캐시 hit)
+        if DEPTH_PRECOMPUTE_ON_UPLOAD:
+            background_tasks.add_task(precompute_depth, image_bytes)
         
         return {
             "message": "이미지 업로드 성공",
@@ -203,3 +291,23 @@ async def upload_product_image(
             status_code=500,
             detail=f"이미지 업로드 실패: {str(e)}"
         )
+
+
+@router.get("/stats")
+async def gpt_stats():
+    """
+    대화 세션 저장소 상태 + 대화 응답 파싱/재요청 비율 + 토큰 사용량/캐시 hit/비용 + 모델 티어별 비율/지연
+    + 업스트림(OpenAI/날씨)별 호출 수/에러/지연 시간 + 백그라운드 장기 메모리 갱신 현황
+    + 단발성 호출(마케팅 아이디어/지역명 변환) 응답 캐시 hit 비율 + 인증 사용자 스냅샷 캐시
+    """
+    return {
+        "sessions": await get_session_stats(),
+        "dialogue_output": get_dialogue_output_stats(),
+        "token_usage": get_usage_stats(),
+        "router": get_router_stats(),
+        "memory_updates": memory_service.get_memory_update_stats(),
+        "embeddings": get_embedding_stats(),
+        "response_cache": get_response_cache_stats(),
+        "user_cache": get_user_cache_stats(),
+        "upstreams": get_upstream_stats(),
+    }
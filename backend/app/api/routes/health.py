@@ -0,0 +1,23 @@
+# health.py
+# 프로세스 상태 확인용 엔드포인트
+# - /health/live  : 프로세스가 응답 가능하면 항상 200 (재시작 판단용)
+# - /health/ready : 모델 로드 + 워밍업이 끝났을 때만 200, 아니면 503 (트래픽 투입 판단용)
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from backend.app.services.warmup_service import get_readiness
+
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+
+@router.get("/live")
+async def liveness():
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def readiness():
+    state = get_readiness()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
@@ -2,116 +2,65 @@
 # 광고 생성 히스토리 조회 API
 
 from typing import Optional
-import json
 from fastapi import APIRouter, HTTPException, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.app.core.database import get_db
-from backend.app.core.models import User, AdRequest
-from backend.app.core.schemas import AdHistoryResponse, AdHistoryItem
-from backend.app.services import auth_service
+from backend.app.core.database import get_async_db
+from backend.app.core.schemas import AdHistoryResponse, AdHistoryItem, UserSnapshot
+from backend.app.api.deps import get_required_user
+from backend.app.services import history_service
 
 router = APIRouter(prefix="/history", tags=["History"])
-security = HTTPBearer(auto_error=False)
-
-
-def parse_gpt_output(text: Optional[str]) -> dict:
-    """
-    gpt_output_text를 파싱하여 idea, caption, hashtags 추출
-    형식: "아이디어: {idea}\n캡션: {caption}\n해시태그: {hashtags}"
-    """
-    result = {"idea": None, "caption": None, "hashtags": None}
-    
-    if not text:
-        return result
-    
-    lines = text.split('\n')
-    for line in lines:
-        line = line.strip()
-        if line.startswith('아이디어:'):
-            result['idea'] = line.split('아이디어:')[1].strip()
-        elif line.startswith('캡션:'):
-            result['caption'] = line.split('캡션:')[1].strip()
-        elif line.startswith('해시태그:'):
-            result['hashtags'] = line.split('해시태그:')[1].strip()
-    
-    return result
 
 
 @router.get("", response_model=AdHistoryResponse)
 async def get_user_history(
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 50,
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db),
+    include_total: bool = True,
+    skip: int = 0,
+    current_user: UserSnapshot = Depends(get_required_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    로그인한 사용자의 광고 생성 히스토리 조회
-    
-    - **skip**: 건너뛸 항목 수 (페이지네이션)
-    - **limit**: 가져올 최대 항목 수 (기본값: 50)
-    
+    로그인한 사용자의 광고 생성 히스토리 조회 (최신순, keyset 페이지네이션)
+
+    - **cursor**: 이전 응답의 next_cursor (없으면 첫 페이지)
+    - **limit**: 가져올 최대 항목 수 (기본값: 50, 최대 HISTORY_MAX_LIMIT)
+    - **include_total**: 전체 개수 포함 여부 (다음 페이지 요청에서는 false 권장)
+    - **skip**: (이전 방식) 건너뛸 항목 수 — cursor가 있으면 무시
+
     인증 필수: Bearer 토큰 필요
     """
-    # 인증 확인
-    if not credentials:
-        raise HTTPException(
-            status_code=401,
-            detail="인증이 필요합니다. Authorization 헤더에 Bearer 토큰을 포함해주세요."
+    try:
+        rows, next_cursor = await history_service.get_history_page(
+            db, current_user.id, limit=limit, cursor=cursor, skip=skip
         )
-    
-    token = credentials.credentials
-    current_user = auth_service.get_user_from_token(db, token)
-    
-    if not current_user:
-        raise HTTPException(
-            status_code=401,
-            detail="유효하지 않은 토큰입니다."
-        )
-    
-    # 사용자의 광고 요청 히스토리 조회 (삭제되지 않은 것만, 최신순)
-    total_count = (
-        db.query(AdRequest)
-        .filter(
-            AdRequest.user_id == current_user.id,
-            AdRequest.is_deleted == False
-        )
-        .count()
-    )
-    
-    ad_requests = (
-        db.query(AdRequest)
-        .filter(
-            AdRequest.user_id == current_user.id,
-            AdRequest.is_deleted == False
-        )
-        .order_by(AdRequest.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-    
-    # 히스토리 항목 변환
-    history_items = []
-    for ad in ad_requests:
-        # gpt_output_text 파싱
-        parsed = parse_gpt_output(ad.gpt_output_text)
-        
-        history_items.append(
-            AdHistoryItem(
-                id=ad.id,
-                created_at=ad.created_at,
-                idea=parsed['idea'],
-                caption=parsed['caption'],
-                hashtags=parsed['hashtags'],
-                image_url=ad.image_url,
-                audio_url=ad.audio_url,
-                video_url=ad.video_url,
-            )
+    except history_service.InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    total_count = None
+    if include_total:
+        total_count = await history_service.count_user_history(db, current_user.id)
+
+    # 히스토리 항목 변환 (idea/caption/hashtags 컬럼 직접 사용)
+    history_items = [
+        AdHistoryItem(
+            id=row.id,
+            created_at=row.created_at,
+            idea=row.idea,
+            caption=row.caption,
+            hashtags=history_service.format_hashtags(row.hashtags),
+            image_url=row.image_url,
+            audio_url=row.audio_url,
+            video_url=row.video_url,
         )
-    
+        for row in rows
+    ]
+
     return AdHistoryResponse(
         total=total_count,
         history=history_items,
+        next_cursor=next_cursor,
+        has_more=next_cursor is not None,
     )
@@ -1,12 +1,13 @@
 # segmentation_test.py
 
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from fastapi.responses import StreamingResponse, JSONResponse
 from PIL import Image
 import io
 
 from h11 import PRODUCT_ID
 
+from backend.app.api.deps import parse_optional_coords
 from backend.app.services.segmentation import ProductSegmentation
 from backend.app.services.segmentation import preview_segmentation
 
@@ -14,10 +15,24 @@ router = APIRouter(prefix="/segmentation_test", tags=["Segmentation"])
 
 model = ProductSegmentation()
 
+def _parse_prompt(mode: str | None, box: str | None, point: str | None):
+    """Form 문자열 → (mode, box, point). 잘못된 값이면 400"""
+    if mode and mode not in ("fast", "auto"):
+        raise HTTPException(status_code=400, detail=f"Invalid mode: {mode}")
+
+    return mode or None, parse_optional_coords(box, 4), parse_optional_coords(point, 2)
+
+
 @router.post("/remove_bg", response_class=StreamingResponse, responses={200: {"content": {"image/png": {}}}})
-async def remove_bg(file: UploadFile = File(...)):
+async def remove_bg(
+    file: UploadFile = File(...),
+    mode: str | None = Form(None, description="fast | auto (비우면 서버 기본값)"),
+    box: str | None = Form(None, description="제품 박스 'x1,y1,x2,y2' (fast 모드)"),
+    point: str | None = Form(None, description="제품 위의 점 'x,y' (fast 모드)"),
+):
+    mode, box, point = _parse_prompt(mode, box, point)
     img = Image.open(io.BytesIO(await file.read())).convert("RGB")
-    mask, cutout = model.remove_background(img)
+    mask, cutout = model.remove_background(img, mode=mode, box=box, point=point)
 
     cutout_rgb = cutout.convert("RGB")
     cutout_mask = cutout.getchannel("A")  # 알파 채널 → 마스크
@@ -36,11 +51,17 @@ async def remove_bg(file: UploadFile = File(...)):
     return StreamingResponse(output, media_type="image/png")
 
 @router.post("/preview")
-async def segmentation_preview(file: UploadFile = File(...)):
+async def segmentation_preview(
+    file: UploadFile = File(...),
+    mode: str | None = Form(None, description="fast | auto (비우면 서버 기본값)"),
+    box: str | None = Form(None, description="제품 박스 'x1,y1,x2,y2' (fast 모드)"),
+    point: str | None = Form(None, description="제품 위의 점 'x,y' (fast 모드)"),
+):
+    mode, box, point = _parse_prompt(mode, box, point)
     img_bytes = await file.read()
     image = Image.open(io.BytesIO(img_bytes)).convert("RGB")
 
-    result = preview_segmentation(image)
+    result = preview_segmentation(image, mode=mode, box=box, point=point)
 
     return JSONResponse(
         {
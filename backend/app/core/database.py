@@ -1,10 +1,12 @@
 # database.py
 # SQLAlchemy 데이터베이스 설정
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
+import threading
 
 # PostgreSQL 연결 (기본값: docker-compose 설정)
 DATABASE_URL = os.getenv(
@@ -35,3 +37,88 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ---------------------------------------------------------
+# 비동기 엔진 / 세션 (async 라우트·서비스용)
+# - 동기 engine/SessionLocal은 Alembic, GPU 워커, SQL 세션 저장소에서 계속 사용
+# - 드라이버: Postgres → asyncpg, SQLite 폴백 → aiosqlite
+# - Alembic이 이 모듈을 import해도 async 드라이버가 필요 없도록 첫 사용 시 생성
+# ---------------------------------------------------------
+def _to_async_url(url: str) -> str:
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    if dialect in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _to_async_url(DATABASE_URL))
+
+_async_lock = threading.Lock()
+_async_engine = None
+_async_session_factory = None
+
+
+def _register_pgvector(async_engine):
+    """asyncpg 커넥션마다 vector 타입 코덱 등록 (UserMemory.embedding 읽기/쓰기)"""
+    try:
+        from pgvector.asyncpg import register_vector
+    except ImportError:
+        return
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.run_async(register_vector)
+
+
+def get_async_engine():
+    global _async_engine, _async_session_factory
+
+    if _async_engine is not None:
+        return _async_engine
+
+    with _async_lock:
+        if _async_engine is None:
+            if "sqlite" in ASYNC_DATABASE_URL:
+                _async_engine = create_async_engine(ASYNC_DATABASE_URL)
+            else:
+                _async_engine = create_async_engine(
+                    ASYNC_DATABASE_URL,
+                    pool_pre_ping=True,
+                    pool_size=10,
+                    max_overflow=20
+                )
+                _register_pgvector(_async_engine)
+            # commit 후에도 속성 접근 시 lazy refresh(IO)가 일어나지 않도록 expire_on_commit=False
+            _async_session_factory = async_sessionmaker(
+                _async_engine,
+                expire_on_commit=False,
+                autoflush=False
+            )
+    return _async_engine
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    """SessionLocal의 비동기 버전 (라우트 밖 백그라운드 작업용)"""
+    get_async_engine()
+    return _async_session_factory()
+
+
+async def get_async_db():
+    """비동기 데이터베이스 세션 의존성"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engine():
+    """FastAPI shutdown 시 비동기 커넥션 풀 정리"""
+    global _async_engine, _async_session_factory
+
+    with _async_lock:
+        engine_to_close = _async_engine
+        _async_engine = _async_session_factory = None
+    if engine_to_close is not None:
+        await engine_to_close.dispose()
@@ -1,9 +1,10 @@
 # models.py
 # SQLAlchemy 모델 정의
 
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, Text, ForeignKey, Float, JSON
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, Text, ForeignKey, Float, JSON, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
+import uuid
 from backend.app.core.database import Base
 from pgvector.sqlalchemy import Vector
 
@@ -48,6 +49,8 @@ class AdRequest(BaseModel):
     weather_info = Column(String(200), nullable=True)  # 날씨 정보
     gpt_prompt = Column(Text, nullable=True)  # GPT에 보낸 전체 프롬프트
     gpt_output_text = Column(Text, nullable=True)  # GPT 생성 아이디어 + 캡션
+    idea = Column(Text, nullable=True)  # 광고 아이디어 (히스토리 조회용, gpt_output_text 파싱 불필요)
+    caption = Column(Text, nullable=True)  # 캡션
     diffusion_prompt = Column(Text, nullable=True)  # Diffusion 모델에 사용된 프롬프트
     bgm_prompt = Column(Text, nullable=True)
     
@@ -61,6 +64,22 @@ class AdRequest(BaseModel):
     # Relationship
     user = relationship("User", back_populates="ad_requests")
 
+    # 히스토리 keyset 페이지네이션용 (삭제되지 않은 행만)
+    __table_args__ = (
+        Index(
+            "ix_ad_requests_user_created_active",
+            "user_id",
+            "created_at",
+            "id",
+            postgresql_where=text("is_deleted = false"),
+            sqlite_where=text("is_deleted = 0"),
+        ),
+    )
+
+
+# user_memories.embedding 차원 (text-embedding-3-small dimensions 파라미터로 축소, 변경 시 마이그레이션 필요)
+EMBEDDING_DIMENSIONS = 512
+
 
 class UserMemory(BaseModel):
     """사용자별 장기 기억 (JSON 구조화 + 임베딩)"""
@@ -73,8 +92,10 @@ class UserMemory(BaseModel):
     marketing_strategy = Column(JSON, nullable=True)
     # 예: {"target_audience": {...}, "competitive_advantage": [...], ...}
 
-    # 임베딩 벡터 (OpenAI text-embedding-3-small: 1536차원)
-    embedding = Column(Vector(1536), nullable=True)
+    # 임베딩 벡터 (OpenAI text-embedding-3-small, EMBEDDING_DIMENSIONS차원으로 축소)
+    embedding = Column(Vector(EMBEDDING_DIMENSIONS), nullable=True)
+    # 임베딩 원문(전략 JSON)의 콘텐츠 해시 → 같으면 재임베딩 생략 (embedding_service.content_hash)
+    embedding_hash = Column(String(64), nullable=True)
 
     # 메타 정보
     importance = Column(Float, default=1.0)  # 중요도 가중치
@@ -84,3 +105,54 @@ class UserMemory(BaseModel):
 
     # Relationship
     user = relationship("User", back_populates="memories")
+
+    # 임베딩 코사인 유사도 검색용 HNSW 인덱스 (memory_search, pgvector 전용 옵션)
+    __table_args__ = (
+        Index(
+            "ix_user_memories_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+        ),
+    )
+
+
+class AdJob(Base):
+    """광고 미디어 생성 작업 큐 (API 프로세스가 적재 → GPU 워커가 가져가서 처리)"""
+    __tablename__ = "ad_jobs"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
+
+    # queued | running | succeeded | failed
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    stage = Column(String(20), nullable=True)  # image | audio | video | save
+
+    request_payload = Column(JSON, nullable=False)  # AdMediaGenerateRequest + 컨텍스트(weather/context)
+    result = Column(JSON, nullable=True)  # {"image_url", "audio_url", "video_url"} (진행 중에는 부분 결과)
+    error = Column(Text, nullable=True)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String(100), nullable=True)  # 작업을 잡은 워커 식별자 (host:pid:thread)
+    ad_request_id = Column(Integer, ForeignKey("ad_requests.id", ondelete="SET NULL"), nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # 진행 보고 시각 (stale 작업 재큐잉 기준)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class DialogueSession(Base):
+    """멀티턴 대화 세션 상태 (SESSION_BACKEND=sql일 때 워커/노드 간 공유)"""
+    __tablename__ = "dialogue_sessions"
+
+    namespace = Column(String(30), primary_key=True)  # conversation | guest_context
+    key = Column(String(100), primary_key=True)  # user-{id} | guest-{uuid}
+
+    data = Column(JSON, nullable=False)  # 대화 기록 / 의도 / 프롬프트 변수 / 제품 이미지 경로
+    size_bytes = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=True, index=True)  # 마지막 접근 + TTL
@@ -204,6 +204,31 @@ class DiffusionAutoRequest(BaseModel):
         default=None,
         description="프리셋 IP-Adapter 값을 덮어쓰고 싶은 경우에만 사용. None이면 프리셋 값 사용.",
     )
+    # 세그멘테이션 옵션
+    segmentation_mode: Optional[Literal["fast", "auto"]] = Field(
+        default=None,
+        description="누끼 모드 (fast: 박스/포인트 프롬프트, auto: 자동 마스크 생성). None이면 서버 기본값",
+    )
+    product_box: Optional[Tuple[float, float, float, float]] = Field(
+        default=None,
+        description="제품 영역 박스 [x1, y1, x2, y2] (원본 이미지 픽셀 좌표, fast 모드 전용)",
+    )
+    product_point: Optional[Tuple[float, float]] = Field(
+        default=None,
+        description="제품 위의 한 점 [x, y] (원본 이미지 픽셀 좌표, fast 모드 전용)",
+    )
+
+
+# 한 제품 이미지로 여러 배경 변형 생성 (/diffusion/synthesize/variants)
+class DiffusionVariantsRequest(DiffusionAutoRequest):
+    prompts: Optional[List[str]] = Field(
+        default=None,
+        description="변형별 프롬프트 목록. 비우면 prompt 하나를 seeds 수만큼 사용",
+    )
+    seeds: Optional[List[int]] = Field(
+        default=None,
+        description="변형별 시드 목록. 비우면 0, 1, 2, ... (prompts와 길이가 같으면 1:1, prompts가 1개면 시드별 반복)",
+    )
 
 
 # 최종 이미지 반환
@@ -302,6 +327,27 @@ class AdMediaGenerateRequest(BaseModel):
     )
 
 
+# 비동기 광고 생성 작업 (POST /ads/jobs → GET /ads/jobs/{id})
+class AdJobCreateResponse(BaseResponse):
+    job_id: str = Field(..., description="생성된 작업 ID")
+    job_status: str = Field(..., description="작업 상태 (queued | running | succeeded | failed)")
+
+
+class AdJobStatusResponse(BaseResponse):
+    job_id: str = Field(..., description="작업 ID")
+    job_status: str = Field(..., description="작업 상태 (queued | running | succeeded | failed)")
+    stage: Optional[str] = Field(None, description="진행 중인 단계 (image | audio | video | save)")
+    attempts: int = Field(0, description="시도 횟수")
+    image_url: Optional[str] = Field(None, description="생성된 이미지 URL (완료된 단계만 채워짐)")
+    audio_url: Optional[str] = Field(None, description="생성된 BGM URL")
+    video_url: Optional[str] = Field(None, description="합성된 mp4 URL")
+    ad_request_id: Optional[int] = Field(None, description="완료 시 저장된 AdRequest ID")
+    error: Optional[str] = Field(None, description="실패 사유")
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
 
 # ==================== Weather / History ====================
 
@@ -481,6 +527,22 @@ class UserProfile(BaseModel):
         from_attributes = True
 
 
+class UserSnapshot(BaseModel):
+    """인증 사용자 캐시용 스냅샷 (users 테이블 조회 없이 요청 간 공유, 읽기 전용)"""
+    id: int
+    username: str
+    email: str
+    business_type: Optional[str]
+    location: Optional[str]
+    menu_items: Optional[str]
+    business_hours: Optional[str]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+        frozen = True
+
+
 class Token(BaseModel):
     """JWT 토큰 응답"""
     access_token: str
@@ -578,8 +640,10 @@ class AdHistoryItem(BaseModel):
 
 class AdHistoryResponse(BaseModel):
     """광고 히스토리 응답"""
-    total: int = Field(..., description="전체 히스토리 개수")
+    total: Optional[int] = Field(None, description="전체 히스토리 개수 (include_total=true일 때, 짧게 캐시됨)")
     history: List[AdHistoryItem] = Field(..., description="히스토리 항목 리스트")
+    next_cursor: Optional[str] = Field(None, description="다음 페이지 커서 (없으면 마지막 페이지)")
+    has_more: bool = Field(False, description="다음 페이지 존재 여부")
 
     class Config:
         from_attributes = True
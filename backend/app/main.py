@@ -2,9 +2,16 @@
 
 # 캐시파일 /home/shared/models 하위로 설정
 import os
-# cold start 방지 위해 서버 실행 시 SAM, Diffusion 모델 로드
-from backend.app.services.segmentation import get_segmentation_singleton
-from backend.app.services.diffusion_service import _load_pipeline
+# cold start 방지 위해 서버 실행 시 SAM, Diffusion 모델 로드 + 워밍업
+from backend.app.services.warmup_service import run_model_startup
+from backend.app.services.session_store import run_sweeper
+from backend.app.services.upstream_clients import aclose_clients
+from backend.app.services.memory_service import drain_memory_updates
+from backend.app.services.gpt_service import (
+    conversation_sessions,
+    guest_contexts,
+    SESSION_SWEEP_INTERVAL_SEC,
+)
 import asyncio
 
 
@@ -24,10 +31,14 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles 
 from backend.app.api.router import api_router
-from backend.app.core.database import engine, Base
+from backend.app.core.database import engine, Base, dispose_async_engine
 from backend.app.core.minio_client import minio_client, BUCKET_IMAGE, BUCKET_VIDEO, BUCKET_AUDIO
 
             
+# API 프로세스에서 SAM/Diffusion을 미리 로드할지 여부
+# - GPU 워커(backend.app.worker)를 따로 띄우는 배포에서는 false로 두어 API 프로세스가 GPU를 점유하지 않도록 함
+PRELOAD_GPU_MODELS = os.getenv("PRELOAD_GPU_MODELS", "true").lower() == "true"
+
 # 데이터베이스 테이블 생성
 Base.metadata.create_all(bind=engine)
 
@@ -43,26 +54,29 @@ async def startup_event():
         else:
             print(f"📦 Bucket exists: {bucket}")
 
+    # 만료된 대화 세션 주기적 정리
+    app.state.session_sweeper_task = asyncio.create_task(
+        run_sweeper([conversation_sessions, guest_contexts], SESSION_SWEEP_INTERVAL_SEC)
+    )
+
     # -----------------------------
-    # SAM + Diffusion Preload 추가
+    # SAM + Diffusion Preload + Warmup
     # -----------------------------
-    print("🚀 [Startup] Preloading SAM + Diffusion models...")
-
-    # SAM 모델 미리 로드 (GPU 상주)
-    try:
-        await asyncio.to_thread(lambda: get_segmentation_singleton())
-        print("🧩 [Startup] SAM model loaded.")
-    except Exception as e:
-        print(f"❌ [Startup] SAM preload failed: {e}")
-
-    # Diffusion 파이프라인 미리 로드
-    try:
-        await asyncio.to_thread(_load_pipeline)
-        print("🎨 [Startup] Diffusion pipeline loaded.")
-    except Exception as e:
-        print(f"❌ [Startup] Diffusion preload failed: {e}")
-
-    print("✨ [Startup] All models ready.")
+    # 백그라운드로 실행해 /api/health/live는 바로 응답, /api/health/ready는 워밍업 완료 후 200
+    if not PRELOAD_GPU_MODELS:
+        print("⏭️ [Startup] PRELOAD_GPU_MODELS=false → GPU 모델 로드 생략 (워커 프로세스 사용)")
+    app.state.model_startup_task = asyncio.create_task(
+        asyncio.to_thread(run_model_startup, PRELOAD_GPU_MODELS)
+    )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # 진행 중인 장기 메모리 갱신 마무리 (OpenAI 호출이 끝난 뒤 커넥션 풀 정리)
+    await drain_memory_updates()
+    # 공유 HTTP 커넥션 풀 정리
+    await aclose_clients()
+    # 비동기 DB 커넥션 풀 정리
+    await dispose_async_engine()
 
 # media 디렉토리 정적 서빙
 app.mount(
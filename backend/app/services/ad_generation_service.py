@@ -0,0 +1,208 @@
+# ad_generation_service.py
+# 광고 미디어(이미지/BGM/mp4) 생성 파이프라인
+# - /api/ads/generate (동기 응답)와 GPU 워커(backend/worker.py)가 공용으로 사용
+# - 미디어 생성 함수는 블로킹 함수이므로 async 라우트에서는 asyncio.to_thread로 호출
+#   (DB 저장은 워커용 save_ad_request / 라우트용 save_ad_request_async)
+
+import json
+from typing import Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.app.core.models import AdRequest
+from backend.app.core.schemas import AdMediaGenerateRequest, AudioGenerationRequest
+from backend.app.services.diffusion_service import generate_poster_with_product_b64
+from backend.app.services.audio_service import generate_bgm_bytes
+from backend.app.services.media_service import (
+    compose_image_and_audio_to_mp4_bytes,
+    overlay_caption_on_image,
+)
+from backend.app.services import minio_service
+from backend.app.services.history_service import invalidate_history_total
+
+
+# 진행 상황 콜백: (stage, 현재까지의 부분 결과)
+ProgressCallback = Callable[[str, dict], None]
+
+
+def validate_ad_request(req: AdMediaGenerateRequest) -> None:
+    """필수 프롬프트/이미지 검증 (실패 시 ValueError)"""
+    if req.generate_image and not (req.image_prompt or ""):
+        raise ValueError("generate_image=true 인 경우 image_prompt는 필수입니다.")
+    if req.generate_image and not req.product_image_b64:
+        raise ValueError("generate_image=true 인 경우 product_image_b64는 필수입니다.")
+    if req.generate_audio and not (req.bgm_prompt or ""):
+        raise ValueError("generate_audio=true 인 경우 bgm_prompt는 필수입니다.")
+
+
+def run_ad_media_pipeline(
+    req: AdMediaGenerateRequest,
+    on_progress: Optional[ProgressCallback] = None,
+) -> dict:
+    """
+    이미지 생성 → (캡션 합성) → BGM 생성 → mp4 합성 → MinIO 업로드까지 수행.
+
+    Returns:
+        {"image_url", "audio_url", "video_url"} (생성하지 않은 항목은 None)
+    """
+    def _report(stage: str):
+        if on_progress:
+            on_progress(stage, dict(result))
+
+    result = {"image_url": None, "audio_url": None, "video_url": None}
+    image_bytes = None
+    audio_bytes = None
+
+    # -------------------------
+    # 1) 이미지 생성 (옵션)
+    # -------------------------
+    if req.generate_image:
+        print("[ADS] 제품 이미지 기반 합성 포스터 생성 모드 진입")
+        _report("image")
+
+        # diffusion 파이프라인 전체 호출 (Base64 → 세그멘테이션 → 합성)
+        image_bytes = generate_poster_with_product_b64(
+            prompt=req.image_prompt or "",
+            product_image_b64=req.product_image_b64,
+            composition_mode=req.composition_mode,
+            control_weight=None,
+            ip_adapter_scale=None,
+        )
+
+        # caption이 있으면 텍스트 합성
+        if req.caption and req.generate_video:
+            print(f"[ADS] 캡션 텍스트 오버레이 적용: {req.caption}")
+            image_bytes = overlay_caption_on_image(
+                image_bytes=image_bytes,
+                caption=req.caption,
+                mode="bottom",      # 디폴트 : 하단
+                font_mode="bold",   # 디폴트 : 볼드
+                font_size_ratio=0.06,
+                color=(255, 255, 255)
+            )
+        else:
+            print("[ADS] 캡션 없음 -> 텍스트 합성 스킵")
+
+        # MinIO 업로드
+        result["image_url"] = minio_service.upload_bytes(image_bytes, content_type="image/png")
+        print(f"[이미지 생성/저장 완료] {result['image_url']}")
+    else:
+        print("[옵션] 이미지 생성 비활성화 상태")
+
+    # -------------------------
+    # 2) 오디오 생성 (옵션)
+    # -------------------------
+    if req.generate_audio:
+        _report("audio")
+        audio_req = AudioGenerationRequest(
+            prompt=req.bgm_prompt or "",
+            duration_sec=12.0,  # PoC에서 고정 길이
+        )
+        audio_bytes = generate_bgm_bytes(audio_req)
+
+        # MinIO 업로드
+        result["audio_url"] = minio_service.upload_bytes(audio_bytes, content_type="audio/wav")
+        print(f"[BGM 생성/저장 완료] {result['audio_url']}")
+    else:
+        print("[옵션] 오디오 생성 비활성화 상태")
+
+    # -------------------------
+    # 3) mp4 합성 (옵션)
+    # -------------------------
+    if req.generate_video:
+        # mp4는 이미지 + 오디오가 모두 있을 때만 의미 있음
+        if not (result["image_url"] and result["audio_url"]):
+            print("[mp4 합성 스킵] image_url 또는 audio_url 없음")
+        else:
+            _report("video")
+            try:
+                video_bytes = compose_image_and_audio_to_mp4_bytes(
+                    image_bytes=image_bytes,
+                    audio_bytes=audio_bytes,
+                )
+                result["video_url"] = minio_service.upload_bytes(
+                    video_bytes,
+                    content_type="video/mp4",
+                )
+                print(f"[mp4 합성/업로드 완료] {result['video_url']}")
+            except Exception as e:
+                print(f"[mp4 합성 실패] {e}")
+    else:
+        print("[옵션] mp4 합성 비활성화 상태")
+
+    return result
+
+
+def _build_ad_request(
+    user_id: Optional[int],
+    req: AdMediaGenerateRequest,
+    media: dict,
+    weather_info: Optional[str] = None,
+    context_str: Optional[str] = None,
+) -> AdRequest:
+    idea = req.idea or ""
+    caption = req.caption or ""
+    hashtags = req.hashtags or []
+
+    # GPT 출력 텍스트 생성
+    gpt_output_text = f"아이디어: {idea}\n캡션: {caption}\n해시태그: {', '.join(hashtags)}"
+
+    ad_request = AdRequest(
+        user_id=user_id,
+        voice_text=None,
+        weather_info=weather_info,
+        gpt_prompt=context_str,          # full 프롬프트 대신 context 요약 정도
+        gpt_output_text=gpt_output_text, # GPT 결과 요약 문자열
+        idea=idea,
+        caption=caption,
+        diffusion_prompt=req.image_prompt or "",
+        bgm_prompt=req.bgm_prompt or "",
+        image_url=media.get("image_url"),
+        audio_url=media.get("audio_url"),
+        video_url=media.get("video_url"),
+        hashtags=json.dumps(hashtags, ensure_ascii=False),
+    )
+    return ad_request
+
+
+def save_ad_request(
+    db: Session,
+    user_id: Optional[int],
+    req: AdMediaGenerateRequest,
+    media: dict,
+    weather_info: Optional[str] = None,
+    context_str: Optional[str] = None,
+    commit: bool = True,
+) -> AdRequest:
+    """
+    광고 요청 기록을 DB에 저장 (로그인/비로그인 공통, 워커용 동기 버전)
+    commit=False면 flush로 id만 받고 커밋은 호출 측에 맡김 (작업 완료 처리와 한 트랜잭션)
+    """
+    ad_request = _build_ad_request(user_id, req, media, weather_info, context_str)
+    db.add(ad_request)
+    if not commit:
+        db.flush()
+        return ad_request
+    db.commit()
+    db.refresh(ad_request)
+    print(f"[DB 저장 완료] AdRequest ID: {ad_request.id}")
+    return ad_request
+
+
+async def save_ad_request_async(
+    db: AsyncSession,
+    user_id: Optional[int],
+    req: AdMediaGenerateRequest,
+    media: dict,
+    weather_info: Optional[str] = None,
+    context_str: Optional[str] = None,
+) -> AdRequest:
+    """save_ad_request의 AsyncSession 버전 (API 라우트용)"""
+    ad_request = _build_ad_request(user_id, req, media, weather_info, context_str)
+    db.add(ad_request)
+    await db.commit()
+    await db.refresh(ad_request)
+    invalidate_history_total(user_id)
+    print(f"[DB 저장 완료] AdRequest ID: {ad_request.id}")
+    return ad_request
@@ -2,14 +2,20 @@
 # 인증 관련 비즈니스 로직 (JWT, 비밀번호 해싱 등)
 
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from backend.app.core.models import User
-from backend.app.core.schemas import UserCreate, TokenData, PasswordReset
+from backend.app.core.schemas import UserCreate, TokenData, PasswordReset, UserSnapshot
+from backend.app.services.history_service import invalidate_history_total
 import json
 
 # 비밀번호 해싱 설정 (Argon2 사용 - 72바이트 제한 없음, 더 안전)
@@ -20,6 +26,94 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7일
 
+# 토큰 subject(username) → 사용자 스냅샷 캐시
+# - 같은 프로세스의 프로필 수정/비밀번호 변경/탈퇴는 즉시 무효화
+# - 다른 워커 프로세스의 변경은 TTL 안에서만 늦게 반영되므로 TTL은 짧게 유지
+USER_CACHE_TTL_SEC = float(os.getenv("USER_CACHE_TTL_SEC", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+
+class _UserSnapshotCache:
+    """절대 TTL + 개수 상한 LRU (스레드 안전)"""
+
+    def __init__(self, ttl_sec: float, max_entries: int):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        # username -> (snapshot, expires_at)
+        self._items: "OrderedDict[str, tuple[UserSnapshot, float]]" = OrderedDict()
+        # 진행 중인 DB 조회: username -> (무효화 세대, 조회 수)
+        # 조회 시작 후 무효화된 키는 결과를 저장하지 않음 (오래된 값 재등록 방지)
+        # 조회가 모두 끝나면 항목 삭제 → 동시에 조회 중인 사용자 수만큼만 유지
+        self._lookups: dict = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, username: str) -> Optional[UserSnapshot]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(username)
+            if item is None or item[1] <= now:
+                if item is not None:
+                    del self._items[username]
+                self.misses += 1
+                return None
+            self._items.move_to_end(username)
+            self.hits += 1
+            return item[0]
+
+    def begin_lookup(self, username: str) -> int:
+        """캐시 miss 후 DB 조회 시작 → 현재 세대 반환 (반드시 end_lookup으로 종료)"""
+        with self._lock:
+            generation, in_flight = self._lookups.get(username, (0, 0))
+            self._lookups[username] = (generation, in_flight + 1)
+            return generation
+
+    def end_lookup(self, username: str, generation: int, snapshot: Optional[UserSnapshot] = None):
+        """DB 조회 종료 (snapshot이 있고 조회 중 무효화되지 않았으면 저장)"""
+        with self._lock:
+            current, in_flight = self._lookups[username]
+            if in_flight <= 1:
+                del self._lookups[username]
+            else:
+                self._lookups[username] = (current, in_flight - 1)
+
+            if snapshot is None or self.ttl_sec <= 0 or current != generation:
+                return
+            self._items[username] = (snapshot, time.monotonic() + self.ttl_sec)
+            self._items.move_to_end(username)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def invalidate(self, username: str):
+        with self._lock:
+            self._items.pop(username, None)
+            if username in self._lookups:
+                generation, in_flight = self._lookups[username]
+                self._lookups[username] = (generation + 1, in_flight)
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "max_entries": self.max_entries,
+                "ttl_sec": self.ttl_sec,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_user_cache = _UserSnapshotCache(USER_CACHE_TTL_SEC, USER_CACHE_MAX_ENTRIES)
+
+
+def get_user_cache_stats() -> dict:
+    return _user_cache.stats()
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """비밀번호 검증"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -50,49 +144,56 @@ def decode_access_token(token: str) -> Optional[TokenData]:
     except JWTError:
         return None
 
-def get_user_by_username(db: Session, username: str) -> Optional[User]:
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
     """사용자명으로 사용자 조회"""
-    return db.query(User).filter(User.username == username, User.is_deleted == False).first()
+    result = await db.execute(
+        select(User).where(User.username == username, User.is_deleted == False)
+    )
+    return result.scalars().first()
 
-def get_user_by_username_email(db: Session, username: str, email: str) -> Optional[User]:
+async def get_user_by_username_email(db: AsyncSession, username: str, email: str) -> Optional[User]:
     """사용자명 + 이메일으로 사용자 조회"""
-    return (
-        db.query(User)
-        .filter(User.username == username, User.email == email, User.is_deleted == False)
-        .first()
+    result = await db.execute(
+        select(User)
+        .where(User.username == username, User.email == email, User.is_deleted == False)
     )
+    return result.scalars().first()
 
-def reset_password(db:Session, user_data:PasswordReset) -> User:
+async def reset_password(db: AsyncSession, user_data: PasswordReset) -> User:
     """비밀번호 변경"""
-    user = get_user_by_username(db, user_data.username)
+    user = await get_user_by_username(db, user_data.username)
     if not user:
         return None
 
     try:
         hashed_password = get_password_hash(user_data.password)
         user.hashed_password = hashed_password
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
+        _user_cache.invalidate(user.username)
         return user
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise e
 
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     """이메일로 사용자 조회"""
-    return db.query(User).filter(User.email == email, User.is_deleted == False).first()
+    result = await db.execute(
+        select(User).where(User.email == email, User.is_deleted == False)
+    )
+    return result.scalars().first()
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
     """사용자 인증"""
-    user = get_user_by_username(db, username)
+    user = await get_user_by_username(db, username)
     if not user:
         return None
     if not verify_password(password, user.hashed_password):
         return None
     return user
 
-def create_user(db: Session, user_data: UserCreate) -> User:
+async def create_user(db: AsyncSession, user_data: UserCreate) -> User:
     """새 사용자 생성"""
     # 메뉴 리스트를 JSON 문자열로 변환
     menu_items_str = json.dumps(user_data.menu_items, ensure_ascii=False) if user_data.menu_items else None
@@ -108,20 +209,23 @@ def create_user(db: Session, user_data: UserCreate) -> User:
     )
     db.add(db_user)
     try:
-        db.commit()
+        await db.commit()
     except IntegrityError as e:
-        db.rollback()
+        await db.rollback()
         raise e
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise e
 
-    db.refresh(db_user)
+    await db.refresh(db_user)
     return db_user
 
-def update_user_profile(db: Session, user_id: int, update_data: dict) -> User:
+async def update_user_profile(db: AsyncSession, user_id: int, update_data: dict) -> User:
     """사용자 프로필 업데이트"""
-    user = db.query(User).filter(User.id == user_id, User.is_deleted == False).first()
+    result = await db.execute(
+        select(User).where(User.id == user_id, User.is_deleted == False)
+    )
+    user = result.scalars().first()
     if not user:
         return None
 
@@ -134,17 +238,35 @@ def update_user_profile(db: Session, user_id: int, update_data: dict) -> User:
             if value is not None and hasattr(user, key):
                 setattr(user, key, value)
 
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
+        _user_cache.invalidate(user.username)
         return user
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise e
 
-def get_user_from_token(db: Session, token: Optional[str]) -> Optional[User]:
+async def get_user_snapshot(db: AsyncSession, username: str) -> Optional[UserSnapshot]:
+    """사용자명 → 사용자 스냅샷 (캐시 hit이면 DB 조회 생략, 없는 사용자는 캐시하지 않음)"""
+    snapshot = _user_cache.get(username)
+    if snapshot is not None:
+        return snapshot
+
+    generation = _user_cache.begin_lookup(username)
+    snapshot = None
+    try:
+        user = await get_user_by_username(db, username)
+        if user is not None:
+            snapshot = UserSnapshot.model_validate(user)
+    finally:
+        _user_cache.end_lookup(username, generation, snapshot)
+    return snapshot
+
+
+async def get_user_from_token(db: AsyncSession, token: Optional[str]) -> Optional[UserSnapshot]:
     """
     토큰으로부터 사용자 조회 (선택적)
-    - 토큰이 유효하면 사용자 정보 반환
+    - 토큰이 유효하면 사용자 스냅샷 반환 (USER_CACHE_TTL_SEC 동안 캐시)
     - 토큰이 없거나 유효하지 않으면 None 반환
     """
     if token is None:
@@ -155,14 +277,19 @@ def get_user_from_token(db: Session, token: Optional[str]) -> Optional[User]:
         if token_data is None or token_data.username is None:
             return None
 
-        user = get_user_by_username(db, username=token_data.username)
-        return user
+        return await get_user_snapshot(db, token_data.username)
     except Exception:
         return None
 
 
-def delete_user(db: Session, user_id: int) -> bool:
-    user = db.query(User).filter(User.id == user_id, User.is_deleted == False).first()
+async def delete_user(db: AsyncSession, user_id: int) -> bool:
+    # AsyncSession은 lazy load 불가 → soft delete 대상 관계를 함께 로드
+    result = await db.execute(
+        select(User)
+        .where(User.id == user_id, User.is_deleted == False)
+        .options(selectinload(User.ad_requests), selectinload(User.memories))
+    )
+    user = result.scalars().first()
     if not user:
         return False
 
@@ -175,8 +302,10 @@ def delete_user(db: Session, user_id: int) -> bool:
         for mem in user.memories:
             mem.is_deleted = True
 
-        db.commit()
+        await db.commit()
+        _user_cache.invalidate(user.username)
+        invalidate_history_total(user.id)
         return True
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise e
@@ -0,0 +1,225 @@
+# cache_utils.py
+# 서비스 공용 캐시 유틸
+# - hash_array: 디코딩된 이미지(ndarray) 내용 기반 해시 (같은 사진이면 포맷/메타데이터가 달라도 동일 키)
+# - LRUByteCache: 바이트 용량 기준으로 제한되는 스레드 안전 LRU (hit/miss 카운터 포함)
+# - DiskNpzCache: ndarray를 압축 npz로 저장하는 디스크 캐시 (총 용량 초과 시 오래 안 쓴 파일부터 삭제)
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+
+
+def hash_array(array: np.ndarray, *extra: Any) -> str:
+    """ndarray 내용 + shape/dtype + 추가 파라미터로 sha256 키 생성"""
+    h = hashlib.sha256()
+    h.update(str(array.shape).encode())
+    h.update(str(array.dtype).encode())
+    h.update(np.ascontiguousarray(array).tobytes())
+    for item in extra:
+        h.update(b"|")
+        h.update(repr(item).encode())
+    return h.hexdigest()
+
+
+def _default_sizeof(value: Any) -> int:
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return 1024  # 크기를 알 수 없는 객체는 대략값
+
+
+class LRUByteCache:
+    """
+    바이트 용량 제한 LRU 캐시
+
+    Args:
+        max_bytes: 저장 가능한 최대 총 크기 (0이면 캐시 비활성화)
+        sizeof: 값의 크기(bytes) 계산 함수
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        sizeof: Optional[Callable[[Any], int]] = None,
+        name: str = "cache",
+    ):
+        self.name = name
+        self.max_bytes = max(0, int(max_bytes))
+        self._sizeof = sizeof or _default_sizeof
+        self._items: "OrderedDict[Hashable, tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value: Any):
+        size = self._sizeof(value)
+        if self.max_bytes == 0 or size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes and self._items:
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class DiskNpzCache:
+    """
+    ndarray 디스크 캐시 (key.npz, np.savez_compressed)
+
+    - get 시 파일 mtime을 갱신해 LRU 순서를 유지
+    - put 후 디렉토리 총 크기가 max_bytes를 넘으면 mtime이 오래된 파일부터 삭제
+    """
+
+    def __init__(self, directory: str, max_bytes: int, name: str = "disk-cache"):
+        self.name = name
+        self.directory = directory
+        self.max_bytes = max(0, int(max_bytes))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.enabled = self.max_bytes > 0
+
+        if self.enabled:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+            except OSError as e:
+                print(f"[Cache][WARN] {self.name} 디렉토리 생성 실패 → 디스크 캐시 비활성화: {e}")
+                self.enabled = False
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        if not self.enabled:
+            return None
+
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                array = data["array"]
+            os.utime(path, None)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except Exception as e:
+            # 손상된 파일은 삭제 후 miss 처리
+            print(f"[Cache][WARN] {self.name} 읽기 실패({key}): {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return array
+
+    def put(self, key: str, array: np.ndarray):
+        if not self.enabled:
+            return
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(f, array=array)
+            os.replace(tmp_path, path)  # 원자적 교체 (동시 쓰기 안전)
+        except Exception as e:
+            print(f"[Cache][WARN] {self.name} 쓰기 실패({key}): {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        self._evict_if_needed()
+
+    def _evict_if_needed(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(".npz"):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            entries.sort()  # mtime 오래된 순
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    self.evictions += 1
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "directory": self.directory,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
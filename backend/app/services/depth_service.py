@@ -0,0 +1,129 @@
+# depth_service.py
+# MiDaS Depth 전처리 단계 (ControlNet Depth 입력 생성)
+# - synthesize_image에서 분리된 독립 단계: 같은 제품 사진이면 프롬프트/합성 모드가 바뀌어도 depth는 한 번만 계산
+# - 캐시 키: 디코딩된 원본 이미지 해시 + detect/image 해상도
+# - 메모리 LRU + 디스크 npz 2단계 (디스크 캐시는 API 프로세스와 GPU 워커가 공유)
+# - /gpt/dialogue/upload-image에서 업로드 시점에 미리 계산(precompute_depth) 가능
+#   (API가 GPU 모델을 올리는 구성에서만 기본 활성화, DEPTH_PRECOMPUTE_ON_UPLOAD 참고)
+
+import os
+import threading
+from io import BytesIO
+
+import numpy as np
+import torch
+from PIL import Image
+from controlnet_aux import MidasDetector
+
+from backend.app.services.cache_utils import DiskNpzCache, LRUByteCache, hash_array
+
+
+HF_CACHE_DIR = "/home/shared/models"  # 공용 캐시/모델 디렉터리 경로 상수
+
+DEPTH_DETECT_RESOLUTION = 512
+DEPTH_IMAGE_RESOLUTION = 768
+
+DEPTH_CACHE_MEM_MB = int(os.getenv("DEPTH_CACHE_MEM_MB", "128"))
+DEPTH_CACHE_DISK_MB = int(os.getenv("DEPTH_CACHE_DISK_MB", "512"))
+DEPTH_CACHE_DIR = os.getenv("DEPTH_CACHE_DIR", "/home/shared/cache/depth_maps")
+# 업로드 시점 depth 선계산 여부 (MiDaS를 API 프로세스에 올리므로 기본값은 PRELOAD_GPU_MODELS를 따름
+# → GPU 없는 API(PRELOAD_GPU_MODELS=false)에서는 꺼지고, 워커가 작업 처리 중 계산 + 디스크 캐시 공유)
+DEPTH_PRECOMPUTE_ON_UPLOAD = os.getenv(
+    "DEPTH_PRECOMPUTE_ON_UPLOAD", os.getenv("PRELOAD_GPU_MODELS", "true")
+).lower() == "true"
+
+_midas_detector = None
+_load_lock = threading.Lock()
+# MidasDetector는 스레드 안전하지 않으므로 추론 직렬화
+_infer_lock = threading.Lock()
+
+_depth_mem_cache = LRUByteCache(DEPTH_CACHE_MEM_MB * 1024 * 1024, name="depth-mem")
+_depth_disk_cache = DiskNpzCache(DEPTH_CACHE_DIR, DEPTH_CACHE_DISK_MB * 1024 * 1024, name="depth-disk")
+
+
+def load_depth_detector():
+    """Depth 전처리기(Midas) 로드 (전역 캐싱)"""
+    global _midas_detector
+
+    if _midas_detector is not None:
+        return _midas_detector
+
+    with _load_lock:
+        if _midas_detector is not None:
+            return _midas_detector
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        print("[Midas Detector] Depth 전처리기 로드 중...")
+        _midas_detector = MidasDetector.from_pretrained(
+            "lllyasviel/ControlNet",
+            cache_dir=HF_CACHE_DIR,
+        ).to(device)
+        print("[Midas Detector] Depth 전처리기 성공적으로 로드됨.")
+
+    return _midas_detector
+
+
+def _depth_cache_key(image: Image.Image, detect_resolution: int, image_resolution: int) -> str:
+    img_rgb = np.asarray(image.convert("RGB"))
+    return hash_array(img_rgb, "midas-v1", detect_resolution, image_resolution)
+
+
+def estimate_depth(
+    image: Image.Image,
+    detect_resolution: int = DEPTH_DETECT_RESOLUTION,
+    image_resolution: int = DEPTH_IMAGE_RESOLUTION,
+) -> Image.Image:
+    """
+    배경 포함 원본 이미지 → 0~255로 정규화된 depth 맵 (PIL)
+    캐시 hit이면 MiDaS를 실행하지 않음
+    """
+    key = _depth_cache_key(image, detect_resolution, image_resolution)
+
+    depth_np = _depth_mem_cache.get(key)
+    if depth_np is None:
+        depth_np = _depth_disk_cache.get(key)
+        if depth_np is not None:
+            _depth_mem_cache.put(key, depth_np)  # 디스크 hit은 메모리로 승격
+
+    if depth_np is not None:
+        print(f"[Depth] cache hit ({key[:12]})")
+        return Image.fromarray(depth_np)
+
+    detector = load_depth_detector()
+    with _infer_lock:
+        depth_raw = detector(
+            image,
+            detect_resolution=detect_resolution,
+            image_resolution=image_resolution,
+        )
+
+    depth_np = np.array(depth_raw)
+    depth_np = depth_np - depth_np.min()
+    if depth_np.max() > 0:
+        depth_np = depth_np / depth_np.max()
+    depth_np = (depth_np * 255).astype("uint8")
+
+    _depth_mem_cache.put(key, depth_np)
+    _depth_disk_cache.put(key, depth_np)
+
+    return Image.fromarray(depth_np)
+
+
+def precompute_depth(image_bytes: bytes):
+    """
+    업로드된 이미지 바이트로 depth를 미리 계산해 캐시에 적재
+    (BackgroundTasks에서 호출 — 실패해도 합성 시점에 다시 계산되므로 로그만 남김)
+    """
+    try:
+        image = Image.open(BytesIO(image_bytes)).convert("RGB")
+        estimate_depth(image)
+        print(f"[Depth] precomputed ({image.size[0]}x{image.size[1]})")
+    except Exception as e:
+        print(f"[Depth][WARN] precompute failed: {e}")
+
+
+def get_depth_cache_stats() -> dict:
+    return {
+        "memory": _depth_mem_cache.stats(),
+        "disk": _depth_disk_cache.stats(),
+    }
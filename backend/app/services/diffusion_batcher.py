@@ -0,0 +1,150 @@
+# diffusion_batcher.py
+# 동시에 들어온 diffusion 요청을 짧은 윈도우 동안 모아서 한 번의 배치 디노이징으로 실행하는 스케줄러
+#
+# - 요청 스레드(asyncio.to_thread 워커)는 submit()으로 작업을 넣고 Future를 기다림
+# - 전용 스케줄러 스레드 하나만 파이프라인을 호출 → GPU 접근이 자연스럽게 직렬화됨
+# - batch_key(스텝 수, guidance, 해상도, ControlNet/IP-Adapter 강도 등)가 같은 작업끼리만 묶음
+
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, List
+
+
+class BatchJob:
+    """스케줄러에 제출되는 단일 작업 (payload는 실행 함수가 해석)"""
+
+    def __init__(self, batch_key: Hashable, payload: Any):
+        self.batch_key = batch_key
+        self.payload = payload
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class DiffusionBatchScheduler:
+    """
+    마이크로 배칭 스케줄러
+
+    Args:
+        run_batch: 같은 batch_key를 가진 payload 리스트를 받아 결과 리스트(같은 순서)를 반환하는 함수
+        max_batch_size: 한 번의 파이프라인 호출에 넣을 최대 작업 수
+        window_ms: 첫 작업이 도착한 뒤 추가 작업을 기다리는 최대 시간(ms)
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 4,
+        window_ms: float = 50.0,
+        name: str = "diffusion-batcher",
+    ):
+        self._run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window_sec = max(0.0, float(window_ms)) / 1000.0
+        self._queue: "queue.Queue[BatchJob]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "batches": 0,
+            "images": 0,
+            "max_batch_size_seen": 0,
+            "gpu_seconds": 0.0,
+            "queue_wait_seconds": 0.0,
+        }
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    # =========================================================
+    # PUBLIC API
+    # =========================================================
+    def submit(self, batch_key: Hashable, payload: Any) -> Future:
+        """작업을 큐에 넣고 결과를 받을 Future 반환"""
+        job = BatchJob(batch_key, payload)
+        self._queue.put(job)
+        return job.future
+
+    def run(self, batch_key: Hashable, payload: Any, timeout: float | None = None) -> Any:
+        """submit 후 결과가 나올 때까지 대기 (동기 호출용)"""
+        return self.submit(batch_key, payload).result(timeout=timeout)
+
+    def stats(self) -> dict:
+        """배치 처리 통계 (images per GPU-second 포함)"""
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        batches = snapshot["batches"]
+        images = snapshot["images"]
+        gpu_seconds = snapshot["gpu_seconds"]
+        snapshot["avg_batch_size"] = round(images / batches, 3) if batches else 0.0
+        snapshot["images_per_gpu_second"] = round(images / gpu_seconds, 4) if gpu_seconds else 0.0
+        snapshot["avg_queue_wait_ms"] = (
+            round(snapshot["queue_wait_seconds"] / images * 1000, 1) if images else 0.0
+        )
+        snapshot["pending"] = self._queue.qsize()
+        snapshot["max_batch_size"] = self.max_batch_size
+        snapshot["window_ms"] = self.window_sec * 1000
+        return snapshot
+
+    # =========================================================
+    # 내부 루프
+    # =========================================================
+    def _collect(self) -> List[BatchJob]:
+        """첫 작업을 블로킹으로 받은 뒤, 윈도우 동안 도착하는 작업을 모두 수집"""
+        first = self._queue.get()
+        collected = [first]
+        deadline = time.monotonic() + self.window_sec
+
+        # 같은 키 작업이 max_batch_size개 모이면 윈도우를 기다리지 않고 바로 실행
+        while True:
+            same_key = sum(1 for j in collected if j.batch_key == first.batch_key)
+            if same_key >= self.max_batch_size:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                collected.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return collected
+
+    def _loop(self):
+        while True:
+            collected = self._collect()
+
+            # batch_key별로 그룹핑 (첫 도착 순서 유지)
+            groups: "OrderedDict[Hashable, List[BatchJob]]" = OrderedDict()
+            for job in collected:
+                groups.setdefault(job.batch_key, []).append(job)
+
+            for jobs in groups.values():
+                for start in range(0, len(jobs), self.max_batch_size):
+                    self._execute(jobs[start:start + self.max_batch_size])
+
+    def _execute(self, jobs: List[BatchJob]):
+        started = time.monotonic()
+        try:
+            results = self._run_batch([j.payload for j in jobs])
+            if len(results) != len(jobs):
+                raise RuntimeError(
+                    f"배치 결과 개수 불일치: jobs={len(jobs)}, results={len(results)}"
+                )
+        except Exception as e:
+            print(f"[Batcher][ERROR] batch of {len(jobs)} failed: {e}")
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+
+        elapsed = time.monotonic() - started
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["images"] += len(jobs)
+            self._stats["gpu_seconds"] += elapsed
+            self._stats["queue_wait_seconds"] += sum(started - j.enqueued_at for j in jobs)
+            self._stats["max_batch_size_seen"] = max(self._stats["max_batch_size_seen"], len(jobs))
+
+        print(f"[Batcher] batch_size={len(jobs)} elapsed={elapsed:.2f}s")
+        for job, result in zip(jobs, results):
+            if not job.future.done():
+                job.future.set_result(result)
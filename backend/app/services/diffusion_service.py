@@ -18,14 +18,19 @@ from diffusers import (
     ControlNetModel,
     StableDiffusionPipeline,
 )
-from controlnet_aux import MidasDetector
 import numpy as np
 import base64
 from io import BytesIO
 from typing import Optional
+from contextlib import nullcontext
+from concurrent.futures import as_completed
 import random
+import threading
 
 from backend.app.services.segmentation import get_segmentation_singleton
+from backend.app.services.diffusion_batcher import DiffusionBatchScheduler
+from backend.app.services.depth_service import estimate_depth, load_depth_detector
+from backend.app.services.cache_utils import LRUByteCache, hash_array
 from backend.app.core.diffusion_presets import resolve_preset
 from backend.app.core.schemas import CompositionMode
 
@@ -55,12 +60,62 @@ IP_ADAPTER_WEIGHT_NAME = "ip-adapter_sd15.bin"  # SD1.5용 IP-Adapter 가중치
 
 # 전역 캐시
 _pipeline = None
-_midas_detector = None
 _ip_adapter_loaded = False
 
 # 포스터(txt2img)용 베이스 sd 1.5 파이프라인 추가
 _poster_pipeline = None
 
+# 파이프라인 최초 로드 직렬화 (백그라운드 preload / 준비 전 요청 / variants 병렬 워커가 동시에 들어와도
+# 파이프라인 생성, load_ip_adapter, 레지스트리 acquire는 한 번만)
+_pipeline_load_lock = threading.Lock()
+
+# 광고용 네거티브 프롬프트 (합성/포스터 공용)
+NEGATIVE_PROMPT = (
+    "monochrome, lowres, bad anatomy, worst quality, low quality, blurry, "
+    "text, logo, watermark, signature, handwriting, caption, blob, melted, "
+    "distorted, deformed, out of frame"
+)
+
+# -----------------------------------------------------------------------------#
+# 마이크로 배칭 설정                                                             #
+# -----------------------------------------------------------------------------#
+# 동시에 들어온 synthesize 요청을 window 동안 모아 한 번의 디노이징 패스로 실행
+DIFFUSION_BATCH_ENABLED = os.getenv("DIFFUSION_BATCH_ENABLED", "true").lower() == "true"
+DIFFUSION_BATCH_MAX_SIZE = int(os.getenv("DIFFUSION_BATCH_MAX_SIZE", "4"))
+DIFFUSION_BATCH_WINDOW_MS = float(os.getenv("DIFFUSION_BATCH_WINDOW_MS", "50"))
+
+_batch_scheduler = None
+_batch_scheduler_lock = threading.Lock()
+# 배치 비활성화 시 여러 요청 스레드가 파이프라인을 동시에 호출하지 않도록 보호
+_pipeline_lock = threading.Lock()
+
+# -----------------------------------------------------------------------------#
+# UNet 최적화 옵션 (기본 비활성화, 워밍업과 함께 사용 권장)                        #
+# -----------------------------------------------------------------------------#
+DIFFUSION_CHANNELS_LAST = os.getenv("DIFFUSION_CHANNELS_LAST", "false").lower() == "true"
+DIFFUSION_TORCH_COMPILE = os.getenv("DIFFUSION_TORCH_COMPILE", "false").lower() == "true"
+
+# -----------------------------------------------------------------------------#
+# 임베딩 캐시 (CLIP 텍스트 / IP-Adapter 이미지)                                   #
+# -----------------------------------------------------------------------------#
+# - 텍스트: (모델, 텍스트) → prompt_embeds (1, 77, 768). 상수 NEGATIVE_PROMPT는 사실상 항상 hit
+# - IP-Adapter: 이미지 해시 → 어댑터별 (negative, positive) 임베딩
+# - 텐서는 GPU에 그대로 보관, 용량(bytes) 기준 LRU
+EMBED_CACHE_TEXT_MB = int(os.getenv("EMBED_CACHE_TEXT_MB", "64"))
+EMBED_CACHE_IP_MB = int(os.getenv("EMBED_CACHE_IP_MB", "32"))
+
+
+def _tensor_nbytes(value) -> int:
+    if isinstance(value, torch.Tensor):
+        return value.element_size() * value.nelement()
+    if isinstance(value, (list, tuple)):
+        return sum(_tensor_nbytes(v) for v in value)
+    return 0
+
+
+_prompt_embed_cache = LRUByteCache(EMBED_CACHE_TEXT_MB * 1024 * 1024, sizeof=_tensor_nbytes, name="prompt-embeds")
+_ip_embed_cache = LRUByteCache(EMBED_CACHE_IP_MB * 1024 * 1024, sizeof=_tensor_nbytes, name="ip-adapter-embeds")
+
 def _mask_array_to_pil(mask_array: np.ndarray) -> Image.Image:
     """SAM 마스크(ndarray)를 흑백(L) 모드 PIL 이미지로 변환."""
     scaled = np.clip(mask_array * 255.0, 0, 255).astype("uint8")
@@ -92,84 +147,204 @@ def _base64_to_image(base64_string: str) -> Image.Image:
 # 파이프라인 로딩 함수                                                          
 # -----------------------------------------------------------------------------
 
-def _load_pipeline():
-    """
-    SD 1.5 + ControlNet(Depth) + IP-Adapter(SD1.5)를 모두 로드하고
-    전역 변수에 캐싱하는 함수
+class _ComponentRegistry:
     """
-    global _pipeline, _midas_detector, _ip_adapter_loaded
+    SD1.5 서브모델(UNet/VAE/TextEncoder/ControlNet 등) 공유 레지스트리
 
-    if _pipeline is not None:
-        return _pipeline
-
-    print("[SD15 Pipeline] Loading base models...")
+    - 컴포넌트별로 한 번만 로드하고, 파이프라인들이 같은 모듈 객체를 공유 (프로세스 수명 동안 상주)
+    - report()로 컴포넌트별 상주 메모리 확인
+    """
 
-    # 디바이스 / dtype 설정
+    def __init__(self):
+        self._components = {}
+        self._lock = threading.RLock()
+
+    def acquire(self, name: str, loader):
+        with self._lock:
+            if name not in self._components:
+                print(f"[Registry] Loading component: {name}")
+                self._components[name] = loader()
+            return self._components[name]
+
+    def register(self, name: str, component):
+        """이미 로드된 모듈을 등록 (같은 checkpoint에서 함께 로드된 컴포넌트용)"""
+        with self._lock:
+            self._components.setdefault(name, component)
+
+    def report(self) -> dict:
+        with self._lock:
+            items = list(self._components.items())
+
+        report = {}
+        total = 0
+        for name, component in items:
+            entry = {}
+            if isinstance(component, torch.nn.Module):
+                params = list(component.parameters()) + list(component.buffers())
+                nbytes = sum(t.element_size() * t.nelement() for t in params)
+                entry["bytes"] = nbytes
+                entry["mb"] = round(nbytes / 1024 / 1024, 1)
+                if params:
+                    entry["device"] = str(params[0].device)
+                    entry["dtype"] = str(params[0].dtype)
+                total += nbytes
+            report[name] = entry
+        return {"components": report, "total_mb": round(total / 1024 / 1024, 1)}
+
+
+_registry = _ComponentRegistry()
+# 같은 UNet을 공유하는 파이프라인들의 호출 직렬화
+# (set_ip_adapter_scale 등 UNet attention processor 상태를 바꾸기 때문)
+_unet_lock = threading.RLock()
+
+# SD1.5 체크포인트에서 함께 로드되는 공유 컴포넌트
+_BASE_COMPONENTS = ("sd15_unet", "sd15_vae", "sd15_text_encoder", "sd15_tokenizer", "sd15_feature_extractor")
+
+
+def _device_and_dtype():
     device = "cuda" if torch.cuda.is_available() else "cpu"
     torch_dtype = torch.float16 if device == "cuda" else torch.float32
+    return device, torch_dtype
 
-    # 1) ControlNet(Depth) 로드
-    controlnet_depth = ControlNetModel.from_pretrained(
-        CONTROLNET_DEPTH_ID,
-        cache_dir=HF_CACHE_DIR,
-        torch_dtype=torch_dtype,
-    ).to(device)
 
-    # 2) StableDiffusionControlNetPipeline 로드 (Base: SD 1.5)
-    pipe = StableDiffusionControlNetPipeline.from_pretrained(
+def _load_sd15_base():
+    """
+    SD1.5 베이스 컴포넌트를 한 번만 로드해서 레지스트리에 등록
+    (UNet / VAE / TextEncoder / Tokenizer / FeatureExtractor + 스케줄러 템플릿)
+    """
+    device, torch_dtype = _device_and_dtype()
+
+    base = StableDiffusionPipeline.from_pretrained(
         SD15_MODEL_ID,
-        controlnet=controlnet_depth,
         cache_dir=HF_CACHE_DIR,
         torch_dtype=torch_dtype,
         safety_checker=None,         # 광고용이라면 별도 필터링에서 처리
         use_safetensors=True,
     ).to(device)
+    print(f"[SD15 Base] 기본 fp16/fp32로 로드했습니다. device={device}, dtype={torch_dtype}")
 
-    print(f"[SD15 Pipeline] 기본 fp16/fp32로 로드했습니다. device={device}, dtype={torch_dtype}")
-
-    # 3) 스케줄러/메모리 최적화
+    # 메모리 최적화 (모듈 단위 설정이므로 공유하는 모든 파이프라인에 적용됨)
     # --> attention_slicing은 ip-adapter와 충돌하여 사용하지 않기로 함!
     try:
         if device == "cuda":
-            pipe.enable_xformers_memory_efficient_attention()
-            print("[SD15 Pipeline] xformers 활성화됨.")
+            base.enable_xformers_memory_efficient_attention()
+            print("[SD15 Base] xformers 활성화됨.")
     except Exception as e:
         print(f"[WARNING] xformers 활성화 실패: {e}")
 
-
     # VAE slicing/tiling만 사용 (디코더 메모리 절감)
     try:
-        pipe.enable_vae_slicing()
-        print("[SD15 Pipeline] VAE slicing enabled.")
+        base.enable_vae_slicing()
+        print("[SD15 Base] VAE slicing enabled.")
     except Exception as e:
         print(f"[WARNING] VAE slicing 설정 중 경고: {e}")
 
     try:
-        pipe.enable_vae_tiling()
-        print("[SD15 Pipeline] VAE tiling enabled.")
+        base.enable_vae_tiling()
+        print("[SD15 Base] VAE tiling enabled.")
     except Exception as e:
         print(f"[WARNING] VAE tiling 설정 중 경고: {e}")
 
-
-    # 4) Depth 전처리기(Midas) 로드
-    print("[Midas Detector] Depth 전처리기 로드 중...")
-    _midas_detector = MidasDetector.from_pretrained(
-        "lllyasviel/ControlNet",
+    _registry.register("sd15_unet", base.unet)
+    _registry.register("sd15_vae", base.vae)
+    _registry.register("sd15_text_encoder", base.text_encoder)
+    _registry.register("sd15_tokenizer", base.tokenizer)
+    _registry.register("sd15_feature_extractor", base.feature_extractor)
+    return base.scheduler
+
+
+def _acquire_base_components() -> dict:
+    """베이스 컴포넌트 조회 (최초 1회만 실제 로드)"""
+    scheduler = _registry.acquire("sd15_scheduler", _load_sd15_base)
+    components = {name: _registry.acquire(name, _missing_component(name)) for name in _BASE_COMPONENTS}
+    return {
+        "unet": components["sd15_unet"],
+        "vae": components["sd15_vae"],
+        "text_encoder": components["sd15_text_encoder"],
+        "tokenizer": components["sd15_tokenizer"],
+        "feature_extractor": components["sd15_feature_extractor"],
+        "scheduler": scheduler,
+    }
+
+
+def _missing_component(name: str):
+    def _loader():
+        raise RuntimeError(f"{name}은(는) SD1.5 베이스 로드 시 함께 등록되어야 합니다.")
+    return _loader
+
+
+def _load_controlnet_depth():
+    device, torch_dtype = _device_and_dtype()
+    return ControlNetModel.from_pretrained(
+        CONTROLNET_DEPTH_ID,
         cache_dir=HF_CACHE_DIR,
+        torch_dtype=torch_dtype,
     ).to(device)
-    print("[Midas Detector] Depth 전처리기 성공적으로 로드됨.")
 
-    # 5) IP-Adapter(SD1.5) 로드
+
+def _load_pipeline():
+    """
+    SD 1.5 + ControlNet(Depth) + IP-Adapter(SD1.5)를 모두 로드하고
+    전역 변수에 캐싱하는 함수 (SD1.5 서브모델은 레지스트리에서 공유)
+    """
+    global _pipeline
+
+    if _pipeline is not None:
+        return _pipeline
+
+    with _pipeline_load_lock:
+        if _pipeline is not None:
+            return _pipeline
+        _pipeline = _build_pipeline()
+
+    return _pipeline
+
+
+def _build_pipeline():
+    """_load_pipeline 본체 (_pipeline_load_lock 보유 상태에서 호출)"""
     global _ip_adapter_loaded
+
+    print("[SD15 Pipeline] Loading base models...")
+
+    # 디바이스 / dtype 설정
+    device, torch_dtype = _device_and_dtype()
+
+    # 1) SD1.5 공유 컴포넌트 + ControlNet(Depth)
+    base = _acquire_base_components()
+    controlnet_depth = _registry.acquire("controlnet_depth", _load_controlnet_depth)
+
+    # 2) StableDiffusionControlNetPipeline 구성 (스케줄러는 호출 상태를 가지므로 파이프라인별 인스턴스)
+    pipe = StableDiffusionControlNetPipeline(
+        vae=base["vae"],
+        text_encoder=base["text_encoder"],
+        tokenizer=base["tokenizer"],
+        unet=base["unet"],
+        controlnet=controlnet_depth,
+        scheduler=_new_scheduler(base["scheduler"]),
+        safety_checker=None,
+        feature_extractor=base["feature_extractor"],
+        requires_safety_checker=False,
+    )
+
+    print(f"[SD15 Pipeline] 공유 컴포넌트로 구성했습니다. device={device}, dtype={torch_dtype}")
+
+    # 3) Depth 전처리기(Midas) 로드
+    # (depth_service가 소유, 결과는 이미지 해시 기준으로 캐싱)
+    load_depth_detector()
+
+    # 4) IP-Adapter(SD1.5) 로드 (공유 UNet의 attention processor가 교체됨)
     print("[IP-Adapter] SD1.5용 IP-Adapter 로드 중...")
     try:
-        pipe.load_ip_adapter(
-            IP_ADAPTER_MODEL_ID,          # "h94/IP-Adapter"
-            subfolder=IP_ADAPTER_SUBFOLDER,
-            weight_name=IP_ADAPTER_WEIGHT_NAME,
-        )
-        pipe.set_ip_adapter_scale(0.0)    # 기본값은 비활성화
+        with _unet_lock:
+            pipe.load_ip_adapter(
+                IP_ADAPTER_MODEL_ID,          # "h94/IP-Adapter"
+                subfolder=IP_ADAPTER_SUBFOLDER,
+                weight_name=IP_ADAPTER_WEIGHT_NAME,
+            )
+            pipe.set_ip_adapter_scale(0.0)    # 기본값은 비활성화
         _ip_adapter_loaded = True
+        if getattr(pipe, "image_encoder", None) is not None:
+            _registry.acquire("ip_adapter_image_encoder", lambda: pipe.image_encoder)
         print(
             f"[IP-Adapter] {IP_ADAPTER_SUBFOLDER}/{IP_ADAPTER_WEIGHT_NAME} 로드 성공."
         )
@@ -177,7 +352,7 @@ def _load_pipeline():
         print(f"[WARNING] IP-Adapter 로드 실패: {e}. 우선 ControlNet만 사용함.")
         _ip_adapter_loaded = False
 
-    # 6) 모든 서브모델 동일 디바이스로 강제 정렬 (CPU/CUDA 혼합 방지 핵심)
+    # 5) 모든 서브모델 동일 디바이스로 강제 정렬 (CPU/CUDA 혼합 방지 핵심)
     if device == "cuda":
         try:
             pipe.unet.to(device)
@@ -186,12 +361,46 @@ def _load_pipeline():
                 pipe.text_encoder.to(device)
             if hasattr(pipe, "controlnet"):
                 pipe.controlnet.to(device)
+            if getattr(pipe, "image_encoder", None) is not None:
+                pipe.image_encoder.to(device)
             print("[SD15 Pipeline] UNet/VAE/TextEncoder/ControlNet 모두 CUDA로 정렬 완료.")
         except Exception as e:
             print(f"[WARNING] 서브모델 device 정렬 중 경고: {e}")
 
-    _pipeline = pipe
-    return _pipeline
+    # 6) (옵션) channels_last / torch.compile
+    _apply_unet_optimizations(pipe, device)
+
+    return pipe
+
+
+def _apply_unet_optimizations(pipe, device):
+    """
+    UNet 메모리 포맷/컴파일 최적화 (IP-Adapter 로드 이후에 적용해야 attention processor 교체가 반영됨)
+    - torch.compile은 ControlNet 파이프라인의 UNet 참조만 래핑 (공유 원본 모듈은 그대로)
+    - 첫 호출에서 컴파일 비용이 발생하므로 MODEL_WARMUP_ENABLED와 함께 사용
+    """
+    if device != "cuda":
+        return
+
+    if DIFFUSION_CHANNELS_LAST:
+        try:
+            pipe.unet.to(memory_format=torch.channels_last)
+            pipe.controlnet.to(memory_format=torch.channels_last)
+            print("[SD15 Pipeline] channels_last 적용.")
+        except Exception as e:
+            print(f"[WARNING] channels_last 적용 실패: {e}")
+
+    if DIFFUSION_TORCH_COMPILE:
+        try:
+            pipe.unet = torch.compile(pipe.unet, mode="reduce-overhead", fullgraph=False)
+            print("[SD15 Pipeline] torch.compile(UNet) 적용 (첫 호출 시 컴파일).")
+        except Exception as e:
+            print(f"[WARNING] torch.compile 적용 실패: {e}")
+
+
+def _new_scheduler(template):
+    """파이프라인별 독립 스케줄러 (timesteps 등 호출 상태 공유 방지)"""
+    return template.__class__.from_config(template.config)
 
 
 
@@ -202,51 +411,345 @@ def _load_poster_pipeline():
     """
     ControlNet 없이 순수 StableDiffusionPipeline(SD1.5)만 사용하는
     포스터(txt2img) 생성용 파이프라인 로더.
+    UNet/VAE/TextEncoder는 ControlNet 파이프라인과 같은 모듈을 공유 (추가 로드 없음).
     """
     global _poster_pipeline
 
     if _poster_pipeline is not None:
         return _poster_pipeline
 
-    print("[SD15 PosterPipeline] Loading base SD1.5 txt2img pipeline...")
+    with _pipeline_load_lock:
+        if _poster_pipeline is not None:
+            return _poster_pipeline
+        _poster_pipeline = _build_poster_pipeline()
 
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    torch_dtype = torch.float16 if device == "cuda" else torch.float32
+    return _poster_pipeline
 
-    pipe = StableDiffusionPipeline.from_pretrained(
-        SD15_MODEL_ID,
-        cache_dir=HF_CACHE_DIR,
-        torch_dtype=torch_dtype,
+
+def _build_poster_pipeline():
+    """_load_poster_pipeline 본체 (_pipeline_load_lock 보유 상태에서 호출)"""
+    print("[SD15 PosterPipeline] Building txt2img pipeline from shared components...")
+
+    device, torch_dtype = _device_and_dtype()
+    base = _acquire_base_components()
+
+    pipe = StableDiffusionPipeline(
+        vae=base["vae"],
+        text_encoder=base["text_encoder"],
+        tokenizer=base["tokenizer"],
+        unet=base["unet"],
+        scheduler=_new_scheduler(base["scheduler"]),
         safety_checker=None,   # 서비스 정책에 맞게 나중에 조정
-        use_safetensors=True,
-    ).to(device)
+        feature_extractor=base["feature_extractor"],
+        requires_safety_checker=False,
+    )
+
+    print(f"[SD15 PosterPipeline] Ready. device={device}, dtype={torch_dtype}")
+
+    return pipe
+
+
+def _poster_ip_adapter_kwargs(pipe, device) -> dict:
+    """
+    공유 UNet에 IP-Adapter가 로드된 상태면 UNet이 이미지 임베딩을 요구하므로
+    0 임베딩 + scale 0을 넘겨 순수 txt2img와 같은 결과를 얻음
+    """
+    hid_proj = getattr(pipe.unet, "encoder_hid_proj", None)
+    if hid_proj is None or not hasattr(hid_proj, "image_projection_layers"):
+        return {}
+
+    embeds = []
+    for layer in hid_proj.image_projection_layers:
+        dim = layer.image_embeds.in_features
+        embeds.append(torch.zeros((2, 1, dim), device=device, dtype=pipe.unet.dtype))
+    pipe.set_ip_adapter_scale(0.0)  # 호출 측에서 _unet_lock 보유 중
+    return {"ip_adapter_image_embeds": embeds}
 
-    print(f"[SD15 PosterPipeline] Loaded. device={device}, dtype={torch_dtype}")
 
-    # 메모리 최적화(가능할 때만)
+def get_model_memory_report() -> dict:
+    """공유 컴포넌트별 상주 메모리 + 파이프라인 로드 여부"""
+    report = _registry.report()
+    report["pipelines"] = {
+        "controlnet": _pipeline is not None,
+        "poster": _poster_pipeline is not None,
+    }
+    return report
+
+
+
+# -----------------------------------------------------------------------------#
+# 배치 실행 함수 (스케줄러 스레드에서 호출)                                      #
+# -----------------------------------------------------------------------------#
+
+def _get_prompt_embeds(pipe, text: str, device) -> torch.Tensor:
+    """
+    CLIP 텍스트 임베딩 (1, 77, D) — 캐시 우선.
+    CFG 없이 단일 텍스트만 인코딩하므로 prompt / negative_prompt 양쪽에 그대로 사용 가능.
+    (합성/포스터 파이프라인은 같은 SD1.5 텍스트 인코더를 쓰므로 캐시 공유)
+    """
+    key = (SD15_MODEL_ID, str(device), text)
+    embeds = _prompt_embed_cache.get(key)
+    if embeds is None:
+        embeds, _ = pipe.encode_prompt(
+            text,
+            device,
+            num_images_per_prompt=1,
+            do_classifier_free_guidance=False,
+        )
+        _prompt_embed_cache.put(key, embeds)
+    return embeds
+
+
+def _batch_prompt_embeds(pipe, prompts: list, device) -> dict:
+    """배치용 prompt_embeds / negative_prompt_embeds (B, 77, D) 구성"""
+    prompt_embeds = torch.cat([_get_prompt_embeds(pipe, p, device) for p in prompts], dim=0)
+    negative = _get_prompt_embeds(pipe, NEGATIVE_PROMPT, device)
+    return {
+        "prompt_embeds": prompt_embeds,
+        "negative_prompt_embeds": negative.repeat(len(prompts), 1, 1),
+    }
+
+
+def _encode_ip_adapter_image(pipe, image: Image.Image, device) -> list:
+    """
+    IP-Adapter 이미지 임베딩을 (negative, positive) 쌍으로 계산 — 이미지 해시 기준 캐시 우선.
+    어댑터별로 (1, 1, D) 텐서 두 개씩 반환.
+    """
+    key = hash_array(np.asarray(image.convert("RGB")), IP_ADAPTER_WEIGHT_NAME, str(device))
+    pairs = _ip_embed_cache.get(key)
+    if pairs is not None:
+        return pairs
+
+    embeds = pipe.prepare_ip_adapter_image_embeds(
+        ip_adapter_image=image,
+        ip_adapter_image_embeds=None,
+        device=device,
+        num_images_per_prompt=1,
+        do_classifier_free_guidance=True,
+    )
+    # 어댑터별 shape: (2, 1, D) = [negative; positive]
+    pairs = [tuple(e.chunk(2)) for e in embeds]
+    _ip_embed_cache.put(key, pairs)
+    return pairs
+
+
+def _batch_ip_adapter_embeds(pipe, images: list, device) -> list:
+    """
+    요청별 IP-Adapter 이미지를 배치용 ip_adapter_image_embeds로 묶음.
+    diffusers 규약: 어댑터별 (2B, 1, D) = [negative x B; positive x B]
+    """
+    encoded = {}
+    pairs = []
+    for img in images:
+        # 같은 이미지 객체는 한 번만 조회 (해시 계산 생략)
+        if id(img) not in encoded:
+            encoded[id(img)] = _encode_ip_adapter_image(pipe, img, device)
+        pairs.append(encoded[id(img)])
+
+    batched = []
+    for adapter_idx in range(len(pairs[0])):
+        negative = torch.cat([p[adapter_idx][0] for p in pairs], dim=0)
+        positive = torch.cat([p[adapter_idx][1] for p in pairs], dim=0)
+        batched.append(torch.cat([negative, positive], dim=0))
+    return batched
+
+
+def _run_synthesis_batch(jobs: list) -> list:
+    """
+    같은 batch_key(스텝 수/guidance/해상도/ControlNet·IP 강도)를 가진 작업들을
+    한 번의 파이프라인 호출로 처리하고, 요청 순서대로 생성 배경 이미지를 반환.
+    """
+    pipe = _load_pipeline()
+    device = getattr(pipe, "device", "cuda" if torch.cuda.is_available() else "cpu")
+
+    first = jobs[0]
+    batch_size = len(jobs)
+    use_depth = first["depth_map"] is not None
+    ip_adapter_scale = first["ip_adapter_scale"]
+
+    print(
+        f"[SD15 Batch] Running pipeline. batch_size={batch_size}, depth={use_depth}, "
+        f"Depth Weight: {first['control_weight']}, IP Scale: {ip_adapter_scale}, device={device}"
+    )
+
     try:
+        # 요청별 난수 시드 → 배치로 묶여도 단독 실행과 같은 초기 latent 사용
+        generators = [
+            torch.Generator(device=device).manual_seed(job["seed"]) for job in jobs
+        ]
+
+        # fp16 on cuda / fp32 on cpu 자동 처리
         if device == "cuda":
-            pipe.enable_xformers_memory_efficient_attention()
-            print("[SD15 PosterPipeline] xformers 활성화 시도.")
-    except Exception as e:
-        print(f"[WARNING][PosterPipeline] xformers 활성화 실패: {e}")
+            autocast_ctx = torch.cuda.amp.autocast(dtype=torch.float16)
+        else:
+            autocast_ctx = nullcontext()
 
-    # 🔹 Poster 파이프라인에도 VAE slicing 적용
-    try:
-        pipe.enable_vae_slicing()
-        pipe.enable_vae_tiling()
-    except Exception:
-        pass
+        with _unet_lock, torch.inference_mode(), autocast_ctx:
+            # IP-Adapter는 "누끼된 product_image"에서 스타일/색감 가져오기
+            ip_kwargs = {}
+            if _ip_adapter_loaded and ip_adapter_scale > 0:
+                pipe.set_ip_adapter_scale(ip_adapter_scale)
+                ip_kwargs["ip_adapter_image_embeds"] = _batch_ip_adapter_embeds(
+                    pipe, [job["product_image"] for job in jobs], device
+                )
+            else:
+                pipe.set_ip_adapter_scale(0.0)
+                print("[IP-Adapter] 비활성화 (로드 실패 또는 scale <= 0).")
 
-    _poster_pipeline = pipe
-    return _poster_pipeline
+            # CLIP 텍스트 인코딩은 캐시된 임베딩으로 대체
+            prompt_kwargs = _batch_prompt_embeds(pipe, [job["prompt"] for job in jobs], device)
+
+            result = pipe(
+                **prompt_kwargs,
+                # depth 맵을 ControlNet 입력으로 사용 (Depth 비활성화 시 None)
+                image=[job["depth_map"] for job in jobs] if use_depth else None,
+                controlnet_conditioning_scale=first["control_weight"] if use_depth else 0.0,
+                guidance_scale=first["guidance_scale"],
+                num_inference_steps=first["num_inference_steps"],
+                generator=generators,
+                **ip_kwargs,
+            )
+
+        images = list(result.images)
+        del result, generators, ip_kwargs, prompt_kwargs
+        return images
+
+    finally:
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+            torch.cuda.ipc_collect()
+            print("[GPU Memory] VRAM cleanup executed.")
+
+
+def _get_batch_scheduler() -> DiffusionBatchScheduler:
+    """배치 스케줄러 싱글톤 (첫 요청 시 스레드 시작)"""
+    global _batch_scheduler
+    if _batch_scheduler is None:
+        with _batch_scheduler_lock:
+            if _batch_scheduler is None:
+                _batch_scheduler = DiffusionBatchScheduler(
+                    run_batch=_run_synthesis_batch,
+                    max_batch_size=DIFFUSION_BATCH_MAX_SIZE,
+                    window_ms=DIFFUSION_BATCH_WINDOW_MS,
+                )
+    return _batch_scheduler
+
+
+def warmup_pipeline(full_image: Image.Image, steps: int = 2):
+    """
+    실제 서비스 경로(depth → IP-Adapter 인코딩 → 배치 디노이징)를 짧은 스텝으로 한 번 실행.
+    커널 선택 / CUDA 할당자 확장 / xformers·IP-Adapter 지연 초기화 / torch.compile을 미리 끝냄.
+    """
+    _load_pipeline()
+    product_image, _, depth_map = _prepare_synthesis_inputs(
+        full_image, full_image.convert("L"), full_image, control_weight=0.5
+    )
+    job, _ = _build_synthesis_job(
+        "warmup", product_image, depth_map, control_weight=0.5, ip_adapter_scale=0.2, seed=0
+    )
+    job["num_inference_steps"] = max(1, steps)
+    # 배치 스케줄러 통계에 섞이지 않도록 직접 실행
+    with _pipeline_lock:
+        _run_synthesis_batch([job])
+
+
+def get_embedding_cache_stats() -> dict:
+    """텍스트/IP-Adapter 임베딩 캐시 hit/miss 통계"""
+    return {
+        "prompt_embeds": _prompt_embed_cache.stats(),
+        "ip_adapter_embeds": _ip_embed_cache.stats(),
+    }
 
 
+def get_batch_stats() -> dict:
+    """배치 스케줄러 통계 (스케줄러가 아직 없으면 enabled 여부만)"""
+    stats = {"enabled": DIFFUSION_BATCH_ENABLED}
+    if _batch_scheduler is not None:
+        stats.update(_batch_scheduler.stats())
+    return stats
+
 
 # -----------------------------------------------------------------------------#
 # 메인 합성 함수                                                                #
 # -----------------------------------------------------------------------------#
 
+def _prepare_synthesis_inputs(
+    product_image: Image.Image,
+    mask_image: Image.Image,
+    full_image: Image.Image,
+    control_weight: float,
+):
+    """
+    입력 이미지 모드 정리 + depth 맵 추출 (프롬프트/시드와 무관한 공용 전처리)
+    Returns: (product_image, mask_image, depth_map or None)
+    """
+    # --------------------------------------------------------------
+    # 1. 입력 이미지 모드 정리
+    # --------------------------------------------------------------
+    if product_image.mode not in ("RGB", "RGBA"):
+        product_image = product_image.convert("RGB")
+    if full_image.mode not in ("RGB", "RGBA"):
+        full_image = full_image.convert("RGB")
+    if mask_image.mode not in ("L", "RGB", "RGBA"):
+        mask_image = mask_image.convert("L")
+
+    # --------------------------------------------------------------
+    # 2. Depth 맵은 "배경 포함 원본(full_image)"에서만 추출
+    #    (요청 스레드에서 계산 → 스케줄러 스레드는 디노이징만 담당)
+    #    같은 사진이면 depth_service 캐시에서 재사용
+    # --------------------------------------------------------------
+    depth_map = None
+    if control_weight > 0:
+        depth_map = estimate_depth(full_image)  # 누끼가 아닌 원본 사용
+        print("[Pipeline] Using ControlNet Depth (from full_image)")
+    else:
+        print("[Pipeline] Depth disabled → txt2img + (optional) IP-Adapter")
+
+    return product_image, mask_image, depth_map
+
+
+def _build_synthesis_job(
+    prompt: str,
+    product_image: Image.Image,
+    depth_map: Optional[Image.Image],
+    control_weight: float,
+    ip_adapter_scale: float,
+    seed: int,
+):
+    """배치 작업 dict + batch_key 구성 (Depth on/off 분기별 스텝/guidance)"""
+    job = {
+        "prompt": prompt,
+        "product_image": product_image,
+        "depth_map": depth_map,
+        "control_weight": control_weight,
+        "ip_adapter_scale": ip_adapter_scale if _ip_adapter_loaded else 0.0,
+        "guidance_scale": 8.0 if depth_map is not None else 9.0,
+        "num_inference_steps": 20 if depth_map is not None else 40,
+        "seed": seed,
+    }
+    # 같은 키끼리만 하나의 디노이징 패스로 묶을 수 있음
+    batch_key = (
+        depth_map.size if depth_map is not None else None,
+        round(control_weight, 4) if depth_map is not None else 0.0,
+        round(job["ip_adapter_scale"], 4),
+        job["guidance_scale"],
+        job["num_inference_steps"],
+    )
+    return job, batch_key
+
+
+def _composite_product(
+    product_image: Image.Image,
+    mask_image: Image.Image,
+    generated_bg: Image.Image,
+) -> Image.Image:
+    """최종 합성: product_image + 생성 배경"""
+    bg_w, bg_h = generated_bg.size
+    fg = product_image.resize((bg_w, bg_h), Image.LANCZOS)
+    m = mask_image.resize((bg_w, bg_h), Image.LANCZOS).convert("L")
+    return Image.composite(fg, generated_bg, m)
+
+
 def synthesize_image(
     prompt: str,
     product_image: Image.Image,
@@ -254,6 +757,7 @@ def synthesize_image(
     full_image: Image.Image,
     control_weight: float = 0.5,
     ip_adapter_scale: float = 0.2,
+    seed: int = 0,
 ) -> Image.Image:
     """
     SD1.5 + ControlNet(Depth) + IP-Adapter(SD1.5)를 사용해서
@@ -265,141 +769,86 @@ def synthesize_image(
     - full_image       : 배경 포함 원본 이미지
     - control_weight   : Depth ControlNet 강도 (0이면 depth 비활성화)
     - ip_adapter_scale : 레퍼런스 이미지 스타일 반영 강도 (0~1 권장)
-    """
-    global _pipeline, _midas_detector, _ip_adapter_loaded
+    - seed             : 난수 시드 (재현성 확보용)
 
+    DIFFUSION_BATCH_ENABLED=true이면 동시에 들어온 요청과 묶여 배치로 디노이징됨.
+    """
     if _pipeline is None:
         _load_pipeline()
 
-    pipe = _pipeline
-    # diffusers 0.30 이후에는 pipe.device가 없을 수 있어서 방어
-    device = getattr(pipe, "device", "cuda" if torch.cuda.is_available() else "cpu")
-
-    print(
-        f"[SD15 Synthesis] Running pipeline. Depth Weight: {control_weight}, IP Scale: {ip_adapter_scale}, device={device}"
-    )
-
-    # 광고용 네거티브 프롬프트
-    negative_prompt = (
-        "monochrome, lowres, bad anatomy, worst quality, low quality, blurry, "
-        "text, logo, watermark, signature, handwriting, caption, blob, melted, "
-        "distorted, deformed, out of frame"
-    )
-
     try:
-        # --------------------------------------------------------------
-        # 1. 입력 이미지 모드 정리
-        # --------------------------------------------------------------
-        if product_image.mode not in ("RGB", "RGBA"):
-            product_image = product_image.convert("RGB")
-        if full_image.mode not in ("RGB", "RGBA"):
-            full_image = full_image.convert("RGB")
-        if mask_image.mode not in ("L", "RGB", "RGBA"):
-            mask_image = mask_image.convert("L")
-
-        # --------------------------------------------------------------
-        # 2. Depth 맵은 "배경 포함 원본(full_image)"에서만 추출
-        # --------------------------------------------------------------
-        depth_map = None
-        if control_weight > 0:
-            depth_raw = _midas_detector(
-                full_image,              # 누끼가 아닌 원본 사용
-                detect_resolution=512,
-                image_resolution=768,
-            )
-
-            depth_np = np.array(depth_raw)
-            depth_np = depth_np - depth_np.min()
-            if depth_np.max() > 0:
-                depth_np = depth_np / depth_np.max()
-            depth_np = (depth_np * 255).astype("uint8")
-            depth_map = Image.fromarray(depth_np)
-
-        # --------------------------------------------------------------
-        # 3. IP-Adapter는 "누끼된 product_image"에서 스타일/색감 가져오기
-        # --------------------------------------------------------------
-        ip_kwargs = {}
-        if _ip_adapter_loaded and ip_adapter_scale > 0:
-            pipe.set_ip_adapter_scale(ip_adapter_scale)
-            ip_kwargs["ip_adapter_image"] = product_image
-            print("[IP-Adapter] ip_adapter_image 및 scale 설정 완료.")
-        else:
-            pipe.set_ip_adapter_scale(0.0)
-            print("[IP-Adapter] 비활성화 (로드 실패 또는 scale <= 0).")
-
-        # --------------------------------------------------------------
-        # 4. 난수 시드 (재현성 확보용)
-        # --------------------------------------------------------------
-        generator = torch.Generator(device=device).manual_seed(0)
-
-        # --------------------------------------------------------------
-        # 5. 파이프라인 호출 (Depth on/off 분기)
-        # --------------------------------------------------------------
-        if depth_map is not None:
-            print("[Pipeline] Using ControlNet Depth (from full_image)")
-        else:
-            print("[Pipeline] Depth disabled → txt2img + (optional) IP-Adapter")
+        product_image, mask_image, depth_map = _prepare_synthesis_inputs(
+            product_image, mask_image, full_image, control_weight
+        )
+        job, batch_key = _build_synthesis_job(
+            prompt, product_image, depth_map, control_weight, ip_adapter_scale, seed
+        )
 
-        # fp16 on cuda / fp32 on cpu 자동 처리
-        if device == "cuda":
-            autocast_ctx = torch.cuda.amp.autocast(dtype=torch.float16)
+        if DIFFUSION_BATCH_ENABLED:
+            generated_bg = _get_batch_scheduler().run(batch_key, job)
         else:
-            # CPU에서는 autocast 필요 없음
-            from contextlib import nullcontext
-            autocast_ctx = nullcontext()
-
-        with torch.inference_mode(), autocast_ctx:
-            if depth_map is not None:
-                result = pipe(
-                    prompt=prompt,
-                    negative_prompt=negative_prompt,
-                    image=depth_map,  # depth 맵을 ControlNet 입력으로 사용
-                    controlnet_conditioning_scale=control_weight,
-                    guidance_scale=8.0,
-                    num_inference_steps=20,
-                    generator=generator,
-                    **ip_kwargs,
-                )
-            else:
-                result = pipe(
-                    prompt=prompt,
-                    negative_prompt=negative_prompt,
-                    image=None,
-                    controlnet_conditioning_scale=0.0,
-                    guidance_scale=9.0,
-                    num_inference_steps=40,
-                    generator=generator,
-                    **ip_kwargs,
-                )
-
-        generated_bg = result.images[0]
-        del result
+            with _pipeline_lock:
+                generated_bg = _run_synthesis_batch([job])[0]
 
-        # --------------------------------------------------------------
-        # 6. 최종 합성: product_image + 생성 배경
-        # --------------------------------------------------------------
-        bg_w, bg_h = generated_bg.size
-        fg = product_image.resize((bg_w, bg_h), Image.LANCZOS)
-        m = mask_image.resize((bg_w, bg_h), Image.LANCZOS).convert("L")
+        final_image = _composite_product(product_image, mask_image, generated_bg)
 
-        final_image = Image.composite(fg, generated_bg, m)
-
-        # 중간 이미지/텐서 참조 명시적으로 삭제
-        del generated_bg, fg, m
-        del generator, ip_kwargs, depth_map
+        # 중간 이미지 참조 명시적으로 삭제
+        del generated_bg, depth_map
 
         return final_image
 
     except Exception as e:
         print(f"[ERROR] Image generation failed: {e}")
         raise Exception(f"Image generation failed: {e}")
-    finally:
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-            torch.cuda.ipc_collect()
-            print("[GPU Memory] VRAM cleanup executed.")
-            
-            
+
+
+def synthesize_variants(
+    variants: list,
+    product_image: Image.Image,
+    mask_image: Image.Image,
+    full_image: Image.Image,
+    control_weight: float = 0.5,
+    ip_adapter_scale: float = 0.2,
+):
+    """
+    한 제품 이미지로 여러 배경 변형을 생성 (완료되는 순서대로 yield)
+
+    - variants: [(prompt, seed), ...]
+    - 모드 정리/depth 추출은 한 번만 수행하고, 모든 변형이 같은 product_image 객체를 공유
+      → 같은 배치 안에서 IP-Adapter 이미지 인코딩도 한 번만 수행됨
+    - 배칭 활성화 시 모든 변형을 스케줄러에 한꺼번에 제출 → 배치 크기만큼 한 번의 디노이징 패스로 처리
+
+    Yields:
+        (variant_index, final_image)
+    """
+    if _pipeline is None:
+        _load_pipeline()
+
+    product_image, mask_image, depth_map = _prepare_synthesis_inputs(
+        product_image, mask_image, full_image, control_weight
+    )
+    jobs = [
+        _build_synthesis_job(prompt, product_image, depth_map, control_weight, ip_adapter_scale, seed)
+        for prompt, seed in variants
+    ]
+    print(f"[Variants] {len(jobs)} variants, batching={DIFFUSION_BATCH_ENABLED}")
+
+    if DIFFUSION_BATCH_ENABLED:
+        scheduler = _get_batch_scheduler()
+        futures = {
+            scheduler.submit(batch_key, job): idx
+            for idx, (job, batch_key) in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            yield futures[future], _composite_product(product_image, mask_image, future.result())
+    else:
+        # 배칭 비활성화: 배치 최대 크기 단위로 직접 실행
+        for start in range(0, len(jobs), DIFFUSION_BATCH_MAX_SIZE):
+            chunk = [job for job, _ in jobs[start:start + DIFFUSION_BATCH_MAX_SIZE]]
+            with _pipeline_lock:
+                backgrounds = _run_synthesis_batch(chunk)
+            for offset, generated_bg in enumerate(backgrounds):
+                yield start + offset, _composite_product(product_image, mask_image, generated_bg)
 
 
 #---------------------------------------------------------------------------------- 
@@ -423,11 +872,7 @@ def generate_poster_image(
     print(f"[SD15 Poster] Generating poster image. device={device}")
 
     # 광고용 네거티브 프롬프트
-    negative_prompt = (
-        "monochrome, lowres, bad anatomy, worst quality, low quality, blurry, "
-        "text, logo, watermark, signature, handwriting, caption, blob, melted, "
-        "distorted, deformed, out of frame"
-    )
+    negative_prompt = NEGATIVE_PROMPT
 
     # 현재는 product_image_bytes는 사용하지 않고, 순수 텍스트 포스터만 생성
     # (IP-Adapter 확장은 나중 단계에서 추가)
@@ -439,14 +884,15 @@ def generate_poster_image(
     if device == "cuda":
         autocast_ctx = torch.cuda.amp.autocast(dtype=torch.float16)
     else:
-        from contextlib import nullcontext
         autocast_ctx = nullcontext()
 
     try:
-        with torch.inference_mode(), autocast_ctx:
+        # UNet을 ControlNet 파이프라인과 공유하므로 같은 락으로 직렬화
+        with _unet_lock, torch.inference_mode(), autocast_ctx:
             result = pipe(
-                prompt=prompt,
-                negative_prompt=negative_prompt,
+                prompt_embeds=_get_prompt_embeds(pipe, prompt, device),
+                negative_prompt_embeds=_get_prompt_embeds(pipe, negative_prompt, device),
+                **_poster_ip_adapter_kwargs(pipe, device),
                 guidance_scale=8.0,
                 num_inference_steps=30,
                 generator=generator,
@@ -476,16 +922,24 @@ def run_auto_synthesis(
     mode: CompositionMode = CompositionMode.balanced,
     control_weight: float | None = None,
     ip_adapter_scale: float | None = None,
+    segmentation_mode: str | None = None,
+    product_box: list[float] | None = None,
+    product_point: list[float] | None = None,
 ) -> Image.Image:
     """
-    1) 세그멘테이션 (SAM)
+    1) 세그멘테이션 (SAM, fast/auto 모드 + 선택적 박스/포인트 프롬프트)
     2) CompositionMode 프리셋 + (옵션) override 해석
     3) synthesize_image 호출
     """
     model = get_segmentation_singleton()
 
     # 1) segmentation: 전체 이미지 기준으로 누끼 추출
-    mask_array, cutout_image = model.remove_background(original_image)
+    mask_array, cutout_image = model.remove_background(
+        original_image,
+        mode=segmentation_mode,
+        box=product_box,
+        point=product_point,
+    )
 
     # 2) 마스크/제품 RGB 준비
     mask_image = _mask_array_to_pil(mask_array)
@@ -519,6 +973,9 @@ def generate_poster_with_product_b64(
     composition_mode: CompositionMode = CompositionMode.balanced,
     control_weight: float | None = None,
     ip_adapter_scale: float | None = None,
+    segmentation_mode: str | None = None,
+    product_box: list[float] | None = None,
+    product_point: list[float] | None = None,
 ) -> bytes:
     """
     Base64 제품 이미지를 입력받아
@@ -536,6 +993,9 @@ def generate_poster_with_product_b64(
         mode=composition_mode,
         control_weight=control_weight,
         ip_adapter_scale=ip_adapter_scale,
+        segmentation_mode=segmentation_mode,
+        product_box=product_box,
+        product_point=product_point,
     )
 
     buf = BytesIO()
@@ -543,3 +1003,58 @@ def generate_poster_with_product_b64(
     buf.seek(0)
     return buf.getvalue()
 
+
+
+# 한 제품 이미지 + 여러 프롬프트/시드 변형 생성
+def generate_variants_with_product_b64(
+    variants: list,
+    product_image_b64: str,
+    composition_mode: CompositionMode = CompositionMode.balanced,
+    control_weight: float | None = None,
+    ip_adapter_scale: float | None = None,
+    segmentation_mode: str | None = None,
+    product_box: list[float] | None = None,
+    product_point: list[float] | None = None,
+):
+    """
+    Base64 디코딩 / 세그멘테이션 / 프리셋 해석 / depth 추출은 한 번만 수행하고
+    variants([(prompt, seed), ...])를 배치로 디노이징.
+
+    /api/diffusion/synthesize/variants에서 사용.
+
+    Yields:
+        (variant_index, PNG bytes) — 완료되는 순서대로
+    """
+    original_image = _base64_to_image(product_image_b64)
+
+    # 1) segmentation (한 번만)
+    model = get_segmentation_singleton()
+    mask_array, cutout_image = model.remove_background(
+        original_image,
+        mode=segmentation_mode,
+        box=product_box,
+        point=product_point,
+    )
+    mask_image = _mask_array_to_pil(mask_array)
+    product_rgb = cutout_image.convert("RGB")
+
+    # 2) CompositionMode + override -> 최종 수치
+    cw, ip = resolve_preset(
+        mode=composition_mode,
+        override_control=control_weight,
+        override_ip=ip_adapter_scale,
+    )
+    print(f"[Preset] mode={composition_mode}, control={cw}, ip={ip}")
+
+    # 3) 변형 생성 (완료 순서대로 PNG 인코딩)
+    for idx, final_image_pil in synthesize_variants(
+        variants,
+        product_image=product_rgb,
+        mask_image=mask_image,
+        full_image=original_image,
+        control_weight=cw,
+        ip_adapter_scale=ip,
+    ):
+        buf = BytesIO()
+        final_image_pil.save(buf, format="PNG")
+        yield idx, buf.getvalue()
@@ -0,0 +1,171 @@
+# embedding_service.py
+# OpenAI 임베딩 공용 서비스 (장기 메모리 / 유사 전략 검색 / 응답 캐시 semantic 단계)
+# - 차원 축소: text-embedding-3-small의 dimensions 파라미터로 EMBEDDING_DIMENSIONS(512)차원 벡터 요청
+#   (user_memories.embedding 컬럼 차원과 같아야 함 → 바꾸려면 마이그레이션 필요)
+# - 콘텐츠 해시 캐시: 모델 + 차원 + 텍스트의 sha256 → 벡터 (LRU), 같은 텍스트는 API 재호출 없음
+# - 마이크로 배치: 짧은 시간 창(EMBEDDING_BATCH_WINDOW_MS) 안의 동시 요청을 embeddings.create 한 번으로 묶음
+
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from backend.app.core.models import EMBEDDING_DIMENSIONS
+from backend.app.services.upstream_clients import get_openai_client
+
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "10"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "2000"))
+
+client = get_openai_client()
+
+_stats = {"requests": 0, "cache_hits": 0, "api_calls": 0, "api_texts": 0, "failures": 0}
+
+
+def content_hash(text: str) -> str:
+    """임베딩 재사용 판단용 해시 (모델/차원이 바뀌면 해시도 바뀜 → 자동 재계산)"""
+    raw = f"{EMBEDDING_MODEL}:{EMBEDDING_DIMENSIONS}\x00{text or ''}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# -----------------------------------------------------------------------------#
+# 콘텐츠 해시 LRU 캐시                                                           #
+# -----------------------------------------------------------------------------#
+_cache_lock = threading.Lock()
+_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+
+
+def _cache_get(key: str) -> Optional[List[float]]:
+    with _cache_lock:
+        vec = _cache.get(key)
+        if vec is not None:
+            _cache.move_to_end(key)
+        return vec
+
+
+def _cache_put(key: str, vec: List[float]):
+    if EMBEDDING_CACHE_MAX_ENTRIES <= 0:
+        return
+    with _cache_lock:
+        _cache[key] = vec
+        _cache.move_to_end(key)
+        while len(_cache) > EMBEDDING_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+async def _embed_batch(texts: List[str]) -> List[Optional[List[float]]]:
+    """texts 한 번의 API 호출로 임베딩 (실패 시 전부 None)"""
+    _stats["api_calls"] += 1
+    _stats["api_texts"] += len(texts)
+    try:
+        response = await client.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=texts,
+            dimensions=EMBEDDING_DIMENSIONS,
+        )
+    except Exception as e:
+        _stats["failures"] += 1
+        print(f"❌ Embedding generation failed ({len(texts)}건): {e}")
+        return [None] * len(texts)
+
+    vectors: List[Optional[List[float]]] = [None] * len(texts)
+    for item in response.data:
+        vectors[item.index] = item.embedding
+    for text, vec in zip(texts, vectors):
+        if vec is not None:
+            _cache_put(content_hash(text), vec)
+    return vectors
+
+
+# -----------------------------------------------------------------------------#
+# 마이크로 배치                                                                  #
+# -----------------------------------------------------------------------------#
+class _EmbeddingBatcher:
+    """동시에 들어온 embed() 요청을 모아 한 번에 호출 (같은 텍스트는 한 번만 전송)"""
+
+    def __init__(self, max_batch_size: int, window_ms: float):
+        self.max_batch_size = max(1, max_batch_size)
+        self.window_sec = max(0.0, window_ms) / 1000
+        self._pending: List[tuple] = []
+        self._flush_handle = None
+        self._tasks: set = set()
+
+    async def submit(self, text: str) -> Optional[List[float]]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._schedule_flush(loop, immediate=True)
+        elif self._flush_handle is None:
+            self._schedule_flush(loop, immediate=False)
+        return await future
+
+    def _schedule_flush(self, loop, immediate: bool):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = (
+            loop.call_soon(self._start_flush, loop)
+            if immediate
+            else loop.call_later(self.window_sec, self._start_flush, loop)
+        )
+
+    def _start_flush(self, loop):
+        # 완료 전까지 태스크 참조 유지
+        task = loop.create_task(self._flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self):
+        self._flush_handle = None
+        batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+        if self._pending:
+            self._schedule_flush(asyncio.get_running_loop(), immediate=True)
+        if not batch:
+            return
+
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = dict(zip(unique_texts, await _embed_batch(unique_texts)))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for text, future in batch:
+            if not future.done():
+                future.set_result(vectors.get(text))
+
+
+_batcher = _EmbeddingBatcher(EMBEDDING_BATCH_MAX_SIZE, EMBEDDING_BATCH_WINDOW_MS)
+
+
+# -----------------------------------------------------------------------------#
+# 공개 API                                                                      #
+# -----------------------------------------------------------------------------#
+async def embed(text: str) -> Optional[List[float]]:
+    """[비동기] 텍스트 1건 임베딩 (캐시 → 마이크로 배치), 실패 시 None"""
+    _stats["requests"] += 1
+    cached = _cache_get(content_hash(text))
+    if cached is not None:
+        _stats["cache_hits"] += 1
+        return cached
+    return await _batcher.submit(text)
+
+
+def get_embedding_stats() -> dict:
+    with _cache_lock:
+        cache_size = len(_cache)
+    requests = _stats["requests"]
+    return {
+        **_stats,
+        "model": EMBEDDING_MODEL,
+        "dimensions": EMBEDDING_DIMENSIONS,
+        "cache_size": cache_size,
+        "cache_hit_rate": round(_stats["cache_hits"] / requests, 3) if requests else 0.0,
+        "avg_batch_size": round(_stats["api_texts"] / _stats["api_calls"], 2) if _stats["api_calls"] else 0.0,
+    }
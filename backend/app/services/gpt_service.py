@@ -6,18 +6,35 @@ import os
 import json
 import re  # 정규식 사용 목적
 import asyncio
-from typing import Optional, Dict
+import base64
+import time
+from typing import Optional
 from datetime import datetime
 from enum import Enum
-from openai import AsyncOpenAI
-from langchain_openai import ChatOpenAI
 from langchain.chains import ConversationChain
-from langchain.memory import ConversationBufferWindowMemory
 from langchain.prompts import PromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 from backend.app.core.schemas import DialogueGPTResponse_AD, DialogueGPTResponse_Profile, FinalContentSchema
-
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from backend.app.services.session_store import create_session_store
+from backend.app.services.response_cache import ResponseCache
+from backend.app.services import minio_service, memory_service
+from backend.app.services.upstream_clients import get_chat_llm, get_openai_client
+from backend.app.services.intent_router import (
+    DIALOGUE_MODEL_FULL,
+    classify_utterance,
+    record_routed_turn,
+    route_dialogue_turn,
+)
+from backend.app.services.token_budget import (
+    TokenBudgetMemory,
+    UsageCallbackHandler,
+    count_tokens,
+    record_usage,
+    truncate_to_tokens,
+)
+
+# 공유 커넥션 풀을 쓰는 프로세스 공용 클라이언트
+client = get_openai_client()
 
 # ================== 대화 의도 분류 ==================
 
@@ -47,25 +64,14 @@ def classify_user_intent(user_input: str, has_complete_profile: bool) -> Convers
     if not has_complete_profile:
         return ConversationIntent.PROFILE_BUILDING
     
-    # 빠른 키워드 매칭
-    user_input_lower = user_input.lower()
-    
-    # 광고 생성 관련 키워드
-    ad_keywords = ['광고', '이미지', '포스터', '홍보', '배너', '만들어', '생성', '디자인', '아이디어']
-    if any(keyword in user_input_lower for keyword in ad_keywords):
-        return ConversationIntent.AD_GENERATION
-    
-    # 정보 업데이트 관련 키워드
-    update_keywords = ['요즘', '요새', '최근', '지금', '바뀌', '변경', '늘었', '줄었', '많아', '적어', '달라', '다르', '추가', '새로']
-    if any(keyword in user_input_lower for keyword in update_keywords):
+    # 로컬 분류기(키워드 + n-gram 유사도, intent_router.py)로 GPT 호출 없이 분류
+    label, _ = classify_utterance(user_input)
+    if label == "info_update":
         return ConversationIntent.INFO_UPDATE
-    
-    # 분석 관련 키워드
-    analysis_keywords = ['왜', '이유', '분석', '어떻게', '추천', '조언', '도움']
-    if any(keyword in user_input_lower for keyword in analysis_keywords):
+    if label == "analysis":
         return ConversationIntent.ANALYSIS
     
-    # 기본값: 광고 생성
+    # 광고 요청 / 동의 / 기타: 광고 생성
     return ConversationIntent.AD_GENERATION
 
 # langchain 변수 정의
@@ -73,27 +79,183 @@ MAX_MEMORY_TURNS = 10
 parser_ad = PydanticOutputParser(pydantic_object=DialogueGPTResponse_AD)
 parser_profile = PydanticOutputParser(pydantic_object=DialogueGPTResponse_Profile)
 
-# 사용자별 대화 세션 저장 (user_id -> {chain, last_access})
-CONVERSATION_MEMORIES: Dict[str, Dict] = {}
+# 구조화 출력 모드: OpenAI JSON Schema(strict)로 응답 형식을 강제
+# - 프롬프트의 긴 format_instructions 블록 대신 짧은 안내문만 사용 (매 턴 입력 토큰 절감)
+# - 파싱 실패 시 DIALOGUE_PARSE_RETRIES 횟수만큼 같은 턴을 다시 요청
+DIALOGUE_STRUCTURED_OUTPUT = os.getenv("DIALOGUE_STRUCTURED_OUTPUT", "true").lower() == "true"
+DIALOGUE_PARSE_RETRIES = int(os.getenv("DIALOGUE_PARSE_RETRIES", "1"))
+_STRUCTURED_FORMAT_NOTE = "(응답 형식은 시스템이 JSON 스키마로 지정합니다. 스키마의 필드만 채워서 응답하세요.)"
+
+
+def _nullable(schema: dict) -> dict:
+    return {"anyOf": [schema, {"type": "null"}]}
+
+
+# strict 모드 규칙: 모든 필드 required + additionalProperties false, 선택 필드는 null 허용으로 표현
+_FINAL_CONTENT_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "idea": {"type": "string", "description": "추천 이벤트/마케팅 아이디어"},
+        "caption": {"type": "string", "description": "홍보용 문구"},
+        "hashtags": {"type": "array", "items": {"type": "string"}, "description": "해시태그 목록"},
+        "image_prompt": {"type": "string", "description": "이미지 생성용 프롬프트"},
+        "bgm_prompt": _nullable({"type": "string", "description": "MusicGen용 BGM 프롬프트"}),
+        "generate_mode": _nullable({"type": "string", "description": "image_only | image_audio | image_audio_video"}),
+    },
+    "required": ["idea", "caption", "hashtags", "image_prompt", "bgm_prompt", "generate_mode"],
+    "additionalProperties": False,
+}
+
+_DIALOGUE_AD_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "is_complete": {"type": "boolean", "description": "정보 수집 완료 여부. True면 대화 종료."},
+        "next_question": _nullable({"type": "string", "description": "다음으로 사용자에게 물어볼 질문 텍스트"}),
+        "final_content": _nullable(_FINAL_CONTENT_JSON_SCHEMA),
+    },
+    "required": ["is_complete", "next_question", "final_content"],
+    "additionalProperties": False,
+}
+
+_DIALOGUE_PROFILE_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "is_complete": {"type": "boolean", "description": "정보 수집 완료 여부. True면 대화 종료."},
+        "next_question": _nullable({"type": "string", "description": "다음으로 사용자에게 물어볼 질문 텍스트"}),
+        "last_ment": _nullable({"type": "string", "description": "정보 수집 완료 시 표시할 확인 메시지"}),
+    },
+    "required": ["is_complete", "next_question", "last_ment"],
+    "additionalProperties": False,
+}
+
+
+def _response_format_for(parser) -> dict:
+    name, schema = (
+        ("dialogue_ad", _DIALOGUE_AD_JSON_SCHEMA)
+        if parser is parser_ad
+        else ("dialogue_profile", _DIALOGUE_PROFILE_JSON_SCHEMA)
+    )
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "strict": True, "schema": schema},
+    }
+
+
+# 응답 파싱/재요청 통계 (/gpt/stats)
+_dialogue_output_stats = {
+    "turns": 0,
+    "parse_failures": 0,
+    "retries": 0,
+    "retry_successes": 0,
+    "failed_turns": 0,
+}
+
+
+class DialogueOutputError(ValueError):
+    """LLM 응답이 대화 응답 스키마로 파싱되지 않음"""
+
+# 세션 저장소 설정 (SESSION_BACKEND=memory|sql, session_store.py 참고)
+# - 대화 세션: 마지막 턴 이후 SESSION_TTL_SEC 지나면 만료, 전체 추정 크기 SESSION_STORE_MAX_MB 초과 시 LRU 제거
+# - 게스트 컨텍스트: 정보 수집 완료 후 다음 대화에서 재사용하기 위한 요약 정보 (더 길게 유지)
+SESSION_TTL_SEC = int(os.getenv("SESSION_TTL_SEC", "1800"))
+SESSION_STORE_MAX_MB = int(os.getenv("SESSION_STORE_MAX_MB", "256"))
+GUEST_CONTEXT_TTL_SEC = int(os.getenv("GUEST_CONTEXT_TTL_SEC", "86400"))
+GUEST_CONTEXT_MAX_MB = int(os.getenv("GUEST_CONTEXT_MAX_MB", "32"))
+SESSION_SWEEP_INTERVAL_SEC = int(os.getenv("SESSION_SWEEP_INTERVAL_SEC", "60"))
+
+def _release_session_resources(session_key: str, session: dict):
+    """세션 제거 시 MinIO에 올려둔 제품 이미지도 삭제"""
+    image_ref = session.get("product_image_ref") if isinstance(session, dict) else None
+    if image_ref:
+        try:
+            minio_service.delete_object(image_ref)
+        except Exception as e:
+            print(f"⚠️ 세션 이미지 삭제 실패 ({session_key}): {e}")
+
+
+# 사용자별 대화 세션 상태 (session_key -> {intent, history, prompt_vars, user_context, product_image_ref})
+# - JSON 직렬화 가능한 상태만 저장, LLM chain은 턴마다 상태로부터 재구성 (_build_conversation_chain)
+conversation_sessions = create_session_store(
+    "conversation",
+    ttl_sec=SESSION_TTL_SEC,
+    max_bytes=SESSION_STORE_MAX_MB * 1024 * 1024,
+    on_evict=_release_session_resources,
+)
+
+# 비로그인 사용자 컨텍스트 저장 (대화 세션 종료 후에도 유지, TTL로 정리)
+guest_contexts = create_session_store(
+    "guest_context",
+    ttl_sec=GUEST_CONTEXT_TTL_SEC,
+    max_bytes=GUEST_CONTEXT_MAX_MB * 1024 * 1024,
+)
+
+# 단발성 호출 응답 캐시 (response_cache.py)
+# - 마케팅 아이디어: 같은 맥락 정보 안에서 요청 문장이 같거나 거의 같으면(임베딩 유사도) 재사용
+# - 지역명 변환: User.location은 거의 바뀌지 않으므로 exact 캐시만 길게 유지
+IDEA_CACHE_TTL_SEC = int(os.getenv("IDEA_CACHE_TTL_SEC", "21600"))
+IDEA_CACHE_MAX_ENTRIES = int(os.getenv("IDEA_CACHE_MAX_ENTRIES", "512"))
+IDEA_CACHE_SIMILARITY = float(os.getenv("IDEA_CACHE_SIMILARITY", "0.95"))
+CITY_CACHE_TTL_SEC = int(os.getenv("CITY_CACHE_TTL_SEC", "604800"))
+CITY_CACHE_MAX_ENTRIES = int(os.getenv("CITY_CACHE_MAX_ENTRIES", "4096"))
+
+marketing_idea_cache = ResponseCache(
+    "marketing_idea",
+    ttl_sec=IDEA_CACHE_TTL_SEC,
+    max_entries=IDEA_CACHE_MAX_ENTRIES,
+    similarity_threshold=IDEA_CACHE_SIMILARITY,
+)
+city_name_cache = ResponseCache(
+    "city_name",
+    ttl_sec=CITY_CACHE_TTL_SEC,
+    max_entries=CITY_CACHE_MAX_ENTRIES,
+)
+
+
+def attach_session_image(session_key: str, image_bytes: bytes, content_type: str) -> Optional[str]:
+    """
+    제품 이미지를 MinIO에 올리고 세션에는 참조 경로만 저장 (세션 없으면 None)
+    이전에 올린 이미지가 있으면 교체 후 삭제
+    (MinIO 업로드 포함 동기 함수 → 라우트에서 asyncio.to_thread로 호출)
+    """
+    session = conversation_sessions.get(session_key)
+    if session is None:
+        return None
 
-# 사용자 컨텍스트 영구 저장 (세션 종료 후에도 유지)
-USER_CONTEXTS: Dict[str, Dict] = {}
+    image_ref = minio_service.upload_bytes(image_bytes, content_type or "image/png")
+    previous_ref = session.get("product_image_ref")
+    if not conversation_sessions.update(session_key, product_image_ref=image_ref):
+        # 업로드 도중 세션이 만료된 경우
+        _release_session_resources(session_key, {"product_image_ref": image_ref})
+        return None
+    if previous_ref:
+        _release_session_resources(session_key, {"product_image_ref": previous_ref})
+    return image_ref
+
+
+async def end_conversation_session(session_key: str) -> bool:
+    """대화 완료 시 세션 + 연결된 리소스 정리 (MinIO 삭제는 스레드에서)"""
+    session = await conversation_sessions.delete_async(session_key)
+    if session is None:
+        return False
+    await asyncio.to_thread(_release_session_resources, session_key, session)
+    return True
+
+
+async def get_session_stats() -> dict:
+    return {
+        "conversation": await conversation_sessions.stats_async(),
+        "guest_context": await guest_contexts.stats_async(),
+    }
 
 # ================== 프롬프트 템플릿들 ==================
+# 레이아웃: [고정 지시문 + 응답 형식] → [사업자 정보/전략(세션별)] → [대화 기록] → [사용자 입력]
+# - 의도별 앞부분이 모든 세션에서 동일 → OpenAI 프롬프트 prefix 캐시 hit (cached_tokens는 /gpt/stats에서 확인)
+# - 세션마다 달라지는 값은 고정 지시문 안에 넣지 말 것
 
 # 1️⃣ 마케팅 전략 정보 수집 프롬프트 (첫 대화 전용)
 PROFILE_BUILDING_TEMPLATE = """
 당신은 소상공인 전담 마케팅 전문가입니다.
 
-=== 사업자 기본 정보 (이미 알고 있는 정보) ===
-업종: {business_type}
-위치: {location}
-주력 상품: {menu_items}
-영업시간: {business_hours}
-
-=== 현재 수집된 마케팅 전략 정보 ===
-{existing_strategy}
-
 === 대화 목표 ===
 이번이 첫 대화이므로, 효과적인 마케팅을 위해 다음 핵심 정보를 자연스럽게 수집하세요:
 
@@ -101,7 +263,7 @@ PROFILE_BUILDING_TEMPLATE = """
    - 예: "주로 어떤 고객층이 많이 방문하시나요?"
    
 2. **차별화 포인트** (경쟁업체 대비 강점)
-   - 예: "주변 {business_type}들과 비교했을 때 특별한 강점이 있으신가요?"
+   - 예: "주변 같은 업종 가게들과 비교했을 때 특별한 강점이 있으신가요?"
    
 3. **브랜드 컨셉** (추구하는 이미지, 분위기)
    - 예: "어떤 분위기나 이미지를 추구하시나요?"
@@ -119,13 +281,22 @@ PROFILE_BUILDING_TEMPLATE = """
 - 기본 정보(업종, 위치, 메뉴 등)는 절대 다시 묻지 마세요
 - 같은 내용의 질문을 절대 3번 이상 반복하지 마세요
 
+=== 응답 형식 ===
+{format_instructions}
+
+=== 사업자 기본 정보 (이미 알고 있는 정보) ===
+업종: {business_type}
+위치: {location}
+주력 상품: {menu_items}
+영업시간: {business_hours}
+
+=== 현재 수집된 마케팅 전략 정보 ===
+{existing_strategy}
+
 === 현재 대화 ===
 {history}
 
 사용자: {input}
-
-다음 JSON 형식으로 응답:
-{format_instructions}
 """
 
 # 2️⃣ 비로그인 사용자 축약 프로필 수집 및 광고 생성 프롬프트
@@ -172,25 +343,19 @@ GUEST_PROFILE_TEMPLATE = """
 - 친근한 톤 유지
 - 같은 질문은 절대 3번 이상 반복하지 마세요
 
+=== 응답 형식 ===
+{format_instructions}
+
 === 현재 대화 ===
 {history}
 
 사용자: {input}
-
-다음 JSON 형식으로 응답:
-{format_instructions}
 """
 
 # 2-2️⃣ 비로그인 사용자 광고 생성 프롬프트 (정보 수집 완료 후)
 GUEST_AD_GENERATION_TEMPLATE = """
 당신은 소상공인 전담 마케팅 전문가입니다.
 
-=== 사업자 정보 (비로그인 사용자가 제공한 정보) ===
-업종: {business_type}
-위치: {location}
-주력 상품: {menu_items}
-타겟 고객: {existing_strategy}
-
 === 대화 목표 ===
 사용자가 원하는 광고를 생성하기 위해 **전략 협의 프로세스**를 따르세요:
 
@@ -198,7 +363,7 @@ GUEST_AD_GENERATION_TEMPLATE = """
 사용자가 광고를 요청하면, 즉시 생성하지 말고 먼저 구체적인 전략을 제안하세요:
 
 1. **메인 메시지**: 핵심 문구 (예: "따뜻한 크리스마스, 건강한 빵과 함께")
-2. **타겟 고객**: 누구를 대상으로? (위 타겟 고객 정보 활용)
+2. **타겟 고객**: 누구를 대상으로? (아래 사업자 정보의 타겟 고객 활용)
 3. **비주얼 컨셉**: 어떤 느낌? (예: 아늑한, 트렌디한, 고급스러운)
 4. **이미지 스타일**: 구체적인 비주얼 방향
 5. **주요 요소**: 포함할 내용 (제품, 이벤트, 할인 등)
@@ -231,28 +396,27 @@ GUEST_AD_GENERATION_TEMPLATE = """
 2. **전략만 제안**: 동의 전까지는 항상 next_question에 전략 제안
 3. **명확한 동의 대기**: 애매한 반응에는 다시 확인
 4. **무한 수정 가능**: 사용자가 만족할 때까지 전략 조정
-5. **수집된 정보 활용**: 위 사업자 정보를 적극 반영
+5. **수집된 정보 활용**: 아래 사업자 정보를 적극 반영
+
+=== 응답 형식 ===
+{format_instructions}
+
+=== 사업자 정보 (비로그인 사용자가 제공한 정보) ===
+업종: {business_type}
+위치: {location}
+주력 상품: {menu_items}
+타겟 고객: {existing_strategy}
 
 === 현재 대화 ===
 {history}
 
 사용자: {input}
-
-다음 JSON 형식으로 응답:
-{format_instructions}
 """
 
 # 3️⃣ 정보 업데이트 프롬프트
 INFO_UPDATE_TEMPLATE = """
 당신은 소상공인 전담 마케팅 전문가입니다.
 
-=== 사업자 정보 ===
-업종: {business_type} | 위치: {location}
-주력 상품: {menu_items}
-
-=== 현재 마케팅 전략 정보 ===
-{existing_strategy}
-
 === 대화 목표 ===
 사용자가 제공한 새로운 정보를 반영하여 마케팅 전략 정보를 업데이트하세요.
 
@@ -261,26 +425,26 @@ INFO_UPDATE_TEMPLATE = """
   * is_complete: true
   * last_ment: "위의 대화를 반영하겠습니다" 
 
+=== 응답 형식 ===
+{format_instructions}
+
+=== 사업자 정보 ===
+업종: {business_type} | 위치: {location}
+주력 상품: {menu_items}
+
+=== 현재 마케팅 전략 정보 ===
+{existing_strategy}
+
 === 현재 대화 ===
 {history}
 
 사용자: {input}
-
-다음 JSON 형식으로 응답:
-{format_instructions}
 """
 
 # 3️⃣ 광고 생성 프롬프트 (2단계: 전략 협의 → 최종 생성)
 AD_GENERATION_TEMPLATE = """
 당신은 소상공인 전담 마케팅 전문가입니다.
 
-=== 사업자 정보 ===
-업종: {business_type} | 위치: {location}
-주력 상품: {menu_items}
-
-=== 마케팅 전략 정보 ===
-{existing_strategy}
-
 === 대화 목표 ===
 사용자가 원하는 광고를 생성하기 위해 **전략 협의 프로세스**를 따르세요:
 
@@ -350,19 +514,33 @@ bgm_prompt는 MusicGen에서 바로 사용할 수 있는 영어 문장이어야
     "warm lo-fi hip hop instrumental, cozy and relaxed mood, 80-90 BPM, soft piano and light drums, background music for a small neighborhood cafe"
 
 
+=== 응답 형식 ===
+{format_instructions}
+
+=== 사업자 정보 ===
+업종: {business_type} | 위치: {location}
+주력 상품: {menu_items}
+
+=== 마케팅 전략 정보 ===
+{existing_strategy}
+
 === 현재 대화 ===
 {history}
 
 사용자: {input}
-
-다음 JSON 형식으로 응답:
-{format_instructions}
 """
 
 # 4️⃣ 분석/조언 프롬프트 (틀만)
 ANALYSIS_TEMPLATE = """
 당신은 소상공인 전담 마케팅 전문가입니다.
 
+=== 대화 목표 ===
+사용자의 질문에 대해 전문적인 분석과 조언을 제공하세요.
+(이 프롬프트는 향후 구현 예정)
+
+=== 응답 형식 ===
+{format_instructions}
+
 === 사업자 정보 ===
 업종: {business_type} | 위치: {location}
 주력 상품: {menu_items}
@@ -370,17 +548,10 @@ ANALYSIS_TEMPLATE = """
 === 마케팅 전략 정보 ===
 {existing_strategy}
 
-=== 대화 목표 ===
-사용자의 질문에 대해 전문적인 분석과 조언을 제공하세요.
-(이 프롬프트는 향후 구현 예정)
-
 === 현재 대화 ===
 {history}
 
 사용자: {input}
-
-다음 JSON 형식으로 응답:
-{format_instructions}
 """
 
 
@@ -407,6 +578,51 @@ def _safe_json_from_text(text: str) -> dict:
         
        
 
+def _parse_dialogue_output(
+    intent: ConversationIntent,
+    raw_response: str,
+    is_retry: bool = False,
+) -> DialogueGPTResponse_AD | DialogueGPTResponse_Profile:
+    """LLM 원문 → DialogueGPTResponse_AD / _Profile (실패 시 DialogueOutputError + 통계 기록)"""
+    try:
+        if DIALOGUE_STRUCTURED_OUTPUT:
+            try:
+                data = json.loads(raw_response)
+            except json.JSONDecodeError:
+                data = _safe_json_from_text(raw_response)
+        else:
+            data = _safe_json_from_text(raw_response)
+
+        if intent in [ConversationIntent.AD_GENERATION, ConversationIntent.GUEST_AD_GENERATION]:
+            # 광고 생성 모드 (로그인 AD_GENERATION + 비로그인 GUEST_AD_GENERATION)
+            data["type"] = "ad"  # type 필드 강제 주입
+            response = DialogueGPTResponse_AD(**data)
+        else:
+            # PROFILE_BUILDING, INFO_UPDATE, ANALYSIS, GUEST_PROFILE
+            data["type"] = "profile"  # type 필드 강제 주입
+            # GPT가 last_ment를 안 보내면 강제 주입
+            if data.get("is_complete") and not data.get("last_ment"):
+                data["last_ment"] = "위의 대화를 반영하겠습니다"
+            response = DialogueGPTResponse_Profile(**data)
+    except Exception as e:
+        _dialogue_output_stats["parse_failures"] += 1
+        print(f"⚠️ 대화 응답 파싱 실패{' (재요청)' if is_retry else ''}: {e}")
+        raise DialogueOutputError(f"GPT 응답 파싱 실패: {e}")
+
+    if is_retry:
+        _dialogue_output_stats["retry_successes"] += 1
+    return response
+
+
+def get_dialogue_output_stats() -> dict:
+    stats = dict(_dialogue_output_stats)
+    turns = stats["turns"] or 1
+    stats["structured_output"] = DIALOGUE_STRUCTURED_OUTPUT
+    stats["parse_failure_rate"] = round(stats["parse_failures"] / turns, 4)
+    stats["retry_rate"] = round(stats["retries"] / turns, 4)
+    return stats
+
+
 # ================== Multi-turn langchain 대화 관리 함수 ==================
 
 def _check_profile_completeness(context: dict) -> bool:
@@ -456,11 +672,369 @@ def _format_strategy_info(memory) -> str:
     return "\n".join(lines) if lines else "아직 수집된 정보 없음"
 
 
+# 프롬프트의 {existing_strategy} 블록 상한 (본인 전략 + 유사 업종 참고 전략)
+MEMORY_CONTEXT_TOKEN_BUDGET = int(os.getenv("MEMORY_CONTEXT_TOKEN_BUDGET", "400"))
+
+
+def _format_similar_strategies(similar: Optional[list]) -> str:
+    """memory_search.find_similar_strategies 결과 → 참고용 요약 (업종 + 핵심 전략 필드만)"""
+    if not similar:
+        return ""
+
+    lines = ["[유사 업종 참고 전략]"]
+    for item in similar:
+        strategy = item.get("marketing_strategy") or {}
+        parts = [
+            f"{label}: {strategy[key]}"
+            for key, label in (
+                ("target_audience", "타겟"),
+                ("competitive_advantage", "차별화"),
+                ("brand_concept", "컨셉"),
+            )
+            if strategy.get(key)
+        ]
+        if parts:
+            lines.append(f"- ({item.get('business_type') or '업종 미상'}) " + " / ".join(parts))
+    return "\n".join(lines) if len(lines) > 1 else ""
+
+
+def _build_strategy_context(ctx: dict) -> str:
+    """
+    {existing_strategy} 값: 본인 전략 우선, 남는 토큰 예산만큼 유사 업종 전략 추가
+    → 메모리/사용자가 늘어도 프롬프트 크기는 MEMORY_CONTEXT_TOKEN_BUDGET 이내
+    """
+    own = truncate_to_tokens(_format_strategy_info(ctx.get("memory")), MEMORY_CONTEXT_TOKEN_BUDGET)
+    similar = _format_similar_strategies(ctx.get("similar_strategies"))
+    if not similar:
+        return own
+
+    remaining = MEMORY_CONTEXT_TOKEN_BUDGET - count_tokens(own)
+    if remaining <= 0:
+        return own
+    return own + "\n\n" + truncate_to_tokens(similar, remaining)
+
+
+def _decide_intent(user_input: str, is_guest: bool, user_context: Optional[dict]) -> ConversationIntent:
+    """새 세션의 대화 의도 결정"""
+    if is_guest:
+        # 비로그인 사용자: user_context 존재 여부로 판단
+        if user_context and user_context.get("business_type") and user_context.get("business_type") != "미확인":
+            # 정보 수집 완료 → 광고 생성 모드
+            print(f"🎯 비로그인 사용자 정보 있음 → 광고 생성 모드")
+            return ConversationIntent.GUEST_AD_GENERATION
+        # 정보 수집 필요 → 프로필 수집 모드
+        print(f"🆕 비로그인 사용자 정보 없음 → 프로필 수집 모드")
+        return ConversationIntent.GUEST_PROFILE
+
+    if user_context:
+        # 로그인 사용자: 마케팅 전략 정보 완성 여부 체크
+        if _check_profile_completeness(user_context):
+            # 프로필 완성 → 광고 생성 또는 정보 업데이트
+            return classify_user_intent(user_input, has_complete_profile=True)
+        # 프로필 미완성 → 상세 프로필 수집
+        return ConversationIntent.PROFILE_BUILDING
+
+    # user_context 없음 → 프로필 수집
+    return ConversationIntent.PROFILE_BUILDING
+
+
+def _template_and_parser(intent: ConversationIntent):
+    """의도별 프롬프트 템플릿 + 출력 파서"""
+    if intent == ConversationIntent.GUEST_PROFILE:
+        return GUEST_PROFILE_TEMPLATE, parser_profile  # 비로그인 첫 대화는 정보 수집 스키마
+    if intent == ConversationIntent.GUEST_AD_GENERATION:
+        return GUEST_AD_GENERATION_TEMPLATE, parser_ad
+    if intent == ConversationIntent.PROFILE_BUILDING:
+        return PROFILE_BUILDING_TEMPLATE, parser_profile
+    if intent == ConversationIntent.INFO_UPDATE:
+        return INFO_UPDATE_TEMPLATE, parser_profile
+    if intent == ConversationIntent.AD_GENERATION:
+        return AD_GENERATION_TEMPLATE, parser_ad
+    return PROFILE_BUILDING_TEMPLATE, parser_profile
+
+
+def _new_session_state(user_input: str, is_guest: bool, user_context: Optional[dict]) -> dict:
+    """
+    새 세션의 직렬화 가능한 상태 생성
+    - 장기 메모리(ORM 객체)는 프롬프트용 문자열로만 변환해 보관
+    """
+    intent = _decide_intent(user_input, is_guest, user_context)
+    print(f"🎯 감지된 의도: {intent.value}")
+
+    ctx = user_context or {}
+    prompt_vars = {
+        "business_type": ctx.get("business_type", "미확인"),
+        "location": ctx.get("location", "미확인"),
+        "menu_items": ctx.get("menu_items", "미확인"),
+        "business_hours": ctx.get("business_hours", "미확인"),
+        # 마케팅 전략 정보 포맷팅 (본인 전략 + 유사 업종 검색 결과, 토큰 예산 내)
+        "existing_strategy": _build_strategy_context(ctx),
+    }
+    stored_context = (
+        {k: v for k, v in ctx.items() if k not in ("memory", "similar_strategies")}
+        if user_context else None
+    )
+
+    return {
+        "intent": intent.value,
+        "history": [],
+        "prompt_vars": prompt_vars,
+        "user_context": stored_context,  # 로그인/비로그인 모두 동일하게 관리
+    }
+
+
+def _build_conversation_chain(state: dict, model: str = DIALOGUE_MODEL_FULL):
+    """세션 상태 → (ConversationChain, memory, parser) 재구성 (model: 이번 턴 라우팅 결과)"""
+    template, parser = _template_and_parser(ConversationIntent(state["intent"]))
+
+    # LangChain 설정 (LLM은 프로세스 공용 인스턴스, chain/memory만 턴마다 구성)
+    llm = get_chat_llm(model, temperature=0.7)
+    if DIALOGUE_STRUCTURED_OUTPUT:
+        llm = llm.bind(response_format=_response_format_for(parser))
+        format_instructions = _STRUCTURED_FORMAT_NOTE
+    else:
+        format_instructions = parser.get_format_instructions()
+
+    # 최근 k턴 + 토큰 예산(DIALOGUE_HISTORY_TOKEN_BUDGET) 안에서만 history 구성
+    # - 문자열 템플릿이므로 "Human: ... / AI: ..." 형태로 주입 (메시지 객체 repr보다 토큰 절약)
+    memory_obj = TokenBudgetMemory(
+        k=MAX_MEMORY_TURNS,
+        memory_key="history",
+        return_messages=False
+    )
+    for msg in state.get("history", []):
+        if msg["role"] == "user":
+            memory_obj.chat_memory.add_user_message(msg["content"])
+        else:
+            memory_obj.chat_memory.add_ai_message(msg["content"])
+
+    prompt = PromptTemplate(
+        template=template,
+        input_variables=["input"],
+        partial_variables={
+            "format_instructions": format_instructions,
+            **state["prompt_vars"],
+        },
+    )
+
+    chain = ConversationChain(
+        llm=llm,
+        prompt=prompt,
+        memory=memory_obj,
+        verbose=False
+    )
+    return chain, memory_obj, parser
+
+
+def _serialize_history(memory_obj) -> list:
+    """langchain 메시지 → [{"role", "content"}] (세션 저장 + 대화 완료 시 conversation_history 형식)"""
+    return [
+        {
+            "role": "user" if msg.type == "human" else "assistant",
+            "content": msg.content
+        }
+        for msg in memory_obj.chat_memory.messages
+    ]
+
+
+async def _latest_product_image_ref(session_key: str, state: dict) -> Optional[str]:
+    """턴 진행 중 업로드된 이미지도 반영하기 위해 저장소에서 다시 조회"""
+    latest = await conversation_sessions.get_async(session_key) or state
+    return latest.get("product_image_ref")
+
+
+async def _prepare_conversation_turn(
+    user_input: str,
+    session_key: str,
+    is_guest: bool,
+    user_context: Optional[dict],
+) -> dict:
+    """세션 상태 로드(없으면 생성) + chain 재구성"""
+    # 세션 재사용 또는 새 세션 생성 (상태만 저장소에서 읽고 chain은 이 워커에서 재구성)
+    state = await conversation_sessions.get_async(session_key)
+    if state is not None:
+        print(f"♻️  기존 대화 세션 재사용: {session_key}")
+    else:
+        print(f"✅ 새 대화 세션 생성: {session_key}")
+        state = _new_session_state(user_input, is_guest, user_context)
+        await conversation_sessions.put_async(session_key, state)
+
+    # 이번 턴 모델 티어 결정 (정보 수집/확인 → mini, 최종 광고 생성 → full)
+    route = route_dialogue_turn(state["intent"], user_input)
+    print(f"🧭 라우팅: {route['tier']} ({route['model']}, label={route['label']}, conf={route['confidence']})")
+
+    chain, memory_obj, parser = _build_conversation_chain(state, route["model"])
+    return {
+        "route": route,
+        "state": state,
+        "intent": ConversationIntent(state["intent"]),
+        "user_context": state.get("user_context"),
+        "chain": chain,
+        "memory": memory_obj,
+        "parser": parser,
+    }
+
+
+async def _finalize_conversation_turn(
+    turn: dict,
+    session_key: str,
+    is_guest: bool,
+    response: DialogueGPTResponse_AD | DialogueGPTResponse_Profile,
+    user_id: Optional[int] = None,
+) -> DialogueGPTResponse_AD | DialogueGPTResponse_Profile:
+    """
+    파싱된 응답 → 세션 기록 갱신 + 응답 보정 + 대화 완료 처리
+    - 완료 시 (로그인 사용자) 장기 메모리 갱신을 백그라운드로 시작한 뒤 Vision 프롬프트 생성
+      → 전략 추출/임베딩과 Vision 호출이 동시에 진행되고, 응답은 Vision만 기다림
+    """
+    state = turn["state"]
+    intent = turn["intent"]
+    user_context = turn["user_context"]
+    memory_obj = turn["memory"]
+
+    # 이번 턴까지의 대화 기록만 갱신 (동시에 업로드된 제품 이미지 경로 등 다른 필드는 유지)
+    await conversation_sessions.update_async(session_key, history=_serialize_history(memory_obj))
+    
+    if isinstance(response, DialogueGPTResponse_AD):
+        # ----------------------------------------
+        # bgm_prompt 최소 검증 + 보정
+        # ----------------------------------------
+        if response.final_content:
+            bgm_prompt = (response.final_content.bgm_prompt or "").strip()
+
+            # 1) 비어 있으면 기본값으로 교체
+            if not bgm_prompt:
+                bgm_prompt = (
+                    "warm lo-fi hip hop instrumental, cozy and relaxed mood, "
+                    "80-90 BPM, soft piano and light drums, "
+                    "background music for a small neighborhood cafe"
+                )
+            else:
+                # 2) 너무 짧으면 (단어 5개 미만) 기본값으로 교체
+                if len(bgm_prompt.split()) < 5:
+                    bgm_prompt = (
+                        "warm lo-fi hip hop instrumental, cozy and relaxed mood, "
+                        "80-90 BPM, soft piano and light drums, "
+                        "background music for a small neighborhood cafe"
+                    )
+
+            # 3) pydantic 객체 업데이트
+            updated_final_content = response.final_content.model_copy(
+                update={"bgm_prompt": bgm_prompt}
+            )
+            response = response.model_copy(update={"final_content": updated_final_content})
+    
+    # 대화 완료 시: 대화 기록 추출 + Vision 통합 (세션 삭제는 gpt.py에서 처리)
+    if response.is_complete:
+        # 비로그인 사용자 첫 대화 완료: 정보 저장
+        if is_guest and intent == ConversationIntent.GUEST_PROFILE:
+            print("✅ 비로그인 사용자 정보 수집 완료")
+            
+            # 대화 히스토리에서 정보 추출
+            messages = memory_obj.chat_memory.messages
+            
+            # 간단한 정보 추출: 사용자가 말한 내용에서 추출
+            collected_info = {
+                "business_type": "미확인",
+                "location": "미확인",
+                "menu_items": "미확인",
+                "target_audience": "미확인"
+            }
+            
+            # 사용자 응답만 추출하여 저장 (간단한 방식)
+            user_responses = [msg.content for msg in messages if msg.type == "human"]
+            if len(user_responses) >= 1:
+                collected_info["business_type"] = user_responses[0] if len(user_responses) > 0 else "미확인"
+            if len(user_responses) >= 2:
+                collected_info["menu_items"] = user_responses[1] if len(user_responses) > 1 else "미확인"
+            if len(user_responses) >= 3:
+                collected_info["target_audience"] = user_responses[2] if len(user_responses) > 2 else "미확인"
+            
+            # location은 business_type에서 추출 시도 (예: "서울 강남 카페" → location: "서울 강남")
+            if collected_info["business_type"] != "미확인":
+                parts = collected_info["business_type"].split()
+                if len(parts) >= 2:
+                    collected_info["location"] = " ".join(parts[:-1])  # 마지막 단어(업종) 제외
+            
+            # guest_contexts에 저장 (대화 세션 삭제되어도 GUEST_CONTEXT_TTL_SEC 동안 유지)
+            await guest_contexts.put_async(session_key, collected_info)
+            print(f"💾 수집된 정보 저장 (guest_contexts): {collected_info}")
+            print("➡️  다음 대화는 GUEST_AD_GENERATION 모드로 시작됩니다")
+        
+        # 대화 기록 추출
+        conversation_history = _serialize_history(memory_obj)
+        response.conversation_history = conversation_history
+        print(f"📝 대화 기록 추출 완료: {len(conversation_history)}개 메시지")
+        
+        # 로그인 사용자 장기 메모리 갱신 (백그라운드 + 재시도, Vision 결과와 무관하므로 먼저 시작)
+        if user_id is not None:
+            final_content_dict = (
+                response.final_content.model_dump()
+                if getattr(response, "final_content", None)
+                else None
+            )
+            memory_service.schedule_user_memory_update(user_id, conversation_history, final_content_dict)
+            print(f"🧠 장기 메모리 업데이트 백그라운드 시작 (user_id={user_id})")
+        
+        # Vision 통합: 광고 생성 완료 + 제품 이미지 존재 시
+        is_ad_intent = intent in [ConversationIntent.AD_GENERATION, ConversationIntent.GUEST_AD_GENERATION]
+        product_image_ref = (
+            await _latest_product_image_ref(session_key, state)
+            if is_ad_intent and response.final_content
+            else None
+        )
+        if product_image_ref:
+            try:
+                print("🔍 Vision 분석 시작...")
+                
+                # 1. 전략 제안 추출
+                strategy_proposal = extract_last_strategy_proposal(conversation_history)
+                
+                if strategy_proposal:
+                    print(f"✅ 전략 제안 추출 성공: {strategy_proposal[:100]}...")
+                    
+                    # 2. Vision으로 상세 프롬프트 생성
+                    image_bytes = await asyncio.to_thread(
+                        minio_service.download_bytes, product_image_ref
+                    )
+                    product_image_base64 = base64.b64encode(image_bytes).decode("utf-8")
+                    business_info = {
+                        "business_type": user_context.get("business_type", "미확인") if user_context else "미확인",
+                        "location": user_context.get("location", "미확인") if user_context else "미확인",
+                        "menu_items": user_context.get("menu_items", "미확인") if user_context else "미확인"
+                    }
+                    
+                    enhanced_prompt = await generate_detailed_image_prompt_with_vision(
+                        strategy_proposal=strategy_proposal,
+                        product_image_base64=product_image_base64,
+                        business_info=business_info
+                    )
+                    
+                    # 3. image_prompt 교체
+                    if enhanced_prompt:
+                        # Pydantic 모델 업데이트
+                        updated_final_content = response.final_content.model_copy(
+                            update={"image_prompt": enhanced_prompt}
+                        )
+                        response = response.model_copy(
+                            update={"final_content": updated_final_content}
+                        )
+                        print("✅ Vision 프롬프트 적용 완료")
+                else:
+                    print("⚠️  전략 제안을 찾을 수 없음 (Vision 스킵)")
+                    
+            except Exception as e:
+                print(f"❌ Vision 통합 실패 (기본 프롬프트 유지): {e}")
+    
+    return response
+
+
 async def generate_conversation_response(
     user_input: str,
     session_key: str,
     is_guest: bool = False,
-    user_context: dict = None
+    user_context: dict = None,
+    user_id: Optional[int] = None
 ) -> DialogueGPTResponse_AD | DialogueGPTResponse_Profile:
     """
     [비동기 버전] langchain 사용해서 multi-turn 대화 응답 생성
@@ -470,263 +1044,181 @@ async def generate_conversation_response(
         session_key: 세션 키 (user-{id} or guest-{uuid})
         is_guest: 비로그인 사용자 여부
         user_context: 사용자 프로필 및 장기 메모리 (새 세션에만 제공)
+        user_id: 로그인 사용자 ID (대화 완료 시 장기 메모리 백그라운드 갱신)
     
     Returns:
         DialogueGPTResponse: 다음 질문 또는 최종 콘텐츠
     """
     try:
-        # 세션 재사용 또는 새 세션 생성
-        if session_key in CONVERSATION_MEMORIES:
-            print(f"♻️  기존 대화 세션 재사용: {session_key}")
-            session = CONVERSATION_MEMORIES[session_key]
-            memory_obj = session["memory"]
-            chain = session["chain"]
-            intent = session["intent"]
-            parser = session["parser"]
-                
-        else:
-            print(f"✅ 새 대화 세션 생성: {session_key}")
-            
-            # 인텐트 결정
-            if is_guest:
-                # 비로그인 사용자: user_context 존재 여부로 판단
-                if user_context and user_context.get("business_type") and user_context.get("business_type") != "미확인":
-                    # 정보 수집 완료 → 광고 생성 모드
-                    intent = ConversationIntent.GUEST_AD_GENERATION
-                    print(f"🎯 비로그인 사용자 정보 있음 → 광고 생성 모드")
-                else:
-                    # 정보 수집 필요 → 프로필 수집 모드
-                    intent = ConversationIntent.GUEST_PROFILE
-                    print(f"🆕 비로그인 사용자 정보 없음 → 프로필 수집 모드")
-            elif user_context:
-                # 로그인 사용자: 마케팅 전략 정보 완성 여부 체크
-                has_complete_profile = _check_profile_completeness(user_context)
-                if has_complete_profile:
-                    # 프로필 완성 → 광고 생성 또는 정보 업데이트
-                    intent = classify_user_intent(user_input, has_complete_profile=True)
-                else:
-                    # 프로필 미완성 → 상세 프로필 수집
-                    intent = ConversationIntent.PROFILE_BUILDING
-            else:
-                # user_context 없음 → 프로필 수집
-                intent = ConversationIntent.PROFILE_BUILDING
-            
-            print(f"🎯 감지된 의도: {intent.value}")
-            
-            # 프롬프트 및 파서 선택
-            if intent == ConversationIntent.GUEST_PROFILE:
-                template = GUEST_PROFILE_TEMPLATE
-                parser = parser_profile  # 비로그인 첫 대화는 정보 수집 스키마
-            elif intent == ConversationIntent.GUEST_AD_GENERATION:
-                template = GUEST_AD_GENERATION_TEMPLATE
-                parser = parser_ad
-            elif intent == ConversationIntent.PROFILE_BUILDING:
-                template = PROFILE_BUILDING_TEMPLATE
-                parser = parser_profile
-            elif intent == ConversationIntent.INFO_UPDATE:
-                template = INFO_UPDATE_TEMPLATE
-                parser = parser_profile
-            elif intent == ConversationIntent.AD_GENERATION:
-                template = AD_GENERATION_TEMPLATE
-                parser = parser_ad
-            else:
-                template = PROFILE_BUILDING_TEMPLATE
-                parser = parser_profile
-            
-            # 마케팅 전략 정보 포맷팅
-            strategy_text = _format_strategy_info(user_context.get("memory") if user_context else None)
-            
-            # LangChain 설정
-            llm = ChatOpenAI(
-                model="gpt-4o",
-                temperature=0.7,
-                openai_api_key=os.getenv("OPENAI_API_KEY")
-            )
-            
-            memory_obj = ConversationBufferWindowMemory(
-                k=MAX_MEMORY_TURNS,
-                memory_key="history",
-                return_messages=True
-            )
-            
-            prompt = PromptTemplate(
-                template=template,
-                input_variables=["input"],
-                partial_variables={
-                    "format_instructions": parser.get_format_instructions(),
-                    "business_type": user_context.get("business_type", "미확인") if user_context else "미확인",
-                    "location": user_context.get("location", "미확인") if user_context else "미확인",
-                    "menu_items": user_context.get("menu_items", "미확인") if user_context else "미확인",
-                    "business_hours": user_context.get("business_hours", "미확인") if user_context else "미확인",
-                    "existing_strategy": strategy_text
-                },
-            )
-            
-            chain = ConversationChain(
-                llm=llm,
-                prompt=prompt,
-                memory=memory_obj,
-                verbose=False
-            )
-            
-            # 세션 저장
-            CONVERSATION_MEMORIES[session_key] = {
-                "memory": memory_obj,
-                "chain": chain,
-                "intent": intent,
-                "parser": parser,
-                "user_context": user_context  # 로그인/비로그인 모두 동일하게 관리
-            }
+        turn = await _prepare_conversation_turn(user_input, session_key, is_guest, user_context)
+        _dialogue_output_stats["turns"] += 1
         
-        # langchain 실행(메모리 자동 관리 & 프롬프트 주입) - asyncio.to_thread 사용
-        raw_response = await asyncio.to_thread(
-            lambda: chain.invoke(input=user_input)['response'].strip()
+        started = time.perf_counter()
+        try:
+            response = await _invoke_with_parse_retry(turn, user_input)
+        except Exception:
+            record_routed_turn(turn["route"], time.perf_counter() - started, error=True)
+            raise
+        record_routed_turn(turn["route"], time.perf_counter() - started)
+        
+        return await _finalize_conversation_turn(turn, session_key, is_guest, response, user_id)
+
+    except Exception as e:
+        raise ValueError(f"LangChain 대화 응답 생성 실패: {e}")
+
+
+def _drop_last_exchange(memory_obj):
+    """파싱 실패한 턴(사용자 입력 + AI 응답)을 메모리에서 제거 → 재요청 시 히스토리 중복 방지"""
+    messages = memory_obj.chat_memory.messages
+    del messages[-2:]
+
+
+async def _invoke_with_parse_retry(turn: dict, user_input: str, start_attempt: int = 0):
+    """
+    chain.ainvoke + 응답 파싱, 실패하면 같은 턴을 DIALOGUE_PARSE_RETRIES번까지 다시 요청
+    - langchain 실행(메모리 자동 관리 & 프롬프트 주입)
+    - ainvoke → 공유 AsyncClient로 호출, LLM 응답 대기 중 스레드풀 점유 없음
+    - start_attempt=1: 스트리밍 호출이 첫 시도로 실패한 뒤 이어서 재시도
+    """
+    retries = DIALOGUE_PARSE_RETRIES
+    for attempt in range(start_attempt, retries + 1):
+        if attempt > 0:
+            _dialogue_output_stats["retries"] += 1
+            _drop_last_exchange(turn["memory"])
+        result = await turn["chain"].ainvoke(
+            {"input": user_input},
+            config={"callbacks": [UsageCallbackHandler(turn["memory"])]},
         )
+        raw_response = result["response"].strip()
+        try:
+            return _parse_dialogue_output(turn["intent"], raw_response, is_retry=attempt > 0)
+        except DialogueOutputError:
+            if attempt >= retries:
+                _dialogue_output_stats["failed_turns"] += 1
+                raise
+
+
+class _JsonStringFieldStreamer:
+    """
+    스트리밍 중인 JSON 텍스트에서 특정 문자열 필드 값만 점진적으로 디코딩
+    예) '{"is_complete": false, "next_question": "안녕' → "안녕" (이후 chunk가 오면 증가분만 반환)
+    """
+
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self, field: str):
+        self._pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._pos = None  # 필드 값 시작 위치 (찾기 전이면 None)
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        self._buffer += chunk
+        if self.done:
+            return ""
+
+        if self._pos is None:
+            match = self._pattern.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        out = []
+        buf, i = self._buffer, self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch == "\\":
+                if i + 1 >= len(buf):
+                    break  # 이스케이프가 chunk 경계에서 잘림 → 다음 chunk 대기
+                esc = buf[i + 1]
+                if esc == "u":
+                    if i + 6 > len(buf):
+                        break
+                    try:
+                        out.append(chr(int(buf[i + 2:i + 6], 16)))
+                    except ValueError:
+                        pass
+                    i += 6
+                    continue
+                out.append(self._ESCAPES.get(esc, esc))
+                i += 2
+                continue
+            out.append(ch)
+            i += 1
+
+        self._pos = i
+        return "".join(out)
+
+
+async def stream_conversation_response(
+    user_input: str,
+    session_key: str,
+    is_guest: bool = False,
+    user_context: dict = None,
+    user_id: Optional[int] = None
+):
+    """
+    [스트리밍 버전] generate_conversation_response와 같은 대화 처리, 토큰 단위로 진행 상황 전달
+    
+    Yields:
+        ("delta", str): next_question 텍스트 증가분 (토큰 도착 즉시)
+        ("final", DialogueGPTResponse): 전체 JSON 수신 + 후처리 완료 후 최종 응답
+    """
+    try:
+        turn = await _prepare_conversation_turn(user_input, session_key, is_guest, user_context)
+        _dialogue_output_stats["turns"] += 1
+        chain = turn["chain"]
+        started = time.perf_counter()
         
-        # 의도 가져오기
-        session = CONVERSATION_MEMORIES.get(session_key)
-        intent = session.get("intent") if session else ConversationIntent.AD_GENERATION
+        # ConversationChain과 같은 입력 구성(메모리 로드) → LLM 토큰 스트리밍 → 메모리 저장
+        inputs = chain.prep_inputs({"input": user_input})
+        prompt_value = chain.prompt.format_prompt(
+            **{key: inputs[key] for key in chain.prompt.input_variables}
+        )
         
-        # Pydantic 모델로 변환 (이미 parser가 올바른 타입으로 파싱함)
-        data = _safe_json_from_text(raw_response)
+        field_streamer = _JsonStringFieldStreamer("next_question")
+        chunks = []
+        async for chunk in chain.llm.astream(prompt_value):
+            text = chunk.content or ""
+            if not text:
+                continue
+            chunks.append(text)
+            delta = field_streamer.feed(text)
+            if delta:
+                yield "delta", delta
         
-        if intent in [ConversationIntent.AD_GENERATION, ConversationIntent.GUEST_AD_GENERATION]:
-            # 광고 생성 모드 (로그인 AD_GENERATION + 비로그인 GUEST_AD_GENERATION)
-            data["type"] = "ad"  # type 필드 강제 주입
-            response = DialogueGPTResponse_AD(**data)
-            
-            # ----------------------------------------
-            # bgm_prompt 최소 검증 + 보정
-            # ----------------------------------------
-            if response.final_content:
-                bgm_prompt = (response.final_content.bgm_prompt or "").strip()
-
-                # 1) 비어 있으면 기본값으로 교체
-                if not bgm_prompt:
-                    bgm_prompt = (
-                        "warm lo-fi hip hop instrumental, cozy and relaxed mood, "
-                        "80-90 BPM, soft piano and light drums, "
-                        "background music for a small neighborhood cafe"
-                    )
-                else:
-                    # 2) 너무 짧으면 (단어 5개 미만) 기본값으로 교체
-                    if len(bgm_prompt.split()) < 5:
-                        bgm_prompt = (
-                            "warm lo-fi hip hop instrumental, cozy and relaxed mood, "
-                            "80-90 BPM, soft piano and light drums, "
-                            "background music for a small neighborhood cafe"
-                        )
-
-                # 3) pydantic 객체 업데이트
-                updated_final_content = response.final_content.model_copy(
-                    update={"bgm_prompt": bgm_prompt}
-                )
-                response = response.model_copy(update={"final_content": updated_final_content})
-                           
-        else:
-            # PROFILE_BUILDING, INFO_UPDATE, ANALYSIS, GUEST_PROFILE
-            data["type"] = "profile"  # type 필드 강제 주입
-            # GPT가 last_ment를 안 보내면 강제 주입
-            if data.get("is_complete") and not data.get("last_ment"):
-                data["last_ment"] = "위의 대화를 반영하겠습니다"
-            response = DialogueGPTResponse_Profile(**data)
+        raw_response = "".join(chunks).strip()
+        chain.prep_outputs(inputs, {"response": raw_response})
         
-        # 대화 완료 시: 대화 기록 추출 + Vision 통합 (세션 삭제는 gpt.py에서 처리)
-        if response.is_complete and session_key in CONVERSATION_MEMORIES:
-            # 비로그인 사용자 첫 대화 완료: 정보 저장
-            if is_guest and intent == ConversationIntent.GUEST_PROFILE:
-                print("✅ 비로그인 사용자 정보 수집 완료")
-                
-                # 대화 히스토리에서 정보 추출
-                messages = memory_obj.chat_memory.messages
-                
-                # 간단한 정보 추출: 사용자가 말한 내용에서 추출
-                collected_info = {
-                    "business_type": "미확인",
-                    "location": "미확인",
-                    "menu_items": "미확인",
-                    "target_audience": "미확인"
-                }
-                
-                # 사용자 응답만 추출하여 저장 (간단한 방식)
-                user_responses = [msg.content for msg in messages if msg.type == "human"]
-                if len(user_responses) >= 1:
-                    collected_info["business_type"] = user_responses[0] if len(user_responses) > 0 else "미확인"
-                if len(user_responses) >= 2:
-                    collected_info["menu_items"] = user_responses[1] if len(user_responses) > 1 else "미확인"
-                if len(user_responses) >= 3:
-                    collected_info["target_audience"] = user_responses[2] if len(user_responses) > 2 else "미확인"
-                
-                # location은 business_type에서 추출 시도 (예: "서울 강남 카페" → location: "서울 강남")
-                if collected_info["business_type"] != "미확인":
-                    parts = collected_info["business_type"].split()
-                    if len(parts) >= 2:
-                        collected_info["location"] = " ".join(parts[:-1])  # 마지막 단어(업종) 제외
-                
-                # USER_CONTEXTS에 영구 저장 (세션 삭제되어도 유지)
-                USER_CONTEXTS[session_key] = collected_info
-                print(f"💾 수집된 정보 저장 (USER_CONTEXTS): {collected_info}")
-                print("➡️  다음 대화는 GUEST_AD_GENERATION 모드로 시작됩니다")
-            
-            # 대화 기록 추출
-            messages = memory_obj.chat_memory.messages
-            conversation_history = [
-                {
-                    "role": "user" if msg.type == "human" else "assistant",
-                    "content": msg.content
-                }
-                for msg in messages
-            ]
-            response.conversation_history = conversation_history
-            print(f"📝 대화 기록 추출 완료: {len(conversation_history)}개 메시지")
-            
-            # Vision 통합: 광고 생성 완료 + 제품 이미지 존재 시
-            if (
-                intent in [ConversationIntent.AD_GENERATION, ConversationIntent.GUEST_AD_GENERATION]
-                and response.final_content
-                and "product_image" in CONVERSATION_MEMORIES[session_key]
-                and CONVERSATION_MEMORIES[session_key]["product_image"]
-            ):
-                try:
-                    print("🔍 Vision 분석 시작...")
-                    
-                    # 1. 전략 제안 추출
-                    strategy_proposal = extract_last_strategy_proposal(conversation_history)
-                    
-                    if strategy_proposal:
-                        print(f"✅ 전략 제안 추출 성공: {strategy_proposal[:100]}...")
-                        
-                        # 2. Vision으로 상세 프롬프트 생성
-                        product_image_base64 = CONVERSATION_MEMORIES[session_key]["product_image"]
-                        business_info = {
-                            "business_type": user_context.get("business_type", "미확인") if user_context else "미확인",
-                            "location": user_context.get("location", "미확인") if user_context else "미확인",
-                            "menu_items": user_context.get("menu_items", "미확인") if user_context else "미확인"
-                        }
-                        
-                        enhanced_prompt = await generate_detailed_image_prompt_with_vision(
-                            strategy_proposal=strategy_proposal,
-                            product_image_base64=product_image_base64,
-                            business_info=business_info
-                        )
-                        
-                        # 3. image_prompt 교체
-                        if enhanced_prompt:
-                            # Pydantic 모델 업데이트
-                            updated_final_content = response.final_content.model_copy(
-                                update={"image_prompt": enhanced_prompt}
-                            )
-                            response = response.model_copy(
-                                update={"final_content": updated_final_content}
-                            )
-                            print("✅ Vision 프롬프트 적용 완료")
-                    else:
-                        print("⚠️  전략 제안을 찾을 수 없음 (Vision 스킵)")
-                        
-                except Exception as e:
-                    print(f"❌ Vision 통합 실패 (기본 프롬프트 유지): {e}")
+        # 스트리밍 응답에는 usage가 없으므로 로컬 토크나이저로 추정 (cached_tokens 미확인)
+        record_usage(
+            model=turn["route"]["model"],
+            prompt_tokens=count_tokens(prompt_value.to_string()),
+            completion_tokens=count_tokens(raw_response),
+            history_tokens=turn["memory"].last_history_tokens,
+            estimated=True,
+        )
+        
+        try:
+            response = _parse_dialogue_output(turn["intent"], raw_response)
+        except DialogueOutputError:
+            if DIALOGUE_PARSE_RETRIES <= 0:
+                _dialogue_output_stats["failed_turns"] += 1
+                raise
+            # 남은 재시도는 일반 호출로 진행 (delta는 이미 전송됨 → 최종 응답은 final 이벤트 기준)
+            try:
+                response = await _invoke_with_parse_retry(turn, user_input, start_attempt=1)
+            except Exception:
+                record_routed_turn(turn["route"], time.perf_counter() - started, error=True)
+                raise
+        record_routed_turn(turn["route"], time.perf_counter() - started)
         
-        return response
+        response = await _finalize_conversation_turn(turn, session_key, is_guest, response, user_id)
+        yield "final", response
 
     except Exception as e:
         raise ValueError(f"LangChain 대화 응답 생성 실패: {e}")
@@ -740,9 +1232,20 @@ async def generate_marketing_idea(prompt_text: str, context=None) -> dict:
     [비동기 버전] 단일 턴에서 마케팅 아이디어 생성하는 역할
     - 마케팅 아이디어/캡션/해시태그/이미지 프롬프트 생성 역할
     - 출력 스키마를 JSON으로 강제 및 안전 파싱 역할
+    - 같은 맥락 정보 + 같거나 유사한 요청은 marketing_idea_cache에서 반환
     """
     #( 기존 generate_marketing_idea 함수 내용은 그대로 유지)
     
+    # 0) 응답 캐시 조회 역할 (맥락 정보가 같은 항목끼리만 유사도 비교)
+    cache_partition = (
+        json.dumps(context, ensure_ascii=False, sort_keys=True, default=str)
+        if context is not None
+        else ""
+    )
+    cached, prompt_embedding = await marketing_idea_cache.lookup(prompt_text, partition=cache_partition)
+    if cached is not None:
+        return cached
+    
     # 1) 시스템 지시문 구성 역할
     system = (
         "너는 소상공인 마케팅 도우미 역할. "
@@ -825,13 +1328,17 @@ async def generate_marketing_idea(prompt_text: str, context=None) -> dict:
                     "background music for a small neighborhood cafe"          
                 )
 
-        return {
+        result = {
             "idea": idea,
             "caption": caption,
             "hashtags": hashtags,
             "image_prompt": image_prompt,
             "bgm_prompt": bgm_prompt,
         }
+        await marketing_idea_cache.store(
+            prompt_text, result, partition=cache_partition, embedding=prompt_embedding
+        )
+        return result
 
     except Exception as e:
         # 8) 최종 예외 단일화 및 상위 레이어 전달 역할
@@ -1081,6 +1588,11 @@ async def extract_city_name_english(location: str) -> str:
     if not location or location.strip() == "":
         return "Seoul"
     
+    # 같은 지역명은 캐시에서 반환 (GPT 변환 성공 결과만 저장)
+    cached, _ = await city_name_cache.lookup(location)
+    if cached is not None:
+        return cached
+    
     try:
         prompt = f"""
         다음 한국어 지역명을 날씨 API에서 사용할 수 있는 영어 도시명으로 변환해줘.
@@ -1102,7 +1614,9 @@ async def extract_city_name_english(location: str) -> str:
         # 결과 검증 (영어만 포함되어야 함)
         if re.match(r'^[a-zA-Z\s-]+$', city_name):
             # 여러 단어가 있으면 첫 번째 단어만 (예: "Seoul City" -> "Seoul")
-            return city_name.split()[0]
+            city_name = city_name.split()[0]
+            await city_name_cache.store(location, city_name)
+            return city_name
         else:
             # 예상치 못한 형식이면 기본값
             return "Seoul"
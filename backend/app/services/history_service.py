@@ -0,0 +1,152 @@
+# history_service.py
+# 광고 생성 히스토리 조회 (keyset 페이지네이션)
+# - (user_id, created_at, id) 기준 커서로 다음 페이지 조회 → 깊은 페이지도 첫 페이지와 같은 비용
+#   ix_ad_requests_user_created_active (is_deleted = false 부분 인덱스)를 그대로 역방향 스캔
+# - idea / caption / hashtags는 ad_requests 컬럼에서 바로 읽음 (gpt_output_text 문자열 파싱 없음)
+# - 전체 개수는 사용자별로 짧게 캐시 (같은 프로세스의 저장/탈퇴 시 무효화)
+
+import base64
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.core.models import AdRequest
+
+
+HISTORY_MAX_LIMIT = int(os.getenv("HISTORY_MAX_LIMIT", "100"))
+HISTORY_TOTAL_CACHE_TTL_SEC = float(os.getenv("HISTORY_TOTAL_CACHE_TTL_SEC", "60"))
+_TOTAL_CACHE_MAX_ENTRIES = 10000
+
+# 목록에 필요한 컬럼만 조회 (프롬프트/날씨 등 큰 텍스트 컬럼 제외)
+_HISTORY_COLUMNS = (
+    AdRequest.id,
+    AdRequest.created_at,
+    AdRequest.idea,
+    AdRequest.caption,
+    AdRequest.hashtags,
+    AdRequest.image_url,
+    AdRequest.audio_url,
+    AdRequest.video_url,
+)
+
+
+class InvalidCursorError(ValueError):
+    """잘못된 히스토리 커서"""
+
+
+def encode_cursor(created_at: datetime, ad_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{ad_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, ad_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(created_at), int(ad_id)
+    except Exception as e:
+        raise InvalidCursorError(f"잘못된 커서입니다: {cursor}") from e
+
+
+def format_hashtags(value: Optional[str]) -> Optional[str]:
+    """hashtags 컬럼(JSON 리스트 문자열) → 응답용 쉼표 구분 문자열"""
+    if not value:
+        return None
+    try:
+        tags = json.loads(value)
+    except (TypeError, ValueError):
+        return value
+    if isinstance(tags, list):
+        return ", ".join(str(tag) for tag in tags) or None
+    return str(tags)
+
+
+def _active_history_filter(user_id: int):
+    return (AdRequest.user_id == user_id, AdRequest.is_deleted == False)
+
+
+async def get_history_page(
+    db: AsyncSession,
+    user_id: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+) -> tuple[list, Optional[str]]:
+    """
+    → (행 목록, next_cursor)
+    - cursor가 있으면 keyset, 없으면 첫 페이지 (skip은 이전 클라이언트 호환용 offset)
+    - limit + 1개를 읽어 다음 페이지 존재 여부 판단 (별도 count 쿼리 없음)
+    """
+    limit = max(1, min(limit, HISTORY_MAX_LIMIT))
+
+    query = (
+        select(*_HISTORY_COLUMNS)
+        .where(*_active_history_filter(user_id))
+        .order_by(AdRequest.created_at.desc(), AdRequest.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(AdRequest.created_at, AdRequest.id) < tuple_(cursor_created_at, cursor_id)
+        )
+    elif skip:
+        query = query.offset(skip)
+
+    rows = (await db.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return rows, next_cursor
+
+
+# -----------------------------------------------------------------------------#
+# 전체 개수 캐시                                                                  #
+# -----------------------------------------------------------------------------#
+_total_lock = threading.Lock()
+# user_id -> (total, expires_at)
+_total_cache: "OrderedDict[int, tuple[int, float]]" = OrderedDict()
+
+
+async def count_user_history(db: AsyncSession, user_id: int) -> int:
+    now = time.monotonic()
+    with _total_lock:
+        cached = _total_cache.get(user_id)
+        if cached is not None and cached[1] > now:
+            _total_cache.move_to_end(user_id)
+            return cached[0]
+
+    total = (
+        await db.execute(
+            select(func.count())
+            .select_from(AdRequest)
+            .where(*_active_history_filter(user_id))
+        )
+    ).scalar_one()
+
+    if HISTORY_TOTAL_CACHE_TTL_SEC > 0:
+        with _total_lock:
+            _total_cache[user_id] = (total, now + HISTORY_TOTAL_CACHE_TTL_SEC)
+            _total_cache.move_to_end(user_id)
+            # 오래 안 쓴 사용자부터 제거 (LRU)
+            while len(_total_cache) > _TOTAL_CACHE_MAX_ENTRIES:
+                _total_cache.popitem(last=False)
+    return total
+
+
+def invalidate_history_total(user_id: Optional[int]):
+    """광고 저장/삭제 시 호출 (다른 프로세스의 변경은 TTL 후 반영)"""
+    if user_id is None:
+        return
+    with _total_lock:
+        _total_cache.pop(user_id, None)
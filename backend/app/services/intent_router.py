@@ -0,0 +1,203 @@
+# intent_router.py
+# 대화 턴 로컬 의도 분류 + 모델 티어 라우팅
+# - GPT 호출 전에 프로세스 내부에서 사용자 발화를 분류 (키워드 + 문자 n-gram 유사도, 외부 호출 없음)
+# - 분류 결과로 이번 턴을 gpt-4o-mini(mini)로 처리할지 gpt-4o(full)로 올릴지 결정
+#   * 정보 수집/확인 질문 위주의 턴 → mini
+#   * 광고 전략 동의(= 최종 광고 생성 턴) → full
+# - 티어별 처리 비율 / 지연 시간 통계 제공
+
+import math
+import os
+import threading
+from collections import Counter, deque
+from typing import Optional
+
+
+DIALOGUE_ROUTER_ENABLED = os.getenv("DIALOGUE_ROUTER_ENABLED", "true").lower() == "true"
+DIALOGUE_MODEL_MINI = os.getenv("DIALOGUE_MODEL_MINI", "gpt-4o-mini")
+DIALOGUE_MODEL_FULL = os.getenv("DIALOGUE_MODEL_FULL", "gpt-4o")
+# n-gram 유사도가 이 값보다 낮으면 키워드 결과를 그대로 사용
+INTENT_SIMILARITY_THRESHOLD = float(os.getenv("INTENT_SIMILARITY_THRESHOLD", "0.35"))
+
+# 라벨별 키워드 (기존 classify_user_intent 키워드 + 동의 표현)
+_KEYWORDS = {
+    "ad_request": ['광고', '이미지', '포스터', '홍보', '배너', '만들어', '생성', '디자인', '아이디어'],
+    "info_update": ['요즘', '요새', '최근', '지금', '바뀌', '변경', '늘었', '줄었', '많아', '적어', '달라', '다르', '추가', '새로'],
+    "analysis": ['왜', '이유', '분석', '어떻게', '추천', '조언', '도움'],
+    "confirm": ['좋아', '좋습니다', '괜찮', '오케이', 'ok', '그렇게 해', '진행해', '만들어주세요', '생성해주세요', '네', '응', '예', '그래'],
+}
+
+# 라벨별 예시 발화 (문자 n-gram centroid 생성용)
+_SEED_EXAMPLES = {
+    "ad_request": [
+        "크리스마스 이벤트 광고 만들어줘",
+        "신메뉴 홍보 포스터 부탁해요",
+        "인스타에 올릴 광고 이미지 생성해줘",
+        "주말 할인 행사 홍보하고 싶어요",
+    ],
+    "info_update": [
+        "요즘은 대학생 손님이 많아졌어요",
+        "메뉴에 디저트를 새로 추가했어요",
+        "최근에 영업시간이 바뀌었어요",
+        "타겟 고객이 30대 직장인으로 달라졌어요",
+    ],
+    "analysis": [
+        "왜 손님이 줄었는지 분석해줘",
+        "어떻게 하면 재방문이 늘까요",
+        "마케팅 채널 추천해주세요",
+        "매출 올리려면 어떤 조언이 있을까요",
+    ],
+    "confirm": [
+        "네 좋아요",
+        "좋아요 그렇게 해주세요",
+        "괜찮네요 진행해주세요",
+        "오케이 만들어주세요",
+        "응 그래",
+        "네 그 방향으로 생성해주세요",
+    ],
+}
+
+# 짧은 동의 표현 (앞뒤 공백/문장부호 제거 후 완전 일치)
+_SHORT_CONFIRMS = {"네", "넵", "응", "예", "그래", "좋아", "좋아요", "좋습니다", "오케이", "ok", "okay", "괜찮아요", "진행해주세요"}
+
+
+def _ngrams(text: str) -> Counter:
+    text = "".join(text.lower().split())
+    grams = Counter()
+    for n in (2, 3):
+        for i in range(len(text) - n + 1):
+            grams[text[i:i + n]] += 1
+    return grams
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(v * b.get(k, 0) for k, v in a.items())
+    na = math.sqrt(sum(v * v for v in a.values()))
+    nb = math.sqrt(sum(v * v for v in b.values()))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+class LocalIntentClassifier:
+    """키워드 점수 + 라벨별 n-gram centroid 코사인 유사도 (import 시 1회 구성, 수 µs 단위 분류)"""
+
+    def __init__(self):
+        self._centroids = {}
+        for label, examples in _SEED_EXAMPLES.items():
+            centroid = Counter()
+            for example in examples:
+                centroid.update(_ngrams(example))
+            self._centroids[label] = centroid
+
+    def classify(self, text: str) -> tuple[str, float]:
+        """→ (label, confidence) / label: ad_request | info_update | analysis | confirm | other"""
+        normalized = text.strip().strip(".!~ ").lower()
+        if normalized in _SHORT_CONFIRMS:
+            return "confirm", 1.0
+
+        lowered = text.lower()
+        keyword_hits = {
+            label: sum(1 for kw in keywords if kw in lowered)
+            for label, keywords in _KEYWORDS.items()
+        }
+
+        grams = _ngrams(text)
+        similarities = {label: _cosine(grams, centroid) for label, centroid in self._centroids.items()}
+        best_label, best_sim = max(similarities.items(), key=lambda kv: kv[1])
+
+        if best_sim >= INTENT_SIMILARITY_THRESHOLD:
+            return best_label, round(best_sim, 3)
+
+        # 유사도가 낮으면 기존 키워드 우선순위(광고 → 업데이트 → 분석)로 결정
+        for label in ("ad_request", "info_update", "analysis"):
+            if keyword_hits[label]:
+                return label, round(best_sim, 3)
+        if keyword_hits["confirm"] and len(text) <= 20:
+            return "confirm", round(best_sim, 3)
+        return "other", round(best_sim, 3)
+
+
+_classifier = LocalIntentClassifier()
+
+
+def classify_utterance(text: str) -> tuple[str, float]:
+    return _classifier.classify(text)
+
+
+def route_dialogue_turn(intent_value: str, user_input: str) -> dict:
+    """
+    이번 턴에 사용할 모델 티어 결정
+    - 광고 생성 의도에서 사용자가 동의 → 최종 광고 생성이므로 full
+    - 그 외(정보 수집 질문, 전략 제안/수정, 확인) → mini
+    """
+    label, confidence = classify_utterance(user_input)
+
+    if not DIALOGUE_ROUTER_ENABLED:
+        tier = "full"
+    elif intent_value in ("ad_generation", "guest_ad_generation") and label == "confirm":
+        tier = "full"
+    else:
+        tier = "mini"
+
+    return {
+        "tier": tier,
+        "model": DIALOGUE_MODEL_FULL if tier == "full" else DIALOGUE_MODEL_MINI,
+        "label": label,
+        "confidence": confidence,
+    }
+
+
+# -----------------------------------------------------------------------------#
+# 티어별 통계                                                                     #
+# -----------------------------------------------------------------------------#
+_LATENCY_WINDOW = 512
+
+_stats_lock = threading.Lock()
+_tier_stats: dict = {}
+_label_counts: Counter = Counter()
+
+
+def record_routed_turn(route: dict, latency_sec: float, error: bool = False):
+    with _stats_lock:
+        st = _tier_stats.setdefault(
+            route["tier"],
+            {"model": route["model"], "turns": 0, "errors": 0, "total_sec": 0.0, "samples": deque(maxlen=_LATENCY_WINDOW)},
+        )
+        st["turns"] += 1
+        st["total_sec"] += latency_sec
+        st["samples"].append(latency_sec)
+        if error:
+            st["errors"] += 1
+        _label_counts[route["label"]] += 1
+
+
+def _percentile(samples, p: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 1)
+
+
+def get_router_stats() -> dict:
+    with _stats_lock:
+        total = sum(st["turns"] for st in _tier_stats.values())
+        tiers = {
+            tier: {
+                "model": st["model"],
+                "turns": st["turns"],
+                "share": round(st["turns"] / total, 4) if total else 0.0,
+                "errors": st["errors"],
+                "avg_ms": round(st["total_sec"] / st["turns"] * 1000, 1) if st["turns"] else None,
+                "p50_ms": _percentile(st["samples"], 0.50),
+                "p95_ms": _percentile(st["samples"], 0.95),
+            }
+            for tier, st in _tier_stats.items()
+        }
+        labels = dict(_label_counts)
+    return {
+        "enabled": DIALOGUE_ROUTER_ENABLED,
+        "total_turns": total,
+        "tiers": tiers,
+        "labels": labels,
+    }
@@ -0,0 +1,191 @@
+# job_service.py
+# ad_jobs 테이블 기반의 내구성 있는 작업 큐
+# - API 프로세스: enqueue_ad_job / get_ad_job_async (AsyncSession, GPU 불필요)
+# - GPU 워커(backend/worker.py): claim_next_job → update_job_progress → complete_job / fail_job
+# - Postgres에서는 SELECT ... FOR UPDATE SKIP LOCKED로 여러 워커가 같은 작업을 잡지 않도록 함
+#   (SQLite 개발 환경에서는 status 조건부 UPDATE로 동일한 효과)
+
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.app.core.models import AdJob
+from backend.app.services.history_service import invalidate_history_total
+
+
+# 최대 재시도 횟수 (워커가 죽어서 재큐잉된 경우 포함)
+AD_JOB_MAX_ATTEMPTS = int(os.getenv("AD_JOB_MAX_ATTEMPTS", "2"))
+# heartbeat가 이 시간 이상 끊긴 running 작업은 죽은 워커의 작업으로 간주
+AD_JOB_STALE_SEC = int(os.getenv("AD_JOB_STALE_SEC", "900"))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+# ---------------------------------------------------------
+# API 측 (AsyncSession)
+# ---------------------------------------------------------
+async def enqueue_ad_job(db: AsyncSession, user_id: Optional[int], payload: dict) -> AdJob:
+    """작업을 queued 상태로 적재하고 바로 반환"""
+    job = AdJob(
+        user_id=user_id,
+        status=JOB_QUEUED,
+        request_payload=payload,
+        result={"image_url": None, "audio_url": None, "video_url": None},
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    print(f"[Job] enqueued id={job.id} user_id={user_id}")
+    return job
+
+
+async def get_ad_job_async(db: AsyncSession, job_id: str) -> Optional[AdJob]:
+    job = await db.get(AdJob, job_id)
+    if job is not None and job.status == JOB_SUCCEEDED and job.ad_request_id is not None:
+        # 워커가 저장한 광고는 API 프로세스의 히스토리 개수 캐시를 모름 → 완료를 확인한 시점에 무효화
+        invalidate_history_total(job.user_id)
+    return job
+
+
+# ---------------------------------------------------------
+# 워커 측 (동기 Session)
+# ---------------------------------------------------------
+def get_ad_job(db: Session, job_id: str) -> Optional[AdJob]:
+    return db.query(AdJob).filter(AdJob.id == job_id).first()
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[AdJob]:
+    """가장 오래된 queued 작업 하나를 running으로 바꾸고 반환 (없으면 None)"""
+    candidate = (
+        db.query(AdJob.id)
+        .filter(AdJob.status == JOB_QUEUED)
+        .order_by(AdJob.created_at)
+        .with_for_update(skip_locked=True)
+        .limit(1)
+        .first()
+    )
+    if candidate is None:
+        db.rollback()
+        return None
+
+    now = datetime.utcnow()
+    claimed = (
+        db.query(AdJob)
+        .filter(AdJob.id == candidate.id, AdJob.status == JOB_QUEUED)
+        .update(
+            {
+                AdJob.status: JOB_RUNNING,
+                AdJob.worker_id: worker_id,
+                AdJob.attempts: AdJob.attempts + 1,
+                AdJob.started_at: now,
+                AdJob.heartbeat_at: now,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+
+    # 다른 워커가 먼저 가져간 경우
+    if claimed != 1:
+        return None
+
+    job = get_ad_job(db, candidate.id)
+    print(f"[Job] claimed id={job.id} worker={worker_id} attempt={job.attempts}")
+    return job
+
+
+def _owned_by(job_id: str, worker_id: str):
+    """이 워커가 아직 running으로 잡고 있는 작업만 대상으로 하는 조건
+    (stale 처리로 재큐잉/다른 워커가 가져간 작업은 이전 워커가 덮어쓰지 못하게 함)"""
+    return (AdJob.id == job_id, AdJob.worker_id == worker_id, AdJob.status == JOB_RUNNING)
+
+
+def update_job_progress(db: Session, job_id: str, worker_id: str, stage: str, partial_result: dict) -> bool:
+    """현재 단계 + 부분 결과 기록 (heartbeat 겸용), 작업을 잃었으면 False"""
+    updated = db.query(AdJob).filter(*_owned_by(job_id, worker_id)).update(
+        {
+            AdJob.stage: stage,
+            AdJob.result: partial_result,
+            AdJob.heartbeat_at: datetime.utcnow(),
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    return updated == 1
+
+
+def complete_job(db: Session, job_id: str, worker_id: str, result: dict, ad_request_id: Optional[int]) -> bool:
+    """
+    성공 처리 + 커밋 (호출 측이 같은 세션에 추가한 AdRequest와 한 트랜잭션)
+    작업을 이미 잃었으면 롤백해 AdRequest도 저장하지 않고 False
+    """
+    updated = db.query(AdJob).filter(*_owned_by(job_id, worker_id)).update(
+        {
+            AdJob.status: JOB_SUCCEEDED,
+            AdJob.stage: None,
+            AdJob.result: result,
+            AdJob.ad_request_id: ad_request_id,
+            AdJob.error: None,
+            AdJob.finished_at: datetime.utcnow(),
+        },
+        synchronize_session=False,
+    )
+    if updated != 1:
+        db.rollback()
+        print(f"[Job][WARN] complete ignored id={job_id} worker={worker_id} (더 이상 이 워커의 작업이 아님)")
+        return False
+
+    db.commit()
+    print(f"[Job] succeeded id={job_id}")
+    return True
+
+
+def fail_job(db: Session, job_id: str, worker_id: str, error: str, retryable: bool = False) -> bool:
+    """실패 처리 (retryable이고 시도 횟수가 남았으면 다시 queued로), 작업을 잃었으면 False"""
+    job = db.query(AdJob).filter(*_owned_by(job_id, worker_id)).with_for_update().first()
+    if job is None:
+        db.rollback()
+        print(f"[Job][WARN] fail ignored id={job_id} worker={worker_id} (더 이상 이 워커의 작업이 아님)")
+        return False
+
+    if retryable and job.attempts < AD_JOB_MAX_ATTEMPTS:
+        job.status = JOB_QUEUED
+        job.worker_id = None
+        print(f"[Job] requeued id={job_id} attempts={job.attempts} error={error}")
+    else:
+        job.status = JOB_FAILED
+        job.finished_at = datetime.utcnow()
+        print(f"[Job][ERROR] failed id={job_id} error={error}")
+    job.error = error
+    db.commit()
+    return True
+
+
+def requeue_stale_jobs(db: Session) -> int:
+    """heartbeat가 끊긴 running 작업을 재큐잉(시도 횟수 초과 시 failed)"""
+    threshold = datetime.utcnow() - timedelta(seconds=AD_JOB_STALE_SEC)
+    stale_jobs = (
+        db.query(AdJob)
+        .filter(AdJob.status == JOB_RUNNING, AdJob.heartbeat_at < threshold)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    for job in stale_jobs:
+        if job.attempts < AD_JOB_MAX_ATTEMPTS:
+            job.status = JOB_QUEUED
+            job.worker_id = None
+        else:
+            job.status = JOB_FAILED
+            job.error = "worker heartbeat timeout"
+            job.finished_at = datetime.utcnow()
+    db.commit()
+
+    if stale_jobs:
+        print(f"[Job] stale running jobs handled: {len(stale_jobs)}")
+    return len(stale_jobs)
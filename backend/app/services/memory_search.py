@@ -0,0 +1,176 @@
+# memory_search.py
+# UserMemory 임베딩 유사도 검색
+# - Postgres: pgvector 코사인 거리(<=>) ORDER BY + LIMIT → HNSW 인덱스(ix_user_memories_embedding_hnsw) 사용
+# - SQLite(개발 환경): 후보 행을 읽어 numpy로 brute-force 코사인 유사도 계산
+# - 대화 첫 턴에 비슷한 업종/전략을 가진 다른 사업자의 전략 요약을 top-k로 가져와 프롬프트에 주입
+#   (사용자 이름/위치 등은 제외하고 업종 + 전략 필드만 사용)
+
+import json
+import os
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.core.models import User, UserMemory
+
+
+MEMORY_SEARCH_ENABLED = os.getenv("MEMORY_SEARCH_ENABLED", "true").lower() == "true"
+MEMORY_SEARCH_TOP_K = int(os.getenv("MEMORY_SEARCH_TOP_K", "3"))
+# 코사인 유사도가 이 값보다 낮은 결과는 버림 (관련 없는 전략 주입 방지)
+MEMORY_SEARCH_MIN_SIMILARITY = float(os.getenv("MEMORY_SEARCH_MIN_SIMILARITY", "0.5"))
+# SQLite brute-force 시 최대 후보 수 (최근 갱신 순)
+MEMORY_SEARCH_FALLBACK_MAX_ROWS = int(os.getenv("MEMORY_SEARCH_FALLBACK_MAX_ROWS", "5000"))
+# HNSW 검색 후보 폭 (클수록 정확, 느림 / pgvector 기본값 40)
+MEMORY_SEARCH_EF_SEARCH = int(os.getenv("MEMORY_SEARCH_EF_SEARCH", "40"))
+
+
+def _base_query(*columns):
+    return (
+        select(*columns)
+        .join(User, User.id == UserMemory.user_id)
+        .where(
+            UserMemory.embedding.isnot(None),
+            UserMemory.is_deleted == False,
+            User.is_deleted == False,
+        )
+    )
+
+
+def _apply_scope(query, user_id: Optional[int], exclude_user_id: Optional[int]):
+    if user_id is not None:
+        query = query.where(UserMemory.user_id == user_id)
+    if exclude_user_id is not None:
+        query = query.where(UserMemory.user_id != exclude_user_id)
+    return query
+
+
+async def _search_pgvector(db, query_vec, k, user_id, exclude_user_id) -> List[dict]:
+    from sqlalchemy import text
+
+    distance = UserMemory.embedding.cosine_distance(query_vec).label("distance")
+    query = _apply_scope(
+        _base_query(UserMemory.id, UserMemory.user_id, UserMemory.marketing_strategy, User.business_type, distance),
+        user_id,
+        exclude_user_id,
+    ).order_by(distance).limit(k)
+
+    # 트랜잭션 범위 설정 (HNSW 후보 폭)
+    await db.execute(text(f"SET LOCAL hnsw.ef_search = {int(MEMORY_SEARCH_EF_SEARCH)}"))
+    rows = (await db.execute(query)).all()
+    return [
+        {
+            "memory_id": row.id,
+            "user_id": row.user_id,
+            "business_type": row.business_type,
+            "marketing_strategy": row.marketing_strategy,
+            "similarity": round(1.0 - float(row.distance), 4),
+        }
+        for row in rows
+    ]
+
+
+def _as_vector(value) -> Optional[np.ndarray]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+async def _search_numpy(db, query_vec, k, user_id, exclude_user_id) -> List[dict]:
+    query = _apply_scope(
+        _base_query(UserMemory.id, UserMemory.user_id, UserMemory.marketing_strategy, UserMemory.embedding, User.business_type),
+        user_id,
+        exclude_user_id,
+    ).order_by(UserMemory.updated_at.desc()).limit(MEMORY_SEARCH_FALLBACK_MAX_ROWS)
+    rows = (await db.execute(query)).all()
+
+    query_arr = np.asarray(query_vec, dtype=np.float32)
+    candidates, vectors = [], []
+    for row in rows:
+        vec = _as_vector(row.embedding)
+        if vec is None or vec.shape != query_arr.shape:
+            continue
+        candidates.append(row)
+        vectors.append(vec)
+    if not candidates:
+        return []
+
+    matrix = np.stack(vectors)
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query_arr) or 1.0)
+    sims = (matrix @ query_arr) / np.where(norms == 0, 1.0, norms)
+
+    top = min(k, len(candidates))
+    top_idx = np.argpartition(-sims, top - 1)[:top]
+    top_idx = top_idx[np.argsort(-sims[top_idx])]
+    return [
+        {
+            "memory_id": candidates[i].id,
+            "user_id": candidates[i].user_id,
+            "business_type": candidates[i].business_type,
+            "marketing_strategy": candidates[i].marketing_strategy,
+            "similarity": round(float(sims[i]), 4),
+        }
+        for i in top_idx
+    ]
+
+
+async def search_memories(
+    db: AsyncSession,
+    query_vec,
+    k: int = MEMORY_SEARCH_TOP_K,
+    user_id: Optional[int] = None,
+    exclude_user_id: Optional[int] = None,
+    min_similarity: float = MEMORY_SEARCH_MIN_SIMILARITY,
+) -> List[dict]:
+    """
+    임베딩 → 코사인 유사도 top-k UserMemory
+    user_id: 특정 사용자 메모리만 / exclude_user_id: 해당 사용자 제외 (다른 사업자 전략 검색)
+    """
+    if query_vec is None or k <= 0:
+        return []
+
+    if db.get_bind().dialect.name == "postgresql":
+        results = await _search_pgvector(db, query_vec, k, user_id, exclude_user_id)
+    else:
+        results = await _search_numpy(db, query_vec, k, user_id, exclude_user_id)
+    return [r for r in results if r["similarity"] >= min_similarity]
+
+
+async def find_similar_strategies(
+    db: AsyncSession,
+    user_id: int,
+    own_memory: Optional[UserMemory],
+    fallback_query_text: Optional[str] = None,
+) -> List[dict]:
+    """
+    대화 첫 턴용: 비슷한 사업자들의 전략 top-k (JSON 직렬화 가능한 dict 리스트)
+    - 본인 메모리 임베딩이 있으면 그대로 질의 벡터로 사용 (추가 API 호출 없음)
+    - 없으면 fallback_query_text(업종/위치 + 첫 발화)를 임베딩
+    """
+    if not MEMORY_SEARCH_ENABLED:
+        return []
+
+    query_vec = _as_vector(own_memory.embedding) if own_memory is not None else None
+    if query_vec is None and fallback_query_text:
+        from backend.app.services.memory_service import get_embedding
+
+        query_vec = await get_embedding(fallback_query_text)
+
+    try:
+        results = await search_memories(db, query_vec, exclude_user_id=user_id)
+    except Exception as e:
+        print(f"⚠️ 유사 전략 검색 실패 (비치명적): {e}")
+        return []
+
+    print(f"🔎 유사 전략 검색: {len(results)}건 (user_id={user_id})")
+    return [
+        {
+            "business_type": r["business_type"],
+            "marketing_strategy": r["marketing_strategy"],
+            "similarity": r["similarity"],
+        }
+        for r in results
+    ]
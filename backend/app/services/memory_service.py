@@ -1,41 +1,48 @@
 # memory_service.py
 # 사용자 메모리 관리 서비스 (자연어 + 임베딩)
 
-import os
+import asyncio
 import json
+import os
 from typing import Optional, List
-from sqlalchemy.orm import Session
-from openai import AsyncOpenAI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.app.core.database import AsyncSessionLocal
 from backend.app.core.models import UserMemory
+from backend.app.services import embedding_service
+from backend.app.services.upstream_clients import get_openai_client
 
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# 백그라운드 메모리 갱신 재시도 (전략 추출 GPT + 임베딩 + DB 저장)
+MEMORY_UPDATE_MAX_ATTEMPTS = int(os.getenv("MEMORY_UPDATE_MAX_ATTEMPTS", "3"))
+MEMORY_UPDATE_RETRY_BASE_SEC = float(os.getenv("MEMORY_UPDATE_RETRY_BASE_SEC", "2"))
+
+client = get_openai_client()
 
 async def get_embedding(text: str) -> List[float]:
-    """[비동기] 텍스트를 임베딩 벡터로 변환 (OpenAI text-embedding-3-small)"""
-    try:
-        response = await client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        print(f"❌ Embedding generation failed: {e}")
-        return None
+    """[비동기] 텍스트를 임베딩 벡터로 변환 (embedding_service: 해시 캐시 + 배치, 실패 시 None)"""
+    return await embedding_service.embed(text)
 
 
-def get_user_memory(db: Session, user_id: int) -> Optional[UserMemory]:
+def _latest_memory_query(user_id: int):
+    return (
+        select(UserMemory)
+        .where(UserMemory.user_id == user_id)
+        .order_by(UserMemory.updated_at.desc())
+        .limit(1)
+    )
+
+
+async def get_user_memory(db: AsyncSession, user_id: int) -> Optional[UserMemory]:
     """사용자의 장기 메모리 조회 (최신 하나)"""
-    memory = db.query(UserMemory).filter(
-        UserMemory.user_id == user_id
-    ).order_by(UserMemory.updated_at.desc()).first()
-    
-    return memory
+    result = await db.execute(_latest_memory_query(user_id))
+    return result.scalars().first()
 
 
 async def extract_marketing_strategy_from_conversation(
     conversation_history: List[dict],
     final_content: Optional[dict] = None,
-    existing_strategy: dict = None
+    existing_strategy: dict = None,
+    raise_on_error: bool = False
 ) -> dict:
     """
     [비동기] 대화 기록에서 마케팅 전략 정보를 구조화하여 추출
@@ -44,6 +51,7 @@ async def extract_marketing_strategy_from_conversation(
         conversation_history: 전체 대화 기록
         final_content: 최종 생성된 콘텐츠 (Optional)
         existing_strategy: 기존 전략 정보
+        raise_on_error: True면 추출 실패 시 기존 전략으로 대체하지 않고 예외 (재시도용)
         
     Returns:
         MarketingStrategy 형태의 딕셔너리
@@ -122,14 +130,18 @@ async def extract_marketing_strategy_from_conversation(
             
     except Exception as e:
         print(f"⚠️ 마케팅 전략 추출 실패: {e}")
+        if raise_on_error:
+            raise
         return existing_strategy or {}
 
 
 async def update_user_memory(
-    db: Session, 
+    db: AsyncSession, 
     user_id: int, 
     conversation_history: List[dict],
-    final_content: Optional[dict] = None
+    final_content: Optional[dict] = None,
+    require_embedding: bool = False,
+    require_extraction: bool = False
 ) -> UserMemory:
     """
     [비동기] 대화 기록에서 마케팅 전략 정보를 추출하여 JSON 형식으로 저장
@@ -139,16 +151,16 @@ async def update_user_memory(
         user_id: 사용자 ID
         conversation_history: 전체 대화 기록
         final_content: 최종 생성된 콘텐츠 (Optional)
+        require_embedding: True면 임베딩 생성 실패 시 저장하지 않고 예외 (재시도용)
+        require_extraction: True면 전략 추출 실패 시 기존 전략으로 넘어가지 않고 예외 (재시도용)
     
     Returns:
         업데이트된 UserMemory 객체
     """
     print(f"🔍 update_user_memory 시작 - user_id: {user_id}")
     
-    # 1. 기존 메모리 조회 (동기 - 빠른 DB 조회)
-    existing_memory = db.query(UserMemory).filter(
-        UserMemory.user_id == user_id
-    ).order_by(UserMemory.updated_at.desc()).first()
+    # 1. 기존 메모리 조회 (비동기 DB 조회)
+    existing_memory = await get_user_memory(db, user_id)
     
     print(f"📦 기존 메모리: {'있음' if existing_memory else '없음'}")
     
@@ -159,23 +171,38 @@ async def update_user_memory(
     updated_strategy = await extract_marketing_strategy_from_conversation(
         conversation_history,
         final_content,
-        existing_strategy
+        existing_strategy,
+        raise_on_error=require_extraction
     )
     print(f"✅ 추출된 전략: {json.dumps(updated_strategy, ensure_ascii=False)[:200]}...")
     
     # 3. 임베딩 생성 (비동기 - OpenAI API)
+    # 키 순서가 달라도 같은 전략이면 같은 해시가 되도록 정렬
+    embedding_text = json.dumps(updated_strategy, ensure_ascii=False, sort_keys=True)
+    embedding_hash = embedding_service.content_hash(embedding_text)
+    if (
+        existing_memory
+        and existing_memory.embedding is not None
+        and existing_memory.embedding_hash == embedding_hash
+    ):
+        # 전략이 그대로면 임베딩도 그대로 → API 호출 / DB 쓰기 생략
+        print(f"♻️ 전략 변경 없음 → 임베딩 재계산 생략 (memory_id: {existing_memory.id})")
+        return existing_memory
+
     print(f"🔢 임베딩 생성 중...")
-    embedding_text = json.dumps(updated_strategy, ensure_ascii=False)
     embedding = await get_embedding(embedding_text)
     print(f"✅ 임베딩 생성 완료: {len(embedding) if embedding else 0}차원")
+    if embedding is None and require_embedding:
+        raise RuntimeError("임베딩 생성 실패")
     
-    # 4. DB 저장/업데이트 (동기 - 빠른 작업)
+    # 4. DB 저장/업데이트 (비동기)
     if existing_memory:
         print(f"🔄 기존 메모리 업데이트...")
         existing_memory.marketing_strategy = updated_strategy
         existing_memory.embedding = embedding
-        db.commit()
-        db.refresh(existing_memory)
+        existing_memory.embedding_hash = embedding_hash if embedding is not None else None
+        await db.commit()
+        await db.refresh(existing_memory)
         print(f"✅ 업데이트 완료 - memory_id: {existing_memory.id}")
         return existing_memory
     else:
@@ -183,16 +210,91 @@ async def update_user_memory(
         new_memory = UserMemory(
             user_id=user_id,
             marketing_strategy=updated_strategy,
-            embedding=embedding
+            embedding=embedding,
+            embedding_hash=embedding_hash if embedding is not None else None
         )
         db.add(new_memory)
-        db.commit()
-        db.refresh(new_memory)
+        await db.commit()
+        await db.refresh(new_memory)
         print(f"✅ 생성 완료 - memory_id: {new_memory.id}")
         return new_memory
 
 
+# -----------------------------------------------------------------------------#
+# 백그라운드 메모리 갱신 (응답 경로에서 분리)                                       #
+# -----------------------------------------------------------------------------#
+_background_tasks: set = set()
+_update_stats = {"scheduled": 0, "succeeded": 0, "retried": 0, "failed": 0}
+
+
+async def _run_memory_update_with_retry(
+    user_id: int,
+    conversation_history: List[dict],
+    final_content: Optional[dict]
+):
+    """
+    시도마다 새 DB 세션 사용, 실패 시 지수 백오프 후 재시도
+    - 전략 추출(GPT) 실패는 모든 시도에서 예외 → 기존 전략으로 대체돼 성공 처리/대화 유실되지 않음
+    - 마지막 시도는 임베딩 없이라도 저장
+    """
+    for attempt in range(1, MEMORY_UPDATE_MAX_ATTEMPTS + 1):
+        is_last = attempt == MEMORY_UPDATE_MAX_ATTEMPTS
+        db = AsyncSessionLocal()
+        try:
+            await update_user_memory(
+                db=db,
+                user_id=user_id,
+                conversation_history=conversation_history,
+                final_content=final_content,
+                require_embedding=not is_last,
+                require_extraction=True
+            )
+            _update_stats["succeeded"] += 1
+            print(f"✅ 장기 메모리 업데이트 완료 (user_id={user_id}, attempt={attempt})")
+            return
+        except Exception as e:
+            await db.rollback()
+            if is_last:
+                _update_stats["failed"] += 1
+                print(f"❌ 장기 메모리 업데이트 최종 실패 (user_id={user_id}): {e}")
+                return
+            delay = MEMORY_UPDATE_RETRY_BASE_SEC * (2 ** (attempt - 1))
+            _update_stats["retried"] += 1
+            print(f"⚠️ 장기 메모리 업데이트 실패 (user_id={user_id}, attempt={attempt}) → {delay:.1f}s 후 재시도: {e}")
+            await asyncio.sleep(delay)
+        finally:
+            await db.close()
+
+
+def schedule_user_memory_update(
+    user_id: int,
+    conversation_history: List[dict],
+    final_content: Optional[dict] = None
+) -> asyncio.Task:
+    """
+    장기 메모리 갱신을 백그라운드 태스크로 시작 (응답을 기다리게 하지 않음)
+    - 대화 완료 직후 호출 → Vision 프롬프트 생성과 동시에 진행
+    """
+    task = asyncio.create_task(
+        _run_memory_update_with_retry(user_id, list(conversation_history), final_content)
+    )
+    # 이벤트 루프는 태스크를 약한 참조로만 들고 있으므로 완료 전까지 참조 유지
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    _update_stats["scheduled"] += 1
+    return task
 
 
+async def drain_memory_updates(timeout: float = 30.0):
+    """shutdown 시 진행 중인 메모리 갱신 대기 (timeout 초과분은 취소)"""
+    pending = list(_background_tasks)
+    if not pending:
+        return
+    print(f"⏳ 진행 중인 메모리 업데이트 {len(pending)}건 대기...")
+    done, not_done = await asyncio.wait(pending, timeout=timeout)
+    for task in not_done:
+        task.cancel()
 
 
+def get_memory_update_stats() -> dict:
+    return {**_update_stats, "in_flight": len(_background_tasks)}
@@ -32,3 +32,26 @@ def upload_bytes(file_bytes: bytes, content_type: str) -> str:
 
     # 접근 가능한 URL 리턴
     return f"/{bucket}/{file_name}"
+
+
+def _split_ref(object_ref: str) -> tuple[str, str]:
+    """upload_bytes가 반환한 "/{bucket}/{file_name}" → (bucket, file_name)"""
+    bucket, _, file_name = object_ref.lstrip("/").partition("/")
+    if not bucket or not file_name:
+        raise ValueError(f"잘못된 object 경로: {object_ref}")
+    return bucket, file_name
+
+
+def download_bytes(object_ref: str) -> bytes:
+    bucket, file_name = _split_ref(object_ref)
+    response = minio_client.get_object(bucket, file_name)
+    try:
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def delete_object(object_ref: str):
+    bucket, file_name = _split_ref(object_ref)
+    minio_client.remove_object(bucket, file_name)
@@ -0,0 +1,188 @@
+# response_cache.py
+# 단발성 GPT 호출(generate_marketing_idea, 지역명 변환) 앞단 응답 캐시
+# - exact 단계: 정규화한 입력의 해시 → 값 (TTL + LRU 개수 상한)
+# - semantic 단계(옵션): exact miss 시 입력 임베딩과 저장된 임베딩의 코사인 유사도가 임계값 이상이면 재사용
+#   * partition(맥락 정보 등)이 같은 항목끼리만 비교 → 날씨/업종이 다른 요청은 섞이지 않음
+# - 캐시별 hit/miss 통계 제공 (/gpt/stats)
+
+import copy
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import numpy as np
+
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+
+_caches: dict = {}
+
+
+def _normalize(text: str) -> str:
+    text = re.sub(r"\s+", " ", (text or "").strip().lower())
+    return text.rstrip(".!?~ ")
+
+
+def _to_unit_vector(embedding) -> Optional[np.ndarray]:
+    if embedding is None:
+        return None
+    vec = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else None
+
+
+class ResponseCache:
+    """
+    exact(해시) + semantic(임베딩 유사도) 2단계 캐시
+    similarity_threshold=None이면 exact 단계만 사용 (임베딩 호출 없음)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl_sec: int,
+        max_entries: int,
+        similarity_threshold: Optional[float] = None,
+    ):
+        self.name = name
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+        _caches[name] = self
+
+    @property
+    def semantic(self) -> bool:
+        return self.similarity_threshold is not None
+
+    def _key(self, text: str, partition: str) -> str:
+        raw = f"{partition}\x00{_normalize(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _get_exact(self, key: str, now: float) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] <= now:
+            del self._entries[key]
+            self._stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _get_semantic(self, vec: np.ndarray, partition: str, now: float) -> tuple[Optional[dict], float]:
+        best_entry, best_sim = None, -1.0
+        expired = []
+        for key, entry in self._entries.items():
+            if entry["expires_at"] <= now:
+                expired.append(key)
+                continue
+            if entry["partition"] != partition or entry["embedding"] is None:
+                continue
+            sim = float(np.dot(vec, entry["embedding"]))
+            if sim > best_sim:
+                best_entry, best_sim = entry, sim
+        for key in expired:
+            del self._entries[key]
+            self._stats["expired"] += 1
+        if best_entry is not None and best_sim >= self.similarity_threshold:
+            self._entries.move_to_end(best_entry["key"])
+            return best_entry, best_sim
+        return None, best_sim
+
+    async def lookup(self, text: str, partition: str = "") -> tuple[Any, Optional[np.ndarray]]:
+        """
+        → (캐시 값 또는 None, 입력 임베딩)
+        semantic miss 시 계산한 임베딩을 돌려주므로 store()에 그대로 넘기면 임베딩 재호출 없음
+        """
+        if not RESPONSE_CACHE_ENABLED:
+            return None, None
+
+        key = self._key(text, partition)
+        with self._lock:
+            entry = self._get_exact(key, time.time())
+            if entry is not None:
+                self._stats["exact_hits"] += 1
+                return copy.deepcopy(entry["value"]), None
+            has_candidates = self.semantic and any(e["partition"] == partition for e in self._entries.values())
+
+        if not self.semantic:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None, None
+
+        # 같은 partition 항목이 없으면 lookup에서는 임베딩을 건너뛰고 store에서 계산
+        vec = None
+        if has_candidates:
+            vec = await self._embed(text)
+        if vec is not None:
+            with self._lock:
+                entry, sim = self._get_semantic(vec, partition, time.time())
+                if entry is not None:
+                    self._stats["semantic_hits"] += 1
+                    print(f"[Cache] {self.name} semantic hit (sim={sim:.3f})")
+                    return copy.deepcopy(entry["value"]), vec
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None, vec
+
+    async def store(self, text: str, value: Any, partition: str = "", embedding: Optional[np.ndarray] = None):
+        if not RESPONSE_CACHE_ENABLED:
+            return
+
+        if self.semantic and embedding is None:
+            embedding = await self._embed(text)
+
+        key = self._key(text, partition)
+        with self._lock:
+            self._entries[key] = {
+                "key": key,
+                "value": copy.deepcopy(value),
+                "partition": partition,
+                "embedding": embedding,
+                "expires_at": time.time() + self.ttl_sec,
+            }
+            self._entries.move_to_end(key)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        # memory_service와 같은 임베딩 모델 사용 (실패 시 semantic 단계만 건너뜀)
+        from backend.app.services.memory_service import get_embedding
+
+        return _to_unit_vector(await get_embedding(_normalize(text)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._entries)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        hits = stats["exact_hits"] + stats["semantic_hits"]
+        return {
+            **stats,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_sec": self.ttl_sec,
+            "similarity_threshold": self.similarity_threshold,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def get_response_cache_stats() -> dict:
+    return {
+        "enabled": RESPONSE_CACHE_ENABLED,
+        "caches": {name: cache.stats() for name, cache in _caches.items()},
+    }
@@ -16,8 +16,35 @@ import base64
 
 from segment_anything import sam_model_registry, SamPredictor, SamAutomaticMaskGenerator
 
+from backend.app.services.cache_utils import DiskNpzCache, LRUByteCache, hash_array
+
 _segmentation_singleton = None
 
+# -------------------------------------------------------------
+# 마스크 캐시 (디코딩된 이미지 해시 + SAM 파라미터 → 최종 마스크)
+# - 같은 제품 사진을 composition_mode만 바꿔 재요청하거나 preview → ads/generate로 재사용하는 경우 SAM 생략
+# - 메모리 LRU(프로세스 내) + 디스크 npz(프로세스/재시작 간 공유) 2단계
+# -------------------------------------------------------------
+SEG_MASK_CACHE_MEM_MB = int(os.getenv("SEG_MASK_CACHE_MEM_MB", "256"))
+SEG_MASK_CACHE_DISK_MB = int(os.getenv("SEG_MASK_CACHE_DISK_MB", "1024"))
+SEG_MASK_CACHE_DIR = os.getenv("SEG_MASK_CACHE_DIR", "/home/shared/cache/seg_masks")
+
+# -------------------------------------------------------------
+# 세그멘테이션 모드
+# - fast: SamPredictor로 이미지 인코더 1회 + 박스/포인트 프롬프트로 후보 3개만 디코딩
+# - auto: SamAutomaticMaskGenerator 전체 그리드 (무겁지만 구도 가정 없음)
+# fast 모드의 최고 점수가 SEG_FAST_MIN_SCORE 미만이거나 면적이 비정상이면 auto로 폴백
+# -------------------------------------------------------------
+SEGMENTATION_MODE = os.getenv("SEGMENTATION_MODE", "fast")
+SEG_FAST_MIN_SCORE = float(os.getenv("SEG_FAST_MIN_SCORE", "0.85"))
+SEG_FAST_CENTER_MARGIN = 0.08  # 프롬프트가 없을 때 사용할 중앙 박스 여백 비율
+
+_seg_stats_lock = threading.Lock()
+_seg_stats = {"fast": 0, "fast_fallback": 0, "auto": 0, "cache_hit": 0}
+
+_mask_mem_cache = LRUByteCache(SEG_MASK_CACHE_MEM_MB * 1024 * 1024, name="seg-mask-mem")
+_mask_disk_cache = DiskNpzCache(SEG_MASK_CACHE_DIR, SEG_MASK_CACHE_DISK_MB * 1024 * 1024, name="seg-mask-disk")
+
 class ProductSegmentation:
     def __init__(
         self,
@@ -38,6 +65,9 @@ class ProductSegmentation:
         self.mask_gen = None
 
         self._load_lock = threading.Lock()
+        # SamPredictor/AutomaticMaskGenerator는 내부 상태(set_image)를 가지므로
+        # 여러 요청 스레드가 동시에 추론하지 않도록 보호
+        self._infer_lock = threading.Lock()
 
     # =========================================================
     # 1. SAM 모델 로드 (Lazy Load)
@@ -95,39 +125,61 @@ class ProductSegmentation:
     # =========================================================
     # 2. PUBLIC API — 최종 누끼 (SAM 단독)
     # =========================================================
-    def remove_background(self, image: Image.Image):
+    def remove_background(
+        self,
+        image: Image.Image,
+        mode: str | None = None,
+        box: list[float] | None = None,
+        point: list[float] | None = None,
+    ):
         """
         SAM만 사용해서:
-        1) 자동 마스크 생성
-        2) 가장 큰 객체의 마스크 선택
+        1) 마스크 생성 (fast: 박스/포인트 프롬프트, auto: 자동 마스크 생성)
+        2) 제품일 확률이 가장 높은 마스크 선택
         3) RGBA 컷아웃 생성
 
+        Args:
+            mode: "fast" | "auto" (None이면 SEGMENTATION_MODE 환경변수)
+            box: 제품 영역 [x1, y1, x2, y2] (원본 이미지 픽셀 좌표, fast 모드 전용)
+            point: 제품 위의 한 점 [x, y] (원본 이미지 픽셀 좌표, fast 모드 전용)
+
         return:
             refined_mask (np.ndarray, 0~1 float)
             rgba_cutout (PIL.Image, RGBA)
         """
-        self._ensure_models_loaded()
+        mode = (mode or SEGMENTATION_MODE).lower()
+        if mode not in ("fast", "auto"):
+            raise ValueError(f"지원하지 않는 segmentation mode: {mode}")
 
-        # 🔥 SAM-safe resize
+        # 🔥 SAM-safe resize (프롬프트 좌표도 같은 비율로 변환)
+        orig_w, orig_h = image.size
         image = self._resize_for_sam(image)
+        scale = image.size[0] / orig_w
+        if box is not None:
+            box = [float(v) * scale for v in box]
+        if point is not None:
+            point = [float(v) * scale for v in point]
 
         img_rgb = np.array(image.convert("RGB"))
 
-        # SAM의 AutomaticMaskGenerator로 마스크 후보 생성
-        masks = self.mask_gen.generate(img_rgb)
-        if len(masks) == 0:
-            raise ValueError("SAM이 마스크를 감지하지 못했습니다.")
+        # 캐시 조회 (메모리 → 디스크), hit이면 SAM 모델 로드/추론 모두 생략
+        cache_key = hash_array(img_rgb, self._cache_params(mode, box, point))
+        cached = _get_cached_mask(cache_key)
+        if cached is not None:
+            print(f"[Segmentation] mask cache hit ({cache_key[:12]})")
+            _count_seg("cache_hit")
+            return cached, self._create_cutout(img_rgb, cached)
 
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-            torch.cuda.ipc_collect()
+        self._ensure_models_loaded()
 
-        # 종합 점수 기준으로 가장 제품일 확률이 높은 마스크 선정
-        best_mask = select_best_mask(img_rgb, masks)
+        best_mask = None
+        if mode == "fast":
+            best_mask = self._segment_fast(img_rgb, box, point)
+            _count_seg("fast" if best_mask is not None else "fast_fallback")
 
-        # inversion 체크 (중앙이 비어 있으면 반전)
-        if mask_needs_invert(best_mask):
-            best_mask = 1 - best_mask
+        if best_mask is None:
+            best_mask = self._segment_auto(img_rgb)
+            _count_seg("auto")
 
         # 경계 부드럽게 (0~1 float)
         refined_mask = refine_mask(best_mask)
@@ -142,7 +194,8 @@ class ProductSegmentation:
         gray = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2GRAY)
         guided = guided_filter(gray, sharp_mask, r=6, eps=1e-4)
 
-        guided = np.clip(guided, 0, 1)
+        guided = np.clip(guided, 0, 1).astype(np.float32)
+        _put_cached_mask(cache_key, guided)
 
         # Final RGBA cutout
         alpha = (guided * 255).astype(np.uint8)
@@ -151,6 +204,87 @@ class ProductSegmentation:
 
         return guided, rgba_final
 
+    def _segment_fast(self, img_rgb: np.ndarray, box, point):
+        """
+        SamPredictor 기반 빠른 세그멘테이션
+        - 이미지 인코더 1회 + 프롬프트(박스/포인트) 디코딩 → 후보 3개 중 최고 점수 선택
+        - 신뢰도가 낮거나 면적이 비정상이면 None (auto 폴백)
+        """
+        h, w, _ = img_rgb.shape
+
+        # 프롬프트가 없으면 "중앙에 놓인 제품" 가정으로 중앙 박스 사용
+        if box is None and point is None:
+            mx, my = w * SEG_FAST_CENTER_MARGIN, h * SEG_FAST_CENTER_MARGIN
+            box = [mx, my, w - mx, h - my]
+
+        box_np = np.array(box, dtype=np.float32) if box is not None else None
+        point_coords = np.array([point], dtype=np.float32) if point is not None else None
+        point_labels = np.array([1], dtype=np.int32) if point is not None else None
+
+        with self._infer_lock:
+            self.sam_predictor.set_image(img_rgb)
+            masks, scores, _ = self.sam_predictor.predict(
+                point_coords=point_coords,
+                point_labels=point_labels,
+                box=box_np,
+                multimask_output=True,
+            )
+            self.sam_predictor.reset_image()
+
+        # 면적이 정상 범위인 후보 중 최고 점수 선택
+        best_idx = None
+        for idx in np.argsort(-scores):
+            area_ratio = masks[idx].mean()
+            if 0.01 <= area_ratio <= 0.9:
+                best_idx = int(idx)
+                break
+
+        if best_idx is None or scores[best_idx] < SEG_FAST_MIN_SCORE:
+            top_score = float(scores.max()) if len(scores) else 0.0
+            print(f"[Segmentation] fast mode low confidence (score={top_score:.3f}) → auto fallback")
+            return None
+
+        print(f"[Segmentation] fast mode score={float(scores[best_idx]):.3f}")
+        return masks[best_idx].astype(np.uint8)
+
+    def _segment_auto(self, img_rgb: np.ndarray) -> np.ndarray:
+        """AutomaticMaskGenerator 전체 그리드 + 종합 점수로 제품 마스크 선택"""
+        # SAM의 AutomaticMaskGenerator로 마스크 후보 생성
+        with self._infer_lock:
+            masks = self.mask_gen.generate(img_rgb)
+
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+                torch.cuda.ipc_collect()
+
+        if len(masks) == 0:
+            raise ValueError("SAM이 마스크를 감지하지 못했습니다.")
+
+        # 종합 점수 기준으로 가장 제품일 확률이 높은 마스크 선정
+        best_mask = select_best_mask(img_rgb, masks)
+
+        # inversion 체크 (중앙이 비어 있으면 반전)
+        if mask_needs_invert(best_mask):
+            best_mask = 1 - best_mask
+
+        return best_mask
+
+    def _cache_params(self, mode: str, box, point) -> tuple:
+        """마스크 결과에 영향을 주는 파라미터 (바뀌면 캐시 키도 달라짐)"""
+        auto_params = (
+            self.points_per_side,
+            0.88, 0.9, 1, 2, 200,  # pred_iou / stability / crop_n_layers / downscale / min_region
+        )
+        if mode == "fast":
+            prompt = (
+                tuple(round(v, 1) for v in box) if box is not None else None,
+                tuple(round(v, 1) for v in point) if point is not None else None,
+            )
+            # fast 모드는 폴백 시 auto 결과가 저장되므로 auto 파라미터도 포함
+            return ("fast-v1", self.sam_model_type, self.sam_max_size,
+                    SEG_FAST_MIN_SCORE, SEG_FAST_CENTER_MARGIN, prompt, auto_params)
+        return ("auto-v1", self.sam_model_type, self.sam_max_size, auto_params)
+
     # =========================================================
     # 3. 유틸 — RGBA cutout 생성
     # =========================================================
@@ -174,6 +308,47 @@ def get_segmentation_singleton():
         _segmentation_singleton._ensure_models_loaded()
     return _segmentation_singleton
 
+# -------------------------------------------------------------
+# 마스크 캐시 헬퍼
+# -------------------------------------------------------------
+def _get_cached_mask(key: str):
+    mask = _mask_mem_cache.get(key)
+    if mask is not None:
+        return mask
+
+    mask = _mask_disk_cache.get(key)
+    if mask is None:
+        return None
+
+    mask = mask.astype(np.float32)
+    _mask_mem_cache.put(key, mask)  # 디스크 hit은 메모리로 승격
+    return mask
+
+
+def _put_cached_mask(key: str, mask: np.ndarray):
+    _mask_mem_cache.put(key, mask)
+    # 디스크에는 float16으로 저장 (알파 채널 용도라 정밀도 충분, 용량 절반)
+    _mask_disk_cache.put(key, mask.astype(np.float16))
+
+
+def _count_seg(key: str):
+    with _seg_stats_lock:
+        _seg_stats[key] += 1
+
+
+def get_segmentation_stats() -> dict:
+    """모드별 처리 횟수 (fast 성공 / fast→auto 폴백 / auto / 캐시 hit)"""
+    with _seg_stats_lock:
+        counts = dict(_seg_stats)
+    return {"default_mode": SEGMENTATION_MODE, "counts": counts}
+
+
+def get_mask_cache_stats() -> dict:
+    return {
+        "memory": _mask_mem_cache.stats(),
+        "disk": _mask_disk_cache.stats(),
+    }
+
 # =============================================================
 # 4. inversion 체크
 # =============================================================
@@ -319,9 +494,119 @@ def edge_complex_score(mask):
     return min(score / 5, 1.0)
 
 # =============================================================
-# 4. 종합 점수 계산
+# 4. 종합 점수 계산 (벡터화)
+# - 후보 마스크를 (N, H, W) bool 배열로 쌓아서 중심도/면적/경계 접촉/색상 분산/경계 길이를
+#   후보 전체에 대해 한 번에 계산 (메모리 제한을 위해 청크 단위)
+# - 점수식/필터/동점 처리는 select_best_mask_reference와 동일
 # =============================================================
+SELECT_MASK_CHUNK_BYTES = 64 * 1024 * 1024  # float64 (청크 x H*W) 행렬 최대 크기
+
+
+def _stack_masks(masks) -> np.ndarray:
+    stacked = []
+    for m in masks:
+        mask = m["segmentation"]
+        if mask.ndim == 3:
+            mask = mask[..., 0]
+        stacked.append(mask.astype(bool, copy=False))
+    return np.stack(stacked)
+
+
+def score_masks(img_rgb: np.ndarray, masks) -> np.ndarray:
+    """
+    후보 마스크 전체의 종합 점수 배열 반환 (면적 필터에 걸린 후보는 -inf)
+    """
+    h, w, _ = img_rgb.shape
+    n = len(masks)
+    scores = np.full(n, -np.inf, dtype=np.float64)
+
+    # 면적 필터 (SAM이 계산한 area 사용 — 기준 구현과 동일)
+    area_ratio = np.array([m["area"] for m in masks], dtype=np.float64) / (h * w)
+    valid_idx = np.flatnonzero((area_ratio >= 0.01) & (area_ratio <= 0.9))
+    if len(valid_idx) == 0:
+        return scores
+
+    # 픽셀별 채널 합 / 제곱합 (색상 분산 = E[x^2] - E[x]^2, 채널 전체를 한 모집단으로 취급)
+    img_f = img_rgb.reshape(-1, 3).astype(np.float64)
+    pix_sum = img_f.sum(axis=1)
+    pix_sq = (img_f * img_f).sum(axis=1)
+
+    xs = np.arange(w, dtype=np.float64)
+    ys = np.arange(h, dtype=np.float64)
+    left, right = xs < w * 0.05, xs > w * 0.95
+    top, bottom = ys < h * 0.05, ys > h * 0.95
+
+    chunk = max(1, SELECT_MASK_CHUNK_BYTES // (h * w * 8))
+    for start in range(0, len(valid_idx), chunk):
+        idx = valid_idx[start:start + chunk]
+        stack = _stack_masks([masks[i] for i in idx])  # (c, H, W) bool
+
+        col_counts = stack.sum(axis=1, dtype=np.float64)  # (c, W)
+        row_counts = stack.sum(axis=2, dtype=np.float64)  # (c, H)
+        count = col_counts.sum(axis=1)
+        safe_count = np.maximum(count, 1.0)
+
+        # 1) 중앙 정렬 점수 (무게중심 거리)
+        cx = col_counts @ xs / safe_count
+        cy = row_counts @ ys / safe_count
+        dist = (np.abs(cx - w / 2) / (w / 2) + np.abs(cy - h / 2) / (h / 2)) / 2
+        center_score = np.where(count > 0, 1 - dist, 0.0)
+
+        # 2) 색상 다양성
+        flat = stack.reshape(len(idx), -1).astype(np.float64)
+        n_values = safe_count * 3
+        mean = (flat @ pix_sum) / n_values
+        var = np.maximum((flat @ pix_sq) / n_values - mean * mean, 0.0)
+        color_var_score = np.where(count > 0, np.minimum(var / 5000, 1.0), 0.0)
+        del flat
+
+        # 3) 경계 복잡도: Canny 대신 가로/세로 전이 픽셀 수로 경계 길이 근사
+        #    (기준 구현도 edge 픽셀 5개에서 1.0으로 포화되므로 랭킹 동일)
+        transitions = (
+            (stack[:, :, 1:] != stack[:, :, :-1]).sum(axis=(1, 2))
+            + (stack[:, 1:, :] != stack[:, :-1, :]).sum(axis=(1, 2))
+        )
+        edge_score = np.minimum(transitions / 5, 1.0)
+
+        # 4) 경계에 닿아 있는 마스크 패널티
+        border_touch = (
+            col_counts[:, left].sum(axis=1)
+            + col_counts[:, right].sum(axis=1)
+            + row_counts[:, top].sum(axis=1)
+            + row_counts[:, bottom].sum(axis=1)
+        ) / safe_count
+        border_touch = np.where(count > 0, border_touch, 4.0)
+        border_penalty = np.minimum(border_touch, 1.0)
+
+        scores[idx] = (
+            0.45 * center_score +
+            0.30 * edge_score +
+            0.02 * color_var_score +
+            0.10 * area_ratio[idx] -
+            0.20 * border_penalty
+        )
+
+    return scores
+
+
 def select_best_mask(img_rgb, masks):
+    scores = score_masks(img_rgb, masks)
+
+    if not np.isfinite(scores).any():
+        # fallback: 가장 큰 마스크라도 사용
+        return max(masks, key=lambda x: x["area"])["segmentation"]
+
+    # np.argmax는 첫 번째 최댓값을 반환 → 기준 구현의 strict '>' 비교와 동일한 동점 처리
+    mask = masks[int(np.argmax(scores))]["segmentation"]
+    if mask.ndim == 3:
+        mask = mask[..., 0]
+    return mask.astype(np.uint8)
+
+# =============================================================
+# 4-1. 종합 점수 계산 (후보별 루프, 기준 구현)
+# - 벡터화 버전(select_best_mask)과 랭킹 비교/벤치마크용으로 유지
+# =============================================================
+def select_best_mask_reference(img_rgb, masks):
     h, w, _ = img_rgb.shape
     best_score = -1e9
     best_mask = None
@@ -384,7 +669,12 @@ def select_best_mask(img_rgb, masks):
 # =============================================================
 # 5. 누끼 미리 보여주는 함수
 # =============================================================
-def preview_segmentation(original_image: Image.Image) -> dict:
+def preview_segmentation(
+    original_image: Image.Image,
+    mode: str | None = None,
+    box: list[float] | None = None,
+    point: list[float] | None = None,
+) -> dict:
     """
     원본 이미지를 입력받아:
     - mask_array
@@ -394,7 +684,7 @@ def preview_segmentation(original_image: Image.Image) -> dict:
     """
     model = get_segmentation_singleton()
 
-    mask_array, cutout_image = model.remove_background(original_image)
+    mask_array, cutout_image = model.remove_background(original_image, mode=mode, box=box, point=point)
     mask_image = _mask_array_to_pil(mask_array)
 
     # 1) cutout PNG (RGBA)
@@ -0,0 +1,543 @@
+# session_store.py
+# 대화 세션 저장소 (TTL + 총 용량 LRU 제한)
+# - 기존 CONVERSATION_MEMORIES / USER_CONTEXTS 전역 dict 대체
+# - 마지막 접근 후 ttl_sec가 지나면 만료 (is_complete에 도달하지 않은 게스트 세션도 정리됨)
+# - 총 추정 크기가 max_bytes를 넘으면 오래 안 쓴 세션부터 제거
+# - sweep()을 주기적으로 호출(run_sweeper)해 접근이 끊긴 세션도 회수
+# - 값은 JSON 직렬화 가능한 dict만 저장 (chain 등 런타임 객체는 턴마다 상태로부터 재구성)
+# - SESSION_BACKEND=sql이면 DB 테이블(dialogue_sessions)에 저장 → 여러 uvicorn 워커/노드가 같은 세션 공유
+#   (SESSION_DB_URL 지정 시 별도 DB 사용, 예: sqlite:///./sessions.db / 미지정 시 기본 DATABASE_URL)
+# - async 코드에서는 *_async 메서드 사용 → DB 조회/커밋과 on_evict(MinIO 삭제 등)가 이벤트 루프를 막지 않음
+
+import asyncio
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.core.database import SessionLocal
+from backend.app.core.models import DialogueSession
+
+
+# memory: 프로세스 내부 / sql: DB 공유 (멀티 워커)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_DB_URL = os.getenv("SESSION_DB_URL")
+# sweep 1회당 최대 삭제 행 수 (sql)
+SESSION_SWEEP_BATCH = int(os.getenv("SESSION_SWEEP_BATCH", "500"))
+
+
+def _default_sizeof(value: Any) -> int:
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+class SessionStore:
+    """
+    TTL + 바이트 용량 제한 인메모리 세션 저장소 (스레드 안전)
+    get은 복사본을 반환 → 필드 변경은 put/update로 반영 (sql 백엔드와 동일한 의미)
+
+    Args:
+        ttl_sec: 마지막 접근 후 만료까지 시간 (0이면 TTL 없음)
+        max_bytes: 전체 세션 추정 크기 상한 (0이면 제한 없음)
+        sizeof: 세션 값의 추정 크기(bytes) 계산 함수
+        on_evict: 만료/용량 초과로 제거될 때 호출 (key, value) — 외부 리소스 정리용
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl_sec: float,
+        max_bytes: int,
+        sizeof: Optional[Callable[[Any], int]] = None,
+        on_evict: Optional[Callable[[str, Any], None]] = None,
+    ):
+        self.name = name
+        self.ttl_sec = max(0.0, float(ttl_sec))
+        self.max_bytes = max(0, int(max_bytes))
+        self._sizeof = sizeof or _default_sizeof
+        self._on_evict = on_evict
+        # key -> (value, size, last_access)
+        self._items: "OrderedDict[str, tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.created = 0
+        self.hits = 0
+        self.misses = 0
+        self.deleted = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _is_expired(self, last_access: float, now: float) -> bool:
+        return self.ttl_sec > 0 and now - last_access > self.ttl_sec
+
+    def _pop_locked(self, key: str):
+        value, size, _ = self._items.pop(key)
+        self._bytes -= size
+        return value
+
+    def _notify_evicted(self, removed: list):
+        if not self._on_evict:
+            return
+        for key, value in removed:
+            try:
+                self._on_evict(key, value)
+            except Exception as e:
+                print(f"[SessionStore][WARN] {self.name} on_evict 실패({key}): {e}")
+
+    def get(self, key: str) -> Optional[Any]:
+        """세션 조회 (hit이면 last_access 갱신)"""
+        value, removed = self._get(key)
+        self._notify_evicted(removed)
+        return value
+
+    def _get(self, key: str) -> tuple[Optional[Any], list]:
+        removed = []
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None, removed
+            value, size, last_access = item
+            if self._is_expired(last_access, now):
+                self._pop_locked(key)
+                self.expired += 1
+                self.misses += 1
+                removed.append((key, value))
+            else:
+                self._items[key] = (value, size, now)
+                self._items.move_to_end(key)
+                self.hits += 1
+                value = copy.deepcopy(value)
+        if removed:
+            return None, removed
+        return value, removed
+
+    def __contains__(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            return item is not None and not self._is_expired(item[2], now)
+
+    def put(self, key: str, value: Any):
+        """세션 저장/갱신 (크기 재계산 후 용량 초과분 LRU 제거)"""
+        self._notify_evicted(self._put(key, value))
+
+    def _put(self, key: str, value: Any) -> list:
+        value = copy.deepcopy(value)
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._items:
+                self._pop_locked(key)
+            else:
+                self.created += 1
+            self._items[key] = (value, size, time.monotonic())
+            self._bytes += size
+            removed = self._evict_over_capacity_locked()
+        self._log_evicted(removed)
+        return removed
+
+    def _evict_over_capacity_locked(self) -> list:
+        """용량 초과 시 가장 오래된 세션부터 제거 (방금 넣거나 갱신한 맨 뒤 세션은 남김)"""
+        removed = []
+        if self.max_bytes:
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                old_key = next(iter(self._items))
+                removed.append((old_key, self._pop_locked(old_key)))
+                self.evicted += 1
+        return removed
+
+    def _log_evicted(self, removed: list):
+        if removed:
+            print(f"[SessionStore] {self.name} 용량 초과 → {len(removed)}개 세션 제거")
+
+    def update(self, key: str, **fields) -> bool:
+        """
+        dict 세션의 일부 필드만 원자적으로 갱신 (세션 없거나 만료면 False)
+        동시에 진행 중인 다른 요청(예: 이미지 업로드 ↔ 대화 턴)이 쓴 필드를 덮어쓰지 않음
+        갱신으로 용량을 넘으면 put과 같이 오래된 세션부터 제거
+        """
+        updated, removed = self._update(key, fields)
+        self._notify_evicted(removed)
+        return updated
+
+    def _update(self, key: str, fields: dict) -> tuple[bool, list]:
+        fields = copy.deepcopy(fields)
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or self._is_expired(item[2], now):
+                return False, []
+            value, size, _ = item
+            value.update(fields)
+            new_size = self._sizeof(value)
+            self._items[key] = (value, new_size, now)
+            self._items.move_to_end(key)
+            self._bytes += new_size - size
+            removed = self._evict_over_capacity_locked()
+        self._log_evicted(removed)
+        return True, removed
+
+    def delete(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._items:
+                return None
+            self.deleted += 1
+            return self._pop_locked(key)
+
+    def sweep(self) -> int:
+        """만료된 세션 일괄 제거 → 제거 개수 반환"""
+        if self.ttl_sec <= 0:
+            return 0
+        now = time.monotonic()
+        removed = []
+        with self._lock:
+            # OrderedDict는 접근 순서 → 앞쪽부터 만료 여부 확인, 만료 안 된 항목을 만나면 중단
+            while self._items:
+                key, (value, _, last_access) = next(iter(self._items.items()))
+                if not self._is_expired(last_access, now):
+                    break
+                self._pop_locked(key)
+                self.expired += 1
+                removed.append((key, value))
+        if removed:
+            print(f"[SessionStore] {self.name} 만료 세션 {len(removed)}개 정리")
+            self._notify_evicted(removed)
+        return len(removed)
+
+    # ---- async 인터페이스: 메모리 연산은 바로 실행, 제거된 세션 정리(on_evict)만 스레드에서 ----
+    async def _notify_evicted_async(self, removed: list):
+        if removed and self._on_evict:
+            await asyncio.to_thread(self._notify_evicted, removed)
+
+    async def get_async(self, key: str) -> Optional[Any]:
+        value, removed = self._get(key)
+        await self._notify_evicted_async(removed)
+        return value
+
+    async def contains_async(self, key: str) -> bool:
+        return key in self
+
+    async def put_async(self, key: str, value: Any):
+        await self._notify_evicted_async(self._put(key, value))
+
+    async def update_async(self, key: str, **fields) -> bool:
+        updated, removed = self._update(key, fields)
+        await self._notify_evicted_async(removed)
+        return updated
+
+    async def delete_async(self, key: str) -> Optional[Any]:
+        return self.delete(key)
+
+    async def stats_async(self) -> dict:
+        return self.stats()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "live_sessions": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_sec": self.ttl_sec,
+                "created": self.created,
+                "hits": self.hits,
+                "misses": self.misses,
+                "deleted": self.deleted,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+class SqlSessionStore:
+    """
+    DB 테이블 기반 세션 저장소 (SessionStore와 같은 인터페이스)
+    - (namespace, key) 단위 행, data는 JSON, expires_at은 접근할 때마다 ttl만큼 연장
+    - 용량 제한 대신 TTL + sweep으로 정리 (max_bytes는 무시)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl_sec: float,
+        session_factory,
+        sizeof: Optional[Callable[[Any], int]] = None,
+        on_evict: Optional[Callable[[str, Any], None]] = None,
+    ):
+        self.name = name
+        self.ttl_sec = max(0.0, float(ttl_sec))
+        self._session_factory = session_factory
+        self._sizeof = sizeof or _default_sizeof
+        self._on_evict = on_evict
+        self._lock = threading.Lock()  # 카운터 보호용
+        self.created = 0
+        self.hits = 0
+        self.misses = 0
+        self.deleted = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _expires_at(self, now: datetime) -> Optional[datetime]:
+        return now + timedelta(seconds=self.ttl_sec) if self.ttl_sec > 0 else None
+
+    def _count(self, counter: str, n: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + n)
+
+    def _query(self, db, key: str):
+        return db.query(DialogueSession).filter(
+            DialogueSession.namespace == self.name,
+            DialogueSession.key == key,
+        )
+
+    @staticmethod
+    def _is_expired(row, now: datetime) -> bool:
+        return row.expires_at is not None and row.expires_at <= now
+
+    def _notify_evicted(self, removed: list):
+        if not self._on_evict:
+            return
+        for key, value in removed:
+            try:
+                self._on_evict(key, value)
+            except Exception as e:
+                print(f"[SessionStore][WARN] {self.name} on_evict 실패({key}): {e}")
+
+    def get(self, key: str) -> Optional[Any]:
+        now = datetime.utcnow()
+        db = self._session_factory()
+        try:
+            row = self._query(db, key).first()
+            if row is None:
+                self._count("misses")
+                return None
+            value = row.data
+            if self._is_expired(row, now):
+                db.delete(row)
+                db.commit()
+                self._count("expired")
+                self._count("misses")
+                self._notify_evicted([(key, value)])
+                return None
+            row.expires_at = self._expires_at(now)
+            db.commit()
+            self._count("hits")
+            return value
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def __contains__(self, key: str) -> bool:
+        now = datetime.utcnow()
+        db = self._session_factory()
+        try:
+            row = self._query(db, key).first()
+            return row is not None and not self._is_expired(row, now)
+        finally:
+            db.close()
+
+    def put(self, key: str, value: Any):
+        now = datetime.utcnow()
+        fields = {
+            "data": value,
+            "size_bytes": self._sizeof(value),
+            "expires_at": self._expires_at(now),
+            "updated_at": now,
+        }
+        db = self._session_factory()
+        try:
+            updated = self._query(db, key).update(fields, synchronize_session=False)
+            if not updated:
+                db.add(DialogueSession(namespace=self.name, key=key, created_at=now, **fields))
+                self._count("created")
+            db.commit()
+        except IntegrityError:
+            # 다른 워커가 같은 키를 먼저 생성 → 갱신으로 재시도
+            db.rollback()
+            self._query(db, key).update(fields, synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def update(self, key: str, **fields) -> bool:
+        """행 잠금(SELECT ... FOR UPDATE) 후 일부 필드만 갱신"""
+        now = datetime.utcnow()
+        db = self._session_factory()
+        try:
+            row = self._query(db, key).with_for_update().first()
+            if row is None or self._is_expired(row, now):
+                db.rollback()
+                return False
+            value = dict(row.data or {})
+            value.update(fields)
+            row.data = value  # JSON 컬럼은 재할당해야 변경 감지됨
+            row.size_bytes = self._sizeof(value)
+            row.expires_at = self._expires_at(now)
+            row.updated_at = now
+            db.commit()
+            return True
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def delete(self, key: str) -> Optional[Any]:
+        db = self._session_factory()
+        try:
+            row = self._query(db, key).first()
+            if row is None:
+                return None
+            value = row.data
+            db.delete(row)
+            db.commit()
+            self._count("deleted")
+            return value
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def sweep(self) -> int:
+        if self.ttl_sec <= 0:
+            return 0
+        now = datetime.utcnow()
+        db = self._session_factory()
+        try:
+            rows = (
+                db.query(DialogueSession)
+                .filter(
+                    DialogueSession.namespace == self.name,
+                    DialogueSession.expires_at <= now,
+                )
+                .limit(SESSION_SWEEP_BATCH)
+                .all()
+            )
+            removed = [(row.key, row.data) for row in rows]
+            for row in rows:
+                db.delete(row)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        if removed:
+            self._count("expired", len(removed))
+            print(f"[SessionStore] {self.name} 만료 세션 {len(removed)}개 정리")
+            self._notify_evicted(removed)
+        return len(removed)
+
+    # ---- async 인터페이스: 동기 DB 세션 작업(+ on_evict)을 통째로 스레드에서 실행 ----
+    async def get_async(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def contains_async(self, key: str) -> bool:
+        return await asyncio.to_thread(self.__contains__, key)
+
+    async def put_async(self, key: str, value: Any):
+        await asyncio.to_thread(self.put, key, value)
+
+    async def update_async(self, key: str, **fields) -> bool:
+        return await asyncio.to_thread(self.update, key, **fields)
+
+    async def delete_async(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.delete, key)
+
+    async def stats_async(self) -> dict:
+        return await asyncio.to_thread(self.stats)
+
+    def stats(self) -> dict:
+        now = datetime.utcnow()
+        db = self._session_factory()
+        try:
+            query = db.query(DialogueSession).filter(
+                DialogueSession.namespace == self.name,
+                (DialogueSession.expires_at.is_(None)) | (DialogueSession.expires_at > now),
+            )
+            live = query.count()
+        finally:
+            db.close()
+        with self._lock:
+            return {
+                "backend": "sql",
+                "live_sessions": live,
+                "ttl_sec": self.ttl_sec,
+                "created": self.created,
+                "hits": self.hits,
+                "misses": self.misses,
+                "deleted": self.deleted,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+_sql_session_factory = None
+_sql_factory_lock = threading.Lock()
+
+
+def _get_sql_session_factory():
+    """SESSION_DB_URL이 있으면 전용 엔진(테이블 자동 생성), 없으면 기본 SessionLocal"""
+    global _sql_session_factory
+
+    if _sql_session_factory is not None:
+        return _sql_session_factory
+
+    with _sql_factory_lock:
+        if _sql_session_factory is not None:
+            return _sql_session_factory
+
+        if SESSION_DB_URL:
+            session_engine = create_engine(
+                SESSION_DB_URL,
+                connect_args={"check_same_thread": False} if "sqlite" in SESSION_DB_URL else {},
+                pool_pre_ping=True,
+            )
+            DialogueSession.__table__.create(bind=session_engine, checkfirst=True)
+            _sql_session_factory = sessionmaker(autocommit=False, autoflush=False, bind=session_engine)
+            print(f"[SessionStore] sql backend: {session_engine.url.render_as_string(hide_password=True)}")
+        else:
+            _sql_session_factory = SessionLocal
+            print("[SessionStore] sql backend: DATABASE_URL")
+
+    return _sql_session_factory
+
+
+def create_session_store(
+    name: str,
+    ttl_sec: float,
+    max_bytes: int,
+    sizeof: Optional[Callable[[Any], int]] = None,
+    on_evict: Optional[Callable[[str, Any], None]] = None,
+):
+    """SESSION_BACKEND 설정에 따라 SessionStore / SqlSessionStore 생성"""
+    if SESSION_BACKEND == "sql":
+        return SqlSessionStore(name, ttl_sec, _get_sql_session_factory(), sizeof=sizeof, on_evict=on_evict)
+    if SESSION_BACKEND != "memory":
+        print(f"[SessionStore][WARN] 알 수 없는 SESSION_BACKEND={SESSION_BACKEND} → memory 사용")
+    return SessionStore(name, ttl_sec, max_bytes, sizeof=sizeof, on_evict=on_evict)
+
+
+async def run_sweeper(stores: list, interval_sec: float):
+    """여러 SessionStore를 주기적으로 sweep (FastAPI startup에서 create_task로 실행)"""
+    while True:
+        await asyncio.sleep(interval_sec)
+        for store in stores:
+            try:
+                await asyncio.to_thread(store.sweep)
+            except Exception as e:
+                print(f"[SessionStore][ERROR] {store.name} sweep 실패: {e}")
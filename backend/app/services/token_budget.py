@@ -0,0 +1,256 @@
+# token_budget.py
+# 대화 프롬프트 토큰 예산 관리 + 사용량/비용 집계
+# - TokenBudgetMemory: 윈도우 메모리(k턴)를 토큰 예산 안으로 자르고, 잘린 앞부분은 한 줄 요약으로 대체
+# - UsageCallbackHandler: LLM 호출마다 prompt / cached / completion 토큰을 기록 (OpenAI 프롬프트 캐시 hit 확인용)
+# - 토큰 수는 tiktoken으로 계산 (인코딩 로드 실패 시 글자 수 기반 근사치)
+
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.memory import ConversationBufferWindowMemory
+from langchain_core.messages import BaseMessage, get_buffer_string
+
+try:
+    import tiktoken
+except ImportError:  # langchain-openai 의존성이라 보통 설치되어 있음
+    tiktoken = None
+
+
+# 대화 기록(history)에 쓸 수 있는 최대 토큰 수 / 잘린 앞부분 요약 최대 토큰 수
+DIALOGUE_HISTORY_TOKEN_BUDGET = int(os.getenv("DIALOGUE_HISTORY_TOKEN_BUDGET", "2000"))
+DIALOGUE_HISTORY_SUMMARY_TOKENS = int(os.getenv("DIALOGUE_HISTORY_SUMMARY_TOKENS", "150"))
+
+# 1M 토큰당 USD (input, cached input, output) — 요금 변경 시 LLM_PRICING_<MODEL> 환경변수로 덮어쓰기
+# 예) LLM_PRICING_GPT_4O="2.5,1.25,10"
+_DEFAULT_PRICING = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+_encoding = None
+_encoding_failed = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+
+    if _encoding is not None or _encoding_failed:
+        return _encoding
+
+    with _encoding_lock:
+        if _encoding is None and not _encoding_failed:
+            try:
+                _encoding = tiktoken.get_encoding("o200k_base")  # gpt-4o 계열 토크나이저
+            except Exception as e:
+                _encoding_failed = True
+                print(f"[TokenBudget][WARN] tiktoken 인코딩 로드 실패 → 근사치 사용: {e}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        # 한글은 대략 1글자 ≈ 1토큰, 영문은 4글자 ≈ 1토큰 → 보수적으로 2글자 ≈ 1토큰
+        return max(1, len(text) // 2)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """앞부분 max_tokens만 남김"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[: max_tokens * 2]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens]) + "…"
+
+
+def _pricing(model: str) -> tuple:
+    env_key = "LLM_PRICING_" + model.upper().replace("-", "_").replace(".", "_")
+    override = os.getenv(env_key)
+    if override:
+        try:
+            values = tuple(float(v) for v in override.split(","))
+            if len(values) == 3:
+                return values
+        except ValueError:
+            pass
+    # gpt-4o-2024-08-06 같은 스냅샷 이름은 가장 긴 접두어로 매칭
+    for name in sorted(_DEFAULT_PRICING, key=len, reverse=True):
+        if model.startswith(name):
+            return _DEFAULT_PRICING[name]
+    return _DEFAULT_PRICING["gpt-4o"]
+
+
+def estimate_cost(model: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> float:
+    price_in, price_cached, price_out = _pricing(model)
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (uncached * price_in + cached_tokens * price_cached + completion_tokens * price_out) / 1_000_000
+
+
+# -----------------------------------------------------------------------------#
+# 대화 기록 토큰 예산                                                             #
+# -----------------------------------------------------------------------------#
+class TokenBudgetMemory(ConversationBufferWindowMemory):
+    """
+    ConversationBufferWindowMemory + 토큰 예산
+    - 최근 메시지부터 채워서 max_history_tokens를 넘기 전까지만 프롬프트에 포함
+    - 예산 밖으로 밀려난 메시지는 사용자 발화 앞부분만 모은 한 줄 요약으로 대체 (추가 LLM 호출 없음)
+    - chat_memory에는 전체 대화가 그대로 남음 (대화 완료 시 conversation_history 추출용)
+    """
+
+    max_history_tokens: int = DIALOGUE_HISTORY_TOKEN_BUDGET
+    summary_tokens: int = DIALOGUE_HISTORY_SUMMARY_TOKENS
+    last_history_tokens: int = 0
+    last_dropped_messages: int = 0
+
+    def _line(self, message: BaseMessage) -> str:
+        return get_buffer_string([message], human_prefix=self.human_prefix, ai_prefix=self.ai_prefix)
+
+    def _summarize_dropped(self, dropped: List[BaseMessage]) -> str:
+        user_points = [
+            truncate_to_tokens(str(m.content).replace("\n", " "), 30)
+            for m in dropped
+            if m.type == "human"
+        ]
+        summary = f"(이전 대화 {len(dropped)}개 메시지 생략"
+        if user_points:
+            summary += " — 사용자 언급: " + " / ".join(user_points)
+        summary += ")"
+        return truncate_to_tokens(summary, self.summary_tokens)
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        window = self.buffer_as_messages
+        budget = self.max_history_tokens
+
+        kept: List[str] = []
+        used = 0
+        for message in reversed(window):
+            line = self._line(message)
+            tokens = count_tokens(line)
+            if used + tokens > budget:
+                if not kept:
+                    # 가장 최근 메시지 하나가 예산보다 크면 잘라서라도 포함
+                    line = truncate_to_tokens(line, budget)
+                    kept.append(line)
+                    used += count_tokens(line)
+                break
+            kept.append(line)
+            used += tokens
+
+        kept.reverse()
+        dropped = window[: len(window) - len(kept)]
+        if dropped:
+            summary = self._summarize_dropped(dropped)
+            kept.insert(0, summary)
+            used += count_tokens(summary)
+
+        self.last_history_tokens = used
+        self.last_dropped_messages = len(dropped)
+
+        if self.return_messages:
+            # 문자열 템플릿과 함께 쓰는 메모리이므로 messages 모드는 예산 적용 없이 원본 윈도우 반환
+            return {self.memory_key: window}
+        return {self.memory_key: "\n".join(kept)}
+
+
+# -----------------------------------------------------------------------------#
+# 사용량 / 비용 집계                                                              #
+# -----------------------------------------------------------------------------#
+_USAGE_WINDOW = 200
+
+_usage_lock = threading.Lock()
+_usage_totals: dict = {}
+_recent_turns = deque(maxlen=_USAGE_WINDOW)
+
+
+def record_usage(
+    model: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    cached_tokens: int = 0,
+    history_tokens: Optional[int] = None,
+    estimated: bool = False,
+    tag: str = "dialogue",
+) -> dict:
+    """한 번의 LLM 호출 사용량 기록 → 이번 호출 요약 반환"""
+    cost = estimate_cost(model, prompt_tokens, cached_tokens, completion_tokens)
+    turn = {
+        "tag": tag,
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "completion_tokens": completion_tokens,
+        "history_tokens": history_tokens,
+        "cost_usd": round(cost, 6),
+        "estimated": estimated,
+    }
+    with _usage_lock:
+        totals = _usage_totals.setdefault(
+            model,
+            {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0},
+        )
+        totals["calls"] += 1
+        totals["prompt_tokens"] += prompt_tokens
+        totals["cached_tokens"] += cached_tokens
+        totals["completion_tokens"] += completion_tokens
+        totals["cost_usd"] += cost
+        _recent_turns.append(turn)
+
+    print(
+        f"[Tokens] {tag} model={model} prompt={prompt_tokens} cached={cached_tokens} "
+        f"completion={completion_tokens} history={history_tokens} cost=${cost:.5f}"
+        + (" (estimated)" if estimated else "")
+    )
+    return turn
+
+
+def get_usage_stats() -> dict:
+    with _usage_lock:
+        models = {}
+        for model, totals in _usage_totals.items():
+            item = dict(totals)
+            item["cost_usd"] = round(item["cost_usd"], 4)
+            item["cache_hit_ratio"] = (
+                round(item["cached_tokens"] / item["prompt_tokens"], 4) if item["prompt_tokens"] else 0.0
+            )
+            models[model] = item
+        recent = list(_recent_turns)[-10:]
+    return {
+        "history_token_budget": DIALOGUE_HISTORY_TOKEN_BUDGET,
+        "models": models,
+        "recent": recent,
+    }
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """LLMResult.llm_output["token_usage"]에서 사용량 추출 (chain.ainvoke config callbacks로 전달)"""
+
+    def __init__(self, memory: Optional[TokenBudgetMemory] = None, tag: str = "dialogue"):
+        self.memory = memory
+        self.tag = tag
+        self.last_turn: Optional[dict] = None
+
+    def on_llm_end(self, response, **kwargs: Any) -> None:
+        llm_output = response.llm_output or {}
+        usage = llm_output.get("token_usage") or {}
+        if not usage:
+            return
+        details = usage.get("prompt_tokens_details") or {}
+        self.last_turn = record_usage(
+            model=llm_output.get("model_name", "unknown"),
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            cached_tokens=details.get("cached_tokens") or 0,
+            history_tokens=self.memory.last_history_tokens if self.memory else None,
+            tag=self.tag,
+        )
@@ -0,0 +1,301 @@
+# upstream_clients.py
+# 외부 API(OpenAI / OpenWeather 등) 공용 HTTP 클라이언트 계층
+# - 프로세스당 httpx 클라이언트 1개(sync/async)를 공유 → keep-alive 커넥션 풀 재사용, TLS 핸드셰이크 반복 제거
+# - AsyncOpenAI / ChatOpenAI도 이 클라이언트를 주입해 한 번만 생성
+# - transport 래퍼에서 업스트림별 동시 요청 수 제한 + 지연 시간 기록 (호출부 수정 없이 측정)
+# - h2 패키지가 설치되어 있으면 HTTP/2 사용 (없으면 HTTP/1.1 keep-alive)
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI
+from langchain_openai import ChatOpenAI
+
+try:
+    import h2  # noqa: F401  (httpx http2=True 사용 가능 여부 확인용)
+    _H2_AVAILABLE = True
+except ImportError:
+    _H2_AVAILABLE = False
+
+
+UPSTREAM_TIMEOUT_SEC = float(os.getenv("UPSTREAM_TIMEOUT_SEC", "60"))
+UPSTREAM_CONNECT_TIMEOUT_SEC = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT_SEC", "10"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "true").lower() == "true" and _H2_AVAILABLE
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+# 업스트림별 동시 요청 상한 (0이면 제한 없음)
+UPSTREAM_CONCURRENCY = {
+    "openai": int(os.getenv("OPENAI_MAX_CONCURRENCY", "32")),
+    "weather": int(os.getenv("WEATHER_MAX_CONCURRENCY", "8")),
+}
+
+# 호스트 → 업스트림 이름
+_UPSTREAM_HOSTS = {
+    "api.openai.com": "openai",
+    "api.openweathermap.org": "weather",
+}
+
+# 업스트림별 최근 지연 시간 샘플 수 (p50/p95 계산용)
+_LATENCY_WINDOW = 512
+
+
+def _upstream_name(request: httpx.Request) -> str:
+    """요청 → 통계 키 (openai는 엔드포인트까지 구분: openai.chat / openai.embeddings / openai.audio)"""
+    host = request.url.host
+    base = _UPSTREAM_HOSTS.get(host, host)
+    if base == "openai":
+        parts = [p for p in request.url.path.split("/") if p]
+        # /v1/chat/completions → chat
+        if len(parts) >= 2:
+            return f"openai.{parts[1]}"
+    return base
+
+
+def _limit_key(name: str) -> str:
+    return name.split(".", 1)[0]
+
+
+class _UpstreamStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_sec = 0.0
+        self.samples = deque(maxlen=_LATENCY_WINDOW)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.samples)
+
+        def _pct(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 1)
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "avg_ms": round(self.total_sec / self.count * 1000, 1) if self.count else None,
+            "p50_ms": _pct(0.50),
+            "p95_ms": _pct(0.95),
+        }
+
+
+_stats_lock = threading.Lock()
+_stats: dict = {}
+
+
+def _record_start(name: str):
+    with _stats_lock:
+        _stats.setdefault(name, _UpstreamStats()).in_flight += 1
+
+
+def _record_end(name: str, elapsed: float, error: bool):
+    with _stats_lock:
+        st = _stats[name]
+        st.in_flight -= 1
+        st.count += 1
+        st.total_sec += elapsed
+        st.samples.append(elapsed)
+        if error:
+            st.errors += 1
+
+
+def _is_error(response: Optional[httpx.Response]) -> bool:
+    return response is None or response.status_code >= 500 or response.status_code == 429
+
+
+# -----------------------------------------------------------------------------#
+# 계측 transport (응답 헤더 수신까지의 시간 = 업스트림 처리 시간)                    #
+# -----------------------------------------------------------------------------#
+class _InstrumentedAsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self._inner = inner
+        self._semaphores: dict = {}
+
+    def _semaphore(self, key: str) -> Optional[asyncio.Semaphore]:
+        limit = UPSTREAM_CONCURRENCY.get(key, 0)
+        if limit <= 0:
+            return None
+        sem = self._semaphores.get(key)
+        if sem is None:
+            sem = self._semaphores[key] = asyncio.Semaphore(limit)
+        return sem
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        name = _upstream_name(request)
+        sem = self._semaphore(_limit_key(name))
+        if sem is not None:
+            await sem.acquire()
+        _record_start(name)
+        started = time.perf_counter()
+        response = None
+        try:
+            response = await self._inner.handle_async_request(request)
+            return response
+        finally:
+            _record_end(name, time.perf_counter() - started, _is_error(response))
+            if sem is not None:
+                sem.release()
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+class _InstrumentedSyncTransport(httpx.BaseTransport):
+    """langchain sync 호출(스레드)용 — threading 세마포어 사용"""
+
+    def __init__(self, inner: httpx.BaseTransport):
+        self._inner = inner
+        self._semaphores = {
+            key: threading.BoundedSemaphore(limit) for key, limit in UPSTREAM_CONCURRENCY.items() if limit > 0
+        }
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        name = _upstream_name(request)
+        sem = self._semaphores.get(_limit_key(name))
+        if sem is not None:
+            sem.acquire()
+        _record_start(name)
+        started = time.perf_counter()
+        response = None
+        try:
+            response = self._inner.handle_request(request)
+            return response
+        finally:
+            _record_end(name, time.perf_counter() - started, _is_error(response))
+            if sem is not None:
+                sem.release()
+
+    def close(self):
+        self._inner.close()
+
+
+# -----------------------------------------------------------------------------#
+# 공유 클라이언트 (지연 생성)                                                     #
+# -----------------------------------------------------------------------------#
+_client_lock = threading.Lock()
+_async_http_client: Optional[httpx.AsyncClient] = None
+_sync_http_client: Optional[httpx.Client] = None
+_openai_client: Optional[AsyncOpenAI] = None
+_chat_llms: dict = {}
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(UPSTREAM_TIMEOUT_SEC, connect=UPSTREAM_CONNECT_TIMEOUT_SEC)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+    )
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    global _async_http_client
+
+    if _async_http_client is not None:
+        return _async_http_client
+
+    with _client_lock:
+        if _async_http_client is None:
+            transport = httpx.AsyncHTTPTransport(limits=_limits(), http2=UPSTREAM_HTTP2)
+            _async_http_client = httpx.AsyncClient(
+                transport=_InstrumentedAsyncTransport(transport),
+                timeout=_timeout(),
+            )
+            print(f"[Upstream] async http client 생성 (http2={UPSTREAM_HTTP2})")
+    return _async_http_client
+
+
+def get_sync_http_client() -> httpx.Client:
+    global _sync_http_client
+
+    if _sync_http_client is not None:
+        return _sync_http_client
+
+    with _client_lock:
+        if _sync_http_client is None:
+            transport = httpx.HTTPTransport(limits=_limits(), http2=UPSTREAM_HTTP2)
+            _sync_http_client = httpx.Client(
+                transport=_InstrumentedSyncTransport(transport),
+                timeout=_timeout(),
+            )
+    return _sync_http_client
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """공유 AsyncOpenAI (공유 httpx 풀 사용)"""
+    global _openai_client
+
+    if _openai_client is not None:
+        return _openai_client
+
+    http_client = get_async_http_client()
+    with _client_lock:
+        if _openai_client is None:
+            _openai_client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=http_client,
+                max_retries=OPENAI_MAX_RETRIES,
+                timeout=_timeout(),
+            )
+    return _openai_client
+
+
+def get_chat_llm(model: str = "gpt-4o", temperature: float = 0.7) -> ChatOpenAI:
+    """(model, temperature)별 ChatOpenAI 1개를 공유 (세션/턴마다 생성하지 않음)"""
+    key = (model, temperature)
+    llm = _chat_llms.get(key)
+    if llm is not None:
+        return llm
+
+    http_client = get_sync_http_client()
+    http_async_client = get_async_http_client()
+    with _client_lock:
+        llm = _chat_llms.get(key)
+        if llm is None:
+            llm = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                openai_api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=http_client,
+                http_async_client=http_async_client,
+                max_retries=OPENAI_MAX_RETRIES,
+                request_timeout=UPSTREAM_TIMEOUT_SEC,
+            )
+            _chat_llms[key] = llm
+    return llm
+
+
+async def aclose_clients():
+    """FastAPI shutdown 시 커넥션 풀 정리"""
+    global _async_http_client, _sync_http_client, _openai_client
+
+    with _client_lock:
+        async_client, sync_client = _async_http_client, _sync_http_client
+        _async_http_client = _sync_http_client = _openai_client = None
+        _chat_llms.clear()
+
+    if async_client is not None:
+        await async_client.aclose()
+    if sync_client is not None:
+        sync_client.close()
+
+
+def get_upstream_stats() -> dict:
+    with _stats_lock:
+        upstreams = {name: st.snapshot() for name, st in _stats.items()}
+    return {
+        "http2": UPSTREAM_HTTP2,
+        "concurrency_limits": dict(UPSTREAM_CONCURRENCY),
+        "upstreams": upstreams,
+    }
@@ -0,0 +1,145 @@
+# warmup_service.py
+# 시작 시 모델 로드 + 워밍업(더미 추론) + 준비 상태 추적
+# - 로드만 해서는 첫 요청이 커널 선택/할당자 확장/IP-Adapter·xformers 지연 초기화 비용을 떠안음
+# - 실제 서비스 해상도로 SAM 1회 + 짧은 diffusion 패스를 미리 실행
+# - /health/ready가 이 상태를 보고 503/200을 반환 → 워밍업 끝난 프로세스에만 트래픽
+
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from backend.app.services.segmentation import get_segmentation_singleton
+from backend.app.services.diffusion_service import _load_pipeline, warmup_pipeline
+
+
+# 워밍업 여부 / diffusion 워밍업 스텝 수
+MODEL_WARMUP_ENABLED = os.getenv("MODEL_WARMUP_ENABLED", "true").lower() == "true"
+MODEL_WARMUP_STEPS = int(os.getenv("MODEL_WARMUP_STEPS", "2"))
+# 실제 업로드 사진과 비슷한 크기 (depth image_resolution=768 → 생성 해상도 결정)
+MODEL_WARMUP_IMAGE_SIZE = int(os.getenv("MODEL_WARMUP_IMAGE_SIZE", "1024"))
+
+_state_lock = threading.Lock()
+_state = {
+    "started_at": None,
+    "finished_at": None,
+    "models": {},
+}
+
+
+def _set_model_state(name: str, **fields):
+    with _state_lock:
+        _state["models"].setdefault(name, {}).update(fields)
+
+
+# stage → 완료 플래그 이름
+_STAGE_FLAGS = {"load": "loaded", "warmup": "warm"}
+
+
+def _timed_stage(name: str, stage: str, fn):
+    """stage(load/warmup) 실행 + 소요 시간/에러 기록 (실패해도 다음 단계 진행)"""
+    flag = _STAGE_FLAGS[stage]
+    started = time.perf_counter()
+    try:
+        fn()
+        elapsed = round(time.perf_counter() - started, 2)
+        _set_model_state(name, **{f"{stage}_sec": elapsed, flag: True})
+        print(f"[Warmup] {name} {stage} done ({elapsed}s)")
+        return True
+    except Exception as e:
+        _set_model_state(name, **{flag: False, "error": f"{stage}: {e}"})
+        print(f"❌ [Warmup] {name} {stage} failed: {e}")
+        return False
+
+
+def _dummy_product_image(size: int) -> Image.Image:
+    """중앙에 제품 형태가 있는 더미 이미지 (fast SAM / depth 경로를 실제와 같게 태우기 위함)"""
+    w, h = size, int(size * 0.75)
+    image = Image.new("RGB", (w, h), (235, 232, 226))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((w * 0.35, h * 0.2, w * 0.65, h * 0.85), fill=(180, 60, 40))
+    return image
+
+
+def _uncached_dummy_image(size: int) -> Image.Image:
+    """더미 이미지 + 약한 노이즈 (SAM 마스크 / depth 디스크 캐시에 hit하면 추론이 생략되므로 실행마다 픽셀을 조금씩 바꿈)"""
+    image = _dummy_product_image(size)
+    noise = np.random.randint(0, 3, (image.size[1], image.size[0], 3), dtype=np.uint8)
+    return Image.fromarray(np.asarray(image) + noise)
+
+
+def _warmup_segmentation():
+    model = get_segmentation_singleton()
+    model.remove_background(_uncached_dummy_image(MODEL_WARMUP_IMAGE_SIZE))
+
+
+def _warmup_diffusion():
+    # depth 캐시 hit이면 MiDaS가 로드/워밍업되지 않아 첫 실제 요청이 비용을 떠안음
+    warmup_pipeline(_uncached_dummy_image(MODEL_WARMUP_IMAGE_SIZE), steps=MODEL_WARMUP_STEPS)
+
+
+def run_model_startup(preload: bool = True, warmup: bool = MODEL_WARMUP_ENABLED):
+    """
+    SAM + Diffusion 로드 → (옵션) 워밍업 순서로 실행하고 단계별 시간 기록
+    preload=False면 GPU 모델을 이 프로세스에서 쓰지 않는 것으로 보고 바로 ready 처리
+    """
+    with _state_lock:
+        _state["started_at"] = time.time()
+        _state["finished_at"] = None
+        _state["models"] = {}
+
+    if not preload:
+        _set_model_state("sam", skipped=True)
+        _set_model_state("diffusion", skipped=True)
+    else:
+        print("🚀 [Startup] Preloading SAM + Diffusion models...")
+        sam_ok = _timed_stage("sam", "load", get_segmentation_singleton)
+        diffusion_ok = _timed_stage("diffusion", "load", _load_pipeline)
+
+        if warmup:
+            print("🔥 [Startup] Warming up models...")
+            if sam_ok:
+                _timed_stage("sam", "warmup", _warmup_segmentation)
+            if diffusion_ok:
+                _timed_stage("diffusion", "warmup", _warmup_diffusion)
+        else:
+            _set_model_state("sam", warmup_skipped=True)
+            _set_model_state("diffusion", warmup_skipped=True)
+
+    with _state_lock:
+        _state["finished_at"] = time.time()
+    print("✨ [Startup] All models ready." if is_ready() else "⚠️ [Startup] Models not ready.")
+
+
+def _model_ready(info: dict) -> bool:
+    if info.get("skipped"):
+        return True
+    if not info.get("loaded"):
+        return False
+    # 워밍업을 건너뛴 경우 로드만 되면 ready, 워밍업 실패는 not ready
+    return info.get("warmup_skipped", False) or info.get("warm", False)
+
+
+def is_ready() -> bool:
+    with _state_lock:
+        if _state["finished_at"] is None:
+            return False
+        models = list(_state["models"].values())
+    return all(_model_ready(info) for info in models)
+
+
+def get_readiness() -> dict:
+    with _state_lock:
+        snapshot = {
+            "started_at": _state["started_at"],
+            "finished_at": _state["finished_at"],
+            "models": {name: dict(info) for name, info in _state["models"].items()},
+        }
+    for info in snapshot["models"].values():
+        info["ready"] = _model_ready(info)
+    snapshot["ready"] = is_ready()
+    if snapshot["started_at"] and snapshot["finished_at"]:
+        snapshot["startup_sec"] = round(snapshot["finished_at"] - snapshot["started_at"], 2)
+    return snapshot
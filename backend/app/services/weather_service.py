@@ -1,14 +1,16 @@
 # weather_service.py
 
 from backend.app.services import gpt_service
-import requests
+from backend.app.services.upstream_clients import get_async_http_client
 import os
 
 async def get_weather(city="Seoul"):
     city = await gpt_service.extract_city_name_english(city)
     url = f"https://api.openweathermap.org/data/2.5/weather"
     params = {"q": city, "appid": os.getenv("WEATHER_API_KEY"), "lang": "kr", "units": "metric"}
-    weather_data = requests.get(url, params=params).json()
+    # 공유 async 클라이언트 사용 (이벤트 루프 블로킹 없음 + keep-alive 재사용)
+    response = await get_async_http_client().get(url, params=params, timeout=10.0)
+    weather_data = response.json()
     weather_desc = weather_data["weather"][0]["description"]
     temp = weather_data["main"]["temp"]
     weather_info = f"{city}, {weather_desc}, {temp}°C"
@@ -1,9 +1,9 @@
 # whisper_service.py
 # Whisper API를 이용해 사용자 입력 음성을 텍스트로 변환
 
-import httpx
 import os
 from fastapi import UploadFile
+from backend.app.services.upstream_clients import get_async_http_client
 
 async def transcribe_audio(file: UploadFile) -> str:
     """
@@ -16,19 +16,20 @@ async def transcribe_audio(file: UploadFile) -> str:
         # 파일 내용 읽기
         file_content = await file.read()
         
-        # httpx.AsyncClient로 비동기 요청
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                "https://api.openai.com/v1/audio/transcriptions",
-                headers={"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"},
-                files={"file": (file.filename, file_content, file.content_type or "audio/mpeg")},
-                data={"model": "whisper-1", "language": "ko"}
-            )
-            
-            if response.status_code != 200:
-                raise RuntimeError(f"Whisper API Error: {response.text}")
-            
-            return response.json()["text"]
+        # 공유 httpx.AsyncClient로 비동기 요청 (커넥션 풀 재사용)
+        client = get_async_http_client()
+        response = await client.post(
+            "https://api.openai.com/v1/audio/transcriptions",
+            headers={"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"},
+            files={"file": (file.filename, file_content, file.content_type or "audio/mpeg")},
+            data={"model": "whisper-1", "language": "ko"},
+            timeout=60.0,
+        )
+        
+        if response.status_code != 200:
+            raise RuntimeError(f"Whisper API Error: {response.text}")
+        
+        return response.json()["text"]
     
     except Exception as e:
         raise RuntimeError(f"Whisper API Error: {e}")
@@ -0,0 +1,162 @@
+# worker.py
+# 광고 미디어 생성 GPU 워커 프로세스
+# - SAM / Diffusion 모델은 이 프로세스만 로드 (API 프로세스는 GPU 불필요)
+# - ad_jobs 테이블에서 queued 작업을 가져와 처리하고 상태/부분 결과를 기록
+# - AD_WORKER_CONCURRENCY개의 스레드가 동시에 작업을 처리 → diffusion 배치 스케줄러가 한 배치로 묶음
+#
+# 실행: python -m backend.app.worker
+# - 기본 pm2 설정(ecosystem.config.js)에는 포함하지 않음: 프론트가 아직 /ads/generate, SAM 미리보기 등
+#   API 프로세스의 GPU 경로를 쓰므로, 호출부가 /ads/jobs로 옮겨간 뒤 API를 PRELOAD_GPU_MODELS=false로 두고 함께 띄움
+
+import os
+
+# Hugging Face / Diffusers / Transformers 캐시를 공용 디렉토리로 지정 (main.py와 동일)
+CACHE_DIR = "/home/shared/models"
+for key in [
+            "HF_HOME","TRANSFORMERS_CACHE",
+            "DIFFUSERS_CACHE", "HUGGINGFACE_HUB_CACHE", "TORCH_HOME"]:
+    os.environ[key] = CACHE_DIR
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import socket
+import threading
+import time
+
+from backend.app.core.database import SessionLocal, engine, Base
+from backend.app.core.schemas import AdMediaGenerateRequest
+from backend.app.services import job_service
+from backend.app.services.ad_generation_service import (
+    run_ad_media_pipeline,
+    save_ad_request,
+    validate_ad_request,
+)
+from backend.app.services.diffusion_service import (
+    DIFFUSION_BATCH_ENABLED,
+    DIFFUSION_BATCH_MAX_SIZE,
+)
+from backend.app.services.warmup_service import run_model_startup
+
+
+# 동시에 처리할 작업 수 (배칭 활성화 시 배치 최대 크기에 맞춤)
+AD_WORKER_CONCURRENCY = int(
+    os.getenv("AD_WORKER_CONCURRENCY", str(DIFFUSION_BATCH_MAX_SIZE if DIFFUSION_BATCH_ENABLED else 1))
+)
+# 큐가 비었을 때 폴링 간격
+AD_WORKER_POLL_SEC = float(os.getenv("AD_WORKER_POLL_SEC", "1.0"))
+# stale 작업 점검 주기
+AD_WORKER_STALE_CHECK_SEC = float(os.getenv("AD_WORKER_STALE_CHECK_SEC", "60"))
+
+WORKER_NAME = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_job(job_id: str, worker_id: str, payload: dict, user_id):
+    """단일 작업 처리 (진행 상황은 별도 세션으로 기록)"""
+    req = AdMediaGenerateRequest(**payload["request"])
+    validate_ad_request(req)
+
+    def _on_progress(stage: str, partial: dict):
+        progress_db = SessionLocal()
+        try:
+            if not job_service.update_job_progress(progress_db, job_id, worker_id, stage, partial):
+                print(f"[Worker][WARN] job {job_id} 소유권 상실 (stale 처리됨) → 결과는 저장되지 않음")
+        finally:
+            progress_db.close()
+
+    media = run_ad_media_pipeline(req, on_progress=_on_progress)
+    _on_progress("save", media)
+
+    # AdRequest 저장 + 작업 완료를 한 트랜잭션으로 (작업을 잃었으면 둘 다 롤백 → 재시도 시 중복 저장 없음)
+    db = SessionLocal()
+    try:
+        ad_request = save_ad_request(
+            db,
+            user_id=user_id,
+            req=req,
+            media=media,
+            weather_info=payload.get("weather_info"),
+            context_str=payload.get("context_str"),
+            commit=False,
+        )
+        if job_service.complete_job(db, job_id, worker_id, media, ad_request.id):
+            print(f"[DB 저장 완료] AdRequest ID: {ad_request.id}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _worker_loop(slot: int, stop_event: threading.Event):
+    worker_id = f"{WORKER_NAME}:{slot}"
+    print(f"[Worker] slot {slot} started ({worker_id})")
+
+    while not stop_event.is_set():
+        db = SessionLocal()
+        try:
+            job = job_service.claim_next_job(db, worker_id)
+            if job is None:
+                db.close()
+                stop_event.wait(AD_WORKER_POLL_SEC)
+                continue
+            job_id, payload, user_id = job.id, job.request_payload, job.user_id
+        except Exception as e:
+            db.rollback()
+            db.close()
+            print(f"[Worker][ERROR] claim failed: {e}")
+            stop_event.wait(AD_WORKER_POLL_SEC)
+            continue
+        db.close()
+
+        started = time.monotonic()
+        try:
+            _process_job(job_id, worker_id, payload, user_id)
+            print(f"[Worker] job {job_id} done in {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            print(f"[Worker][ERROR] job {job_id}: {repr(e)}")
+            fail_db = SessionLocal()
+            try:
+                # 입력 검증 실패는 재시도해도 동일하므로 바로 failed 처리
+                job_service.fail_job(fail_db, job_id, worker_id, str(e), retryable=not isinstance(e, ValueError))
+            finally:
+                fail_db.close()
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+
+    # -----------------------------
+    # SAM + Diffusion Preload + Warmup (작업을 받기 전에 완료)
+    # -----------------------------
+    run_model_startup(preload=True)
+
+    stop_event = threading.Event()
+    threads = [
+        threading.Thread(target=_worker_loop, args=(slot, stop_event), name=f"ad-worker-{slot}", daemon=True)
+        for slot in range(AD_WORKER_CONCURRENCY)
+    ]
+    for t in threads:
+        t.start()
+    print(f"✨ [Worker] {WORKER_NAME} ready (concurrency={AD_WORKER_CONCURRENCY})")
+
+    try:
+        while True:
+            db = SessionLocal()
+            try:
+                job_service.requeue_stale_jobs(db)
+            except Exception as e:
+                db.rollback()
+                print(f"[Worker][ERROR] stale check failed: {e}")
+            finally:
+                db.close()
+            time.sleep(AD_WORKER_STALE_CHECK_SEC)
+    except KeyboardInterrupt:
+        print("[Worker] shutting down...")
+        stop_event.set()
+        for t in threads:
+            t.join(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
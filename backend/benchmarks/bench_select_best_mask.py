@@ -0,0 +1,89 @@
+# bench_select_best_mask.py
+# select_best_mask (벡터화) vs select_best_mask_reference (후보별 루프) 벤치마크
+# - 합성 이미지 + SAM 출력 형태의 랜덤 후보 마스크(타원/사각형)로 측정
+# - 두 구현이 같은 후보를 고르는지(랭킹 동일 여부)도 함께 검사
+#
+# 실행: python -m backend.benchmarks.bench_select_best_mask --size 1024 --candidates 150
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from backend.app.services.segmentation import (
+    score_masks,
+    select_best_mask,
+    select_best_mask_reference,
+)
+
+
+def _make_candidates(rng: np.random.Generator, h: int, w: int, n: int) -> list[dict]:
+    masks = []
+    for _ in range(n):
+        mask = np.zeros((h, w), dtype=np.uint8)
+        cx, cy = int(rng.integers(0, w)), int(rng.integers(0, h))
+        rx = int(rng.integers(max(2, w // 50), w // 2))
+        ry = int(rng.integers(max(2, h // 50), h // 2))
+        if rng.random() < 0.5:
+            cv2.ellipse(mask, (cx, cy), (rx, ry), float(rng.integers(0, 180)), 0, 360, 1, -1)
+        else:
+            cv2.rectangle(mask, (cx - rx, cy - ry), (cx + rx, cy + ry), 1, -1)
+        seg = mask.astype(bool)
+        masks.append({"segmentation": seg, "area": int(seg.sum())})
+    return masks
+
+
+def _make_image(rng: np.random.Generator, h: int, w: int) -> np.ndarray:
+    base = cv2.GaussianBlur(rng.integers(0, 256, (h, w, 3), dtype=np.uint8), (31, 31), 0)
+    cv2.circle(base, (w // 2, h // 2), min(h, w) // 4, (220, 60, 40), -1)
+    return base
+
+
+def _timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1024, help="이미지 긴 변 (SAM 입력 크기)")
+    parser.add_argument("--candidates", type=int, default=150, help="후보 마스크 수")
+    parser.add_argument("--trials", type=int, default=5, help="랭킹 비교용 랜덤 시드 수")
+    parser.add_argument("--repeat", type=int, default=3, help="시간 측정 반복 (최솟값 사용)")
+    args = parser.parse_args()
+
+    h, w = int(args.size * 0.75), args.size
+    loop_times, vec_times = [], []
+    mismatches = 0
+
+    for seed in range(args.trials):
+        rng = np.random.default_rng(seed)
+        img = _make_image(rng, h, w)
+        masks = _make_candidates(rng, h, w, args.candidates)
+
+        ref_mask = select_best_mask_reference(img, masks)
+        vec_mask = select_best_mask(img, masks)
+        if not np.array_equal(np.asarray(ref_mask, dtype=np.uint8), np.asarray(vec_mask, dtype=np.uint8)):
+            mismatches += 1
+            scores = score_masks(img, masks)
+            print(f"[seed={seed}] ranking mismatch, top scores={np.sort(scores)[-3:]}")
+
+        loop_times.append(_timeit(lambda: select_best_mask_reference(img, masks), args.repeat))
+        vec_times.append(_timeit(lambda: select_best_mask(img, masks), args.repeat))
+
+    loop_ms = np.median(loop_times) * 1000
+    vec_ms = np.median(vec_times) * 1000
+    print(f"image={w}x{h} candidates={args.candidates} trials={args.trials}")
+    print(f"loop (reference) : {loop_ms:8.1f} ms")
+    print(f"vectorized       : {vec_ms:8.1f} ms")
+    print(f"speedup          : {loop_ms / vec_ms:8.2f}x")
+    print(f"ranking mismatches: {mismatches}/{args.trials}")
+
+
+if __name__ == "__main__":
+    main()
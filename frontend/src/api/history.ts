@@ -1,5 +1,11 @@
 import { httpGet } from "./http";
 
-export async function getHistory(skip = 0, limit = 20) {
-  return httpGet(`/history?skip=${skip}&limit=${limit}`);
+export async function getHistory(cursor: string | null = null, limit = 20) {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (cursor) {
+    // 다음 페이지: keyset 커서 사용, 전체 개수는 첫 페이지에서만 조회
+    params.set("cursor", cursor);
+    params.set("include_total", "false");
+  }
+  return httpGet(`/history?${params.toString()}`);
 }
@@ -24,7 +24,7 @@ export default function HistoryPage() {
   const [histories, setHistories] = useState<History[]>([]);
   const [totalCount, setTotalCount] = useState(0);
 
-  const [skip, setSkip] = useState(0);
+  const [cursor, setCursor] = useState<string | null>(null);
   const [hasMore, setHasMore] = useState(true);
 
   const [selectedIndex, setSelectedIndex] = useState<number | null>(null);
@@ -33,18 +33,17 @@ export default function HistoryPage() {
   const loadHistory = async () => {
     if (!hasMore) return;
 
-    if (skip === 0) setLoading(true);
+    if (cursor === null) setLoading(true);
     else setLoadingMore(true);
 
-    const res = await getHistory(skip, limit);
-    if (skip === 0) setTotalCount(res.total ?? 0);
+    const res = await getHistory(cursor, limit);
+    if (cursor === null) setTotalCount(res.total ?? 0);
 
     const newData = res.history ?? [];
     setHistories((prev) => [...prev, ...newData]);
 
-    const updatedCount = skip + newData.length;
-    setSkip(updatedCount);
-    setHasMore(updatedCount < (res.total ?? 0));
+    setCursor(res.next_cursor ?? null);
+    setHasMore(Boolean(res.has_more));
 
     setLoading(false);
     setLoadingMore(false);